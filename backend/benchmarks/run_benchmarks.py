@@ -0,0 +1,270 @@
+"""
+API benchmark suite.
+
+Seeds a benchmark database, drives the API in-process through httpx's ASGI
+transport at a configurable concurrency and reports latency percentiles,
+throughput and SQL statements per request for each scenario. Results can be
+saved as a baseline and later runs compared against it, failing when a
+scenario's p95 latency regresses beyond the allowed tolerance.
+
+Usage (from the backend directory):
+    python benchmarks/run_benchmarks.py --events 2000000 --contracts 200000
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --scenario get_events --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+EVENT_TYPES = ["Login", "Logout", "Password Reset", "Contract View", "Contract Download",
+               "Profile Update", "Payment", "Contract Sign", "Document Upload", "Query"]
+CHANNELS = ["Web", "Mobile", "API"]
+CONTRACT_STATUSES = ["Draft", "Pending Approval", "Approved", "Rejected", "Active", "Expired"]
+ACTION_TYPES = ["approve", "reject", "reopen", "flag"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Customer Contract API")
+    parser.add_argument("--database", default="./benchmark.db", help="SQLite file to seed and benchmark")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--contracts", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--actions", type=int, default=100000)
+    parser.add_argument("--reseed", action="store_true", help="Recreate the database even if it exists")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating seed data")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--scenario", action="append", help="Only run these scenarios (repeatable)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed p95 regression over baseline (0.25 = 25%%)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    return parser.parse_args(argv)
+
+
+def seed_database(engine, args):
+    """Fill the benchmark database with the requested row counts"""
+    from seed_data import seed_bulk
+
+    seed_bulk(
+        engine,
+        customers=args.customers,
+        contracts=args.contracts,
+        events=args.events,
+        notes=args.notes,
+        actions=args.actions,
+        seed=args.seed,
+        workers=args.workers,
+        # The benchmark database is private to this run
+        defer_indexes=True,
+        progress=lambda message: None,
+    )
+
+
+def build_scenarios(args):
+    """Return {name: (method, request factory)} for every benchmarked endpoint"""
+    rng = random.Random(args.seed)
+    now = datetime.now()
+
+    def customer_id():
+        return rng.randint(1, args.customers)
+
+    def contract_id():
+        return rng.randint(1, args.contracts)
+
+    def recent_window():
+        start = now - timedelta(days=rng.randint(1, 365))
+        return {"start_date": start.isoformat(), "end_date": (start + timedelta(days=7)).isoformat()}
+
+    return {
+        "get_customers": ("GET", lambda: ("/customers/", {"skip": rng.randint(0, args.customers // 2)})),
+        "get_customer": ("GET", lambda: (f"/customers/{customer_id()}", None)),
+        "get_customer_overview": ("GET", lambda: (f"/customers/{customer_id()}/overview", None)),
+        "get_contracts": ("GET", lambda: ("/contracts/", {"status": rng.choice(CONTRACT_STATUSES)})),
+        "get_contract": ("GET", lambda: (f"/contracts/{contract_id()}", None)),
+        "get_events": ("GET", lambda: ("/events/", {"skip": rng.randint(0, 10000)})),
+        "get_events_cursor": ("GET", lambda: ("/events/", {"cursor": ""})),
+        "get_events_by_customer": ("GET", lambda: ("/events/", {"customer_id": customer_id()})),
+        "get_events_by_type_window": ("GET", lambda: (
+            "/events/", {"event_type": rng.choice(EVENT_TYPES), **recent_window()}
+        )),
+        "get_notes": ("GET", lambda: ("/notes/", {"contract_id": contract_id()})),
+        "get_actions": ("GET", lambda: ("/actions/", {"contract_id": contract_id()})),
+        "stats_events": ("GET", lambda: ("/stats/events", {"bucket": "day", **recent_window()})),
+        "create_event": ("POST", lambda: ("/events/", {
+            "customer_id": customer_id(),
+            "event_type": rng.choice(EVENT_TYPES),
+            "channel": rng.choice(CHANNELS),
+        })),
+        "create_action": ("POST", lambda: ("/actions/", {
+            "contract_id": contract_id(),
+            "action_type": rng.choice(ACTION_TYPES),
+            "acted_by": "benchmark",
+        })),
+        "create_actions_bulk": ("POST", lambda: ("/actions/bulk", {
+            "contract_ids": rng.sample(range(1, args.contracts + 1), min(200, args.contracts)),
+            "action_type": rng.choice(["approve", "reject", "reopen"]),
+            "acted_by": "benchmark",
+        })),
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, method, make_request, total, concurrency, query_counter):
+    """Issue `total` requests with at most `concurrency` in flight"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        path, payload = make_request()
+        async with semaphore:
+            started = time.perf_counter()
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            errors += 1
+
+    queries_before = query_counter["count"]
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "requests_per_sec": round(total / elapsed, 1),
+        "queries_per_request": round((query_counter["count"] - queries_before) / total, 2),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return human-readable regressions of p95 latency against the baseline"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        allowed = previous["p95_ms"] * (1 + tolerance)
+        if result["p95_ms"] > allowed:
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms > {allowed:.3f}ms "
+                f"(baseline {previous['p95_ms']}ms + {tolerance:.0%})"
+            )
+        if result["queries_per_request"] > previous["queries_per_request"]:
+            regressions.append(
+                f"{name}: {result['queries_per_request']} queries/request "
+                f"(baseline {previous['queries_per_request']})"
+            )
+    return regressions
+
+
+def print_report(results):
+    header = f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'q/req':>8}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<28}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['requests_per_sec']:>10}{r['queries_per_request']:>8}{r['errors']:>8}")
+
+
+async def run(args):
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy import event
+
+    from main import app
+    from models.database import engine
+
+    query_counter = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        query_counter["count"] += 1
+
+    scenarios = build_scenarios(args)
+    selected = args.scenario or list(scenarios)
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            method, make_request = scenarios[name]
+            # Warm up connections and caches before measuring
+            await run_scenario(client, method, make_request, min(20, args.requests), args.concurrency, query_counter)
+            results[name] = await run_scenario(
+                client, method, make_request, args.requests, args.concurrency, query_counter
+            )
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    database = Path(args.database).resolve()
+    # Point the app at the benchmark database before it is imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+
+    from models.database import engine, init_db
+
+    if args.reseed and database.exists():
+        engine.dispose()
+        database.unlink()
+    if not database.exists():
+        init_db()
+        print(f"Seeding {database} ...")
+        started = time.perf_counter()
+        seed_database(engine, args)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+
+    if baseline_path.exists():
+        regressions = compare_to_baseline(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
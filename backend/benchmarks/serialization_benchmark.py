@@ -0,0 +1,107 @@
+"""
+List-page serialization benchmark.
+
+Compares the two ways of producing a 100-row list page:
+- response_model: ORM instances, Pydantic validation with from_attributes,
+  JSON-mode dump and json.dumps (what FastAPI does for a response_model)
+- fast: Core rows of the schema's columns encoded straight to JSON bytes
+  (utils.serialization, used by the list routes)
+
+Usage (from the backend directory):
+    python benchmarks/serialization_benchmark.py
+    python benchmarks/serialization_benchmark.py --pages 500 --page-size 100
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark list-page serialization paths")
+    parser.add_argument("--pages", type=int, default=300, help="Pages serialized per path and entity")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=20000, help="Rows seeded per benchmarked table")
+    return parser.parse_args(argv)
+
+
+def time_pages(render, pages: int) -> List[float]:
+    timings = []
+    for page in range(pages):
+        started = time.perf_counter()
+        render(page)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from sqlalchemy.orm import sessionmaker
+
+    from models.database import Base, create_db_engine
+    from models import Contract, Event
+    from schemas import ContractResponse, EventResponse
+    from seed_data import seed_bulk
+    from utils.serialization import dumps, fetch_dicts, projected_columns
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{directory}/serialization.db")
+        Base.metadata.create_all(bind=engine)
+        seed_bulk(engine, customers=1000, contracts=args.rows, events=args.rows, notes=0, actions=0,
+                  progress=lambda message: None)
+        db = sessionmaker(bind=engine)()
+
+        cases = {
+            "events": (Event, EventResponse, (Event.timestamp.desc(), Event.event_id.desc())),
+            "contracts": (Contract, ContractResponse, (Contract.contract_id,)),
+        }
+        max_offset = max(args.rows - args.page_size, 1)
+        print(f"{'list':<12}{'path':<16}{'median ms':>12}{'p95 ms':>10}{'bytes':>10}")
+        for name, (model, schema, order) in cases.items():
+            adapter = TypeAdapter(List[schema])
+
+            def response_model_page(page):
+                offset = page * args.page_size % max_offset
+                rows = db.query(model).order_by(*order).offset(offset).limit(args.page_size).all()
+                validated = adapter.validate_python(rows, from_attributes=True)
+                body = json.dumps(
+                    adapter.dump_python(validated, mode="json"),
+                    ensure_ascii=False, allow_nan=False, separators=(",", ":")
+                ).encode()
+                # Instances would be released with the session at the end of the request
+                db.expunge_all()
+                return body
+
+            def fast_page(page):
+                offset = page * args.page_size % max_offset
+                statement = select(*projected_columns(model, schema, None))
+                return dumps(fetch_dicts(db, statement.order_by(*order).offset(offset).limit(args.page_size)))
+
+            if response_model_page(0) != fast_page(0):
+                print(f"{name}: the two paths produce different bodies")
+            medians = {}
+            for path, render in (("response_model", response_model_page), ("fast", fast_page)):
+                time_pages(render, min(20, args.pages))  # warm up caches and the statement cache
+                timings = sorted(time_pages(render, args.pages))
+                medians[path] = statistics.median(timings)
+                p95 = timings[int(0.95 * (len(timings) - 1))]
+                print(f"{name:<12}{path:<16}{medians[path] * 1000:>12.3f}{p95 * 1000:>10.3f}"
+                      f"{len(render(0)):>10}")
+            print(f"{name:<12}{'speedup':<16}{medians['response_model'] / medians['fast']:>11.1f}x")
+        db.close()
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,100 @@
+import time
+
+# Start of the worker's cold start, before the application imports
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from routes import (
     customers_router,
     contracts_router,
     events_router,
     notes_router,
-    actions_router
+    actions_router,
+    stats_router,
+    search_router,
+    async_router
 )
-from models.database import init_db
+from routes.events import event_buffer
+from models.database import SessionLocal, engine, init_db
+from models.contract_expiration import expire_contracts
+from models.event_partition import archive_events, enforce_retention
+from models.summary import rebuild_event_summaries
+from models.event_rollup import rebuild_all_event_rollups, rollup_totals
+from utils.cache import invalidate_cache
+from utils.jobs import job_runner
+from utils.metrics import WORKER_STARTUP, QueryMetricsMiddleware, render_metrics
+import config
+
+logger = logging.getLogger(__name__)
+
+_imports_done = time.perf_counter()
+
+
+def expire_contracts_job() -> int:
+    """Move contracts past their expiration date to Expired"""
+    expired = expire_contracts(engine, config.CONTRACT_EXPIRATION_BATCH)
+    if expired:
+        invalidate_cache("contracts")
+    return expired
+
+
+def events_maintenance_job() -> int:
+    """Partition, archive and expire events (see partition_events.py)"""
+    moved = archive_events(engine, config.EVENTS_HOT_MONTHS)
+    enforce_retention(engine, config.EVENTS_RETENTION_MONTHS, config.EVENTS_ARCHIVE_DIR or None)
+    rebuild_event_summaries(engine)
+    return sum(moved.values())
+
+
+def rebuild_event_rollups_job() -> int:
+    """Recount the event timeline rollups from the events (repairs writes made outside the API)"""
+    return rebuild_all_event_rollups(engine)
+
+
+job_runner.add("expire_contracts", expire_contracts_job, config.CONTRACT_EXPIRATION_INTERVAL)
+job_runner.add("events_maintenance", events_maintenance_job, config.EVENTS_MAINTENANCE_INTERVAL)
+job_runner.add("rebuild_event_rollups", rebuild_event_rollups_job, config.EVENT_ROLLUP_REBUILD_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schema_started = time.perf_counter()
+    # Schema work runs here rather than at import, once per worker under a
+    # file lock; after the first worker it is a single fingerprint query
+    migrated = config.INIT_DB_ON_STARTUP and await asyncio.to_thread(init_db)
+    ready = time.perf_counter()
+    WORKER_STARTUP.observe(_imports_done - _import_started, phase="import")
+    WORKER_STARTUP.observe(ready - schema_started, phase="schema")
+    WORKER_STARTUP.observe(ready - _import_started, phase="total")
+    logger.info(
+        "Worker %d ready in %.3fs (imports %.3fs, schema %s in %.3fs)",
+        os.getpid(), ready - _import_started, _imports_done - _import_started,
+        "updated" if migrated else "checked", ready - schema_started
+    )
+    rollup_totals.start(engine)
+    if config.EVENT_BUFFER_ENABLED:
+        event_buffer.start(SessionLocal)
+    if config.JOBS_ENABLED:
+        job_runner.start()
+    yield
+    await job_runner.stop()
+    # Writes every event accepted before shutdown, then their rollup totals
+    await asyncio.to_thread(event_buffer.stop)
+    await asyncio.to_thread(rollup_totals.stop)
 
-# Initialize database
-init_db()
 
 app = FastAPI(
     title="Customer Contract Management Portal API",
     description="Internal portal for managing customer contracts and event logs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -25,14 +104,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "ETag", "Server-Timing"],
 )
 
+# Per-request query count, DB time and latency (Server-Timing header and /metrics)
+app.add_middleware(QueryMetricsMiddleware)
+
 # Include routers
+if config.DB_ASYNC:
+    # Async handlers are matched first and take over the paths they define
+    app.include_router(async_router)
 app.include_router(customers_router)
 app.include_router(contracts_router)
 app.include_router(events_router)
 app.include_router(notes_router)
 app.include_router(actions_router)
+app.include_router(stats_router)
+app.include_router(search_router)
 
 
 @app.get("/")
@@ -49,6 +137,18 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/jobs")
+def jobs():
+    """Schedule and latest outcome of each background job"""
+    return job_runner.status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request latency, DB time and query count histograms in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,9 +1,10 @@
-from models.database import Base, engine, SessionLocal, get_db
+from models.database import Base, engine, SessionLocal, get_db, get_async_db
 from models.customer import Customer
 from models.contract import Contract
 from models.event import Event
 from models.note import Note
 from models.action import Action
+from models.event_rollup import EventRollup, EventRollupTotal
 
 __all__ = [
     "Base",
@@ -14,4 +15,6 @@ __all__ = [
     "Event",
     "Note",
     "Action",
+    "EventRollup",
+    "EventRollupTotal",
 ]
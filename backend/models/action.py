@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from models.database import Base
@@ -7,6 +7,10 @@ from models.database import Base
 class Action(Base):
     """Action model for contract lifecycle actions"""
     __tablename__ = "actions"
+    __table_args__ = (
+        Index("ix_actions_contract_id_acted_at", "contract_id", "acted_at"),
+        Index("ix_actions_acted_at", "acted_at"),
+    )
 
     action_id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.contract_id"), nullable=False, index=True)
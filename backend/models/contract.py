@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from models.database import Base
@@ -7,6 +7,13 @@ from models.database import Base
 class Contract(Base):
     """Contract model"""
     __tablename__ = "contracts"
+    __table_args__ = (
+        Index("ix_contracts_customer_id_status", "customer_id", "status"),
+        Index("ix_contracts_expiration_date", "expiration_date"),
+        # Lapsed contracts of one status, oldest first (contract expiration job);
+        # also serves status filters, so status needs no index of its own
+        Index("ix_contracts_status_expiration_date", "status", "expiration_date"),
+    )
 
     contract_id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.customer_id"), nullable=False, index=True)
@@ -22,6 +29,10 @@ class Contract(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Summary counters maintained by the write handlers (see models/summary.py)
+    notes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    actions_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relationships
     customer = relationship("Customer", back_populates="contracts")
     notes = relationship("Note", back_populates="contract", cascade="all, delete-orphan")
@@ -0,0 +1,90 @@
+"""
+Expiration of contracts past their expiration_date.
+
+expire_contracts() moves Approved/Active contracts whose expiration_date
+has passed to Expired, a batch at a time: one set-based UPDATE per batch
+selects the oldest lapsed contracts of one status with a range seek on
+ix_contracts_status_expiration_date and returns the rows it changed, then
+one executemany writes an "expire" action for each of them. Only rows the UPDATE actually changed get an
+action, so concurrent runs (e.g. one per worker process) never expire a
+contract twice.
+
+Expiration dates are compared with the current UTC time, the time base of
+every timestamp the API writes, and the expire actions are stamped with it.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from models.database import utc_now
+from models.contract import Contract
+from models.action import Action
+from models.search_index import index_documents
+
+# Statuses that lapse to EXPIRED_STATUS once expiration_date has passed
+EXPIRABLE_STATUSES = ("Approved", "Active")
+EXPIRED_STATUS = "Expired"
+
+EXPIRE_ACTION = "expire"
+EXPIRE_ACTOR = "system"
+
+
+def expire_contracts(bind, batch_size: int = 1000, now: Optional[datetime] = None) -> int:
+    """Expire every lapsed contract in transactions of `batch_size`; returns the number expired"""
+    now = now or utc_now()
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    expired = 0
+    for prior_status in EXPIRABLE_STATUSES:
+        while True:
+            with Session(bind) as db, db.begin():
+                count = _expire_batch(db, prior_status, batch_size, now)
+            expired += count
+            if count < batch_size:
+                break
+    return expired
+
+
+def _expire_batch(db: Session, prior_status: str, batch_size: int, now: datetime) -> int:
+    batch = (
+        select(Contract.contract_id)
+        .where(Contract.expiration_date < now, Contract.status == prior_status)
+        .order_by(Contract.expiration_date)
+        .limit(batch_size)
+    )
+    # The status condition is repeated so a row changed since the subquery
+    # ran (by a concurrent run) is not updated or returned again
+    contract_ids = db.scalars(
+        update(Contract)
+        .where(Contract.contract_id.in_(batch.scalar_subquery()), Contract.status == prior_status)
+        .values(
+            status=EXPIRED_STATUS,
+            last_action_at=now,
+            updated_by=EXPIRE_ACTOR,
+            actions_count=Contract.actions_count + 1,
+        )
+        .returning(Contract.contract_id),
+        execution_options={"synchronize_session": False}
+    ).all()
+    if not contract_ids:
+        return 0
+
+    action_ids = db.scalars(
+        insert(Action).returning(Action.action_id, sort_by_parameter_order=True),
+        [
+            {
+                "contract_id": contract_id,
+                "action_type": EXPIRE_ACTION,
+                "action_note": "Expiration date passed",
+                "acted_by": EXPIRE_ACTOR,
+                "acted_at": now,
+                "prior_status": prior_status,
+                "new_status": EXPIRED_STATUS,
+            }
+            for contract_id in contract_ids
+        ]
+    ).all()
+    index_documents(db, "action", Action.action_id.in_(action_ids))
+    return len(contract_ids)
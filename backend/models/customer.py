@@ -18,6 +18,13 @@ class Customer(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Summary counters maintained by the write handlers (see models/summary.py)
+    contracts_count = Column(Integer, nullable=False, default=0, server_default="0")
+    open_approvals_count = Column(Integer, nullable=False, default=0, server_default="0")
+    events_count = Column(Integer, nullable=False, default=0, server_default="0")
+    recent_events_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_event_at = Column(DateTime(timezone=True), nullable=True)
+
     # Relationships
     contracts = relationship("Contract", back_populates="customer", cascade="all, delete-orphan")
     events = relationship("Event", back_populates="customer", cascade="all, delete-orphan")
@@ -1,16 +1,76 @@
-from sqlalchemy import create_engine
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from sqlalchemy import Column, MetaData, String, Table, create_engine, event, inspect, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.schema import CreateColumn
+import config
+from utils.locks import file_lock
+from utils.metrics import instrument_engine
 
-# SQLite database path
-SQLALCHEMY_DATABASE_URL = "sqlite:///./customer_contracts.db"
+logger = logging.getLogger(__name__)
+
+# Database URL (SQLite by default, override with DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection for concurrent reads during writes"""
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers proceed while a write is in progress, and with
+        # synchronous=NORMAL a commit only fsyncs at checkpoints
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={int(config.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA temp_store={config.SQLITE_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
+def pool_pre_ping(is_sqlite: bool) -> bool:
+    """DB_POOL_PRE_PING, defaulting to off for SQLite, whose local connections do not go stale"""
+    if config.DB_POOL_PRE_PING is None:
+        return not is_sqlite
+    return config.DB_POOL_PRE_PING
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Create an engine with the configured pool and, for SQLite, PRAGMAs"""
+    url_obj = make_url(url)
+    is_sqlite = url_obj.get_backend_name() == "sqlite"
+    engine_args = {"pool_pre_ping": pool_pre_ping(is_sqlite)}
+
+    if is_sqlite:
+        # Connections are shared across FastAPI's threadpool
+        engine_args["connect_args"] = {"check_same_thread": False}
+
+    # In-memory SQLite keeps SQLAlchemy's SingletonThreadPool: one connection,
+    # and so one separate database, per thread; there is no pool to size
+    if not (is_sqlite and url_obj.database in (None, "", ":memory:")):
+        engine_args.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+
+    db_engine = create_engine(url, **engine_args)
+    if is_sqlite:
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    instrument_engine(db_engine)
+    return db_engine
 
-# Create engine with check_same_thread=False for SQLite
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+
+engine = create_db_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,6 +78,67 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class for models
 Base = declarative_base()
 
+# Sync driver -> async driver used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Translate a sync database URL to the matching async driver"""
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url_obj.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str = None):
+    """Create an AsyncEngine with the same pool settings and PRAGMAs as the sync engine"""
+    # Imported here so the async drivers stay optional for sync deployments
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    url = url or config.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+    url_obj = make_url(url)
+    is_sqlite = url_obj.get_backend_name() == "sqlite"
+    engine_args = {"pool_pre_ping": pool_pre_ping(is_sqlite)}
+
+    if not (is_sqlite and url_obj.database in (None, "", ":memory:")):
+        engine_args.update(
+            # aiosqlite defaults to NullPool, which would reopen the file
+            # and re-run the PRAGMAs on every request
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+
+    db_engine = create_async_engine(url, **engine_args)
+    if is_sqlite:
+        event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+
+# The async engine is built on first use so aiosqlite/asyncpg are only
+# needed when the async routes are enabled
+_async_session_factory = None
+
+
+def get_async_sessionmaker():
+    """Return the AsyncSession factory, creating the async engine on first use"""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_session_factory = async_sessionmaker(
+            bind=create_async_db_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory
+
 
 def get_db():
     """Dependency for getting database session"""
@@ -28,13 +149,162 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Initialize database tables"""
-    # Import all models to ensure they are registered with Base
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+# Fingerprint of the schema init_db() last brought the database up to, and
+# applied migrations and backfill progress (models/migrations.py). Kept out
+# of Base.metadata so dropping the model tables leaves it alone.
+schema_state = Table(
+    "schema_state", MetaData(),
+    Column("key", String, primary_key=True),
+    Column("value", String, nullable=False),
+)
+
+
+def utc_now() -> datetime:
+    """Current UTC time, naive like the CURRENT_TIMESTAMP values SQLite stores"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def read_state(conn, key: str) -> Optional[str]:
+    return conn.scalar(select(schema_state.c.value).where(schema_state.c.key == key))
+
+
+def write_state(conn, key: str, value: str):
+    conn.execute(schema_state.delete().where(schema_state.c.key == key))
+    conn.execute(schema_state.insert().values(key=key, value=value))
+
+
+def _register_models():
+    """Import all models to ensure they are registered with Base"""
     from models.customer import Customer  # noqa
     from models.contract import Contract  # noqa
     from models.event import Event  # noqa
     from models.note import Note  # noqa
     from models.action import Action  # noqa
-    
-    Base.metadata.create_all(bind=engine)
+    from models.event_rollup import EventRollup, EventRollupTotal  # noqa
+    from models import search_index  # noqa: creates the full-text index with the tables
+
+
+def schema_fingerprint(bind) -> str:
+    """Hash of the tables, columns and indexes declared on the models, and of the migrations"""
+    from models.migrations import MIGRATIONS
+
+    _register_models()
+    parts = [f"migration {migration.id}" for migration in MIGRATIONS]
+    for table in Base.metadata.sorted_tables:
+        parts.extend(f"{table.name}.{column.name} {column.type.compile(bind.dialect)}" for column in table.columns)
+        parts.extend(f"{table.name} index {index.name}" for index in table.indexes)
+    return hashlib.sha1("\n".join(sorted(parts)).encode()).hexdigest()
+
+
+def schema_lock_path(bind) -> str:
+    """Lock file serializing init_db() across processes: next to a SQLite file, else in the temp dir"""
+    if config.SCHEMA_LOCK_FILE:
+        return config.SCHEMA_LOCK_FILE
+    database = bind.url.database if bind.url.get_backend_name() == "sqlite" else None
+    if database and database != ":memory:":
+        return os.path.abspath(database) + ".schema.lock"
+    return os.path.join(tempfile.gettempdir(), "customer-contracts-schema.lock")
+
+
+def init_db(bind=None, force: bool = False, progress: Callable[[str], None] = None) -> bool:
+    """
+    Bring the database up to the models and migrations; returns False when it already was.
+
+    Runs under an inter-process file lock, so worker processes starting
+    together migrate once: the others wait, then find the fingerprint
+    stored by the first one and return after a single query. `force`
+    re-checks every table, column, index and migration regardless of the
+    fingerprint. Step timings go to `progress` (default: the log).
+    """
+    from models.migrations import migrate
+
+    bind = bind if bind is not None else engine
+    fingerprint = schema_fingerprint(bind)
+    with file_lock(schema_lock_path(bind)):
+        schema_state.create(bind, checkfirst=True)
+        with bind.connect() as conn:
+            stored = read_state(conn, "fingerprint")
+        if stored == fingerprint and not force:
+            return False
+
+        migrate(bind, progress or logger.info)
+        with bind.begin() as conn:
+            write_state(conn, "fingerprint", fingerprint)
+    return True
+
+
+def add_column_ddl(table: Table, column: Column, dialect) -> str:
+    """
+    ALTER TABLE statement adding `column` to `table`.
+
+    The column clause is compiled by the dialect, as create_all() would, so
+    server defaults come out as the dialect renders them: quoted literals,
+    and func/text() defaults as SQL (func.now() is CURRENT_TIMESTAMP on
+    SQLite, now() on PostgreSQL).
+    """
+    preparer = dialect.identifier_preparer
+    return f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {CreateColumn(column).compile(dialect=dialect)}"
+
+
+def create_missing_columns(bind) -> list:
+    """
+    Add columns declared on the models that an existing table lacks.
+
+    Like indexes, columns added to a model after its table exists are not
+    created by create_all(). New columns must be nullable or have a server
+    default; SQLite only adds columns whose default is a constant. Returns
+    the added columns as "table.column".
+    """
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                # Driver-level, so a colon in a default is not read as a bind parameter
+                conn.exec_driver_sql(add_column_ddl(table, column, bind.dialect))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(bind, progress: Callable[[str], None] = None) -> list:
+    """
+    Create indexes declared on the models that an existing database lacks.
+
+    create_all() only creates missing tables, so indexes added to a model
+    after its table exists have to be created separately. On PostgreSQL
+    they are built CONCURRENTLY, without blocking writes. Returns the
+    names of the created indexes.
+    """
+    inspector = inspect(bind)
+    online = bind.dialect.name == "postgresql"
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            started = time.perf_counter()
+            if online:
+                # CONCURRENTLY cannot run inside a transaction
+                index.dialect_options["postgresql"]["concurrently"] = True
+                with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    index.create(bind=conn)
+            else:
+                index.create(bind=bind)
+            created.append(index.name)
+            if progress:
+                progress(f"  created index {index.name} in {time.perf_counter() - started:.2f}s")
+    return created
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from models.database import Base
@@ -7,6 +7,16 @@ from models.database import Base
 class Event(Base):
     """Event model for logging customer activities"""
     __tablename__ = "events"
+    __table_args__ = (
+        # Each list filter followed by the newest-first sort; SQLite appends
+        # the rowid (event_id) to every index, which covers the tie-breaker
+        Index("ix_events_customer_id_timestamp", "customer_id", "timestamp"),
+        Index("ix_events_event_type_timestamp", "event_type", "timestamp"),
+        Index("ix_events_timestamp", "timestamp"),
+        # Archiving moves the highest rowids out of this table; AUTOINCREMENT
+        # keeps SQLite from handing them out again (see event_partition.py)
+        {"sqlite_autoincrement": True},
+    )
 
     event_id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.customer_id"), nullable=False, index=True)
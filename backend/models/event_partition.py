@@ -0,0 +1,340 @@
+"""
+Monthly partitions for the events table.
+
+New events are always written to the `events` table, which acts as the hot
+partition. archive_events() moves every month older than the hot window
+into its own `events_YYYY_MM` table with the same columns and indexes, and
+enforce_retention() writes partitions past the retention period to gzip
+NDJSON files and drops them. Readers go through events_union(), which
+combines the hot table with only the partitions overlapping the requested
+date range.
+
+Every process caches the partition list. Maintenance, which usually runs
+in another process, records each change in the "event_partitions" row of
+schema_state: a generation and the partitions about to be dropped.
+list_partitions() compares that row at most every PARTITION_CHECK_INTERVAL
+seconds and lists the tables again when it changed. archive_events() waits
+PARTITION_SETTLE_SECONDS after creating a partition before moving rows into
+it, and enforce_retention() waits as long after retiring a partition before
+dropping it, so no worker misses moved events or queries a dropped table.
+
+Event IDs stay unique across the hot table and the partitions because they
+are never reused: on SQLite `events` is an AUTOINCREMENT table whose
+sequence starts after the highest ID in any partition (ensure_event_id_sequence,
+run by migration 0003), and PostgreSQL sequences never go back.
+"""
+import gzip
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import (
+    Column, Index, MetaData, String, Table, delete, func, inspect, insert, select, text, type_coerce, union_all
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from models.database import read_state, schema_state, utc_now, write_state
+from models.event import Event
+
+PARTITION_NAME = re.compile(r"^events_(\d{4})_(\d{2})$")
+
+# Partition tables are kept out of Base.metadata so create_all() never creates them
+partition_metadata = MetaData()
+
+# Partition names are re-read from the database at least this often (seconds)
+PARTITION_LIST_TTL = 60
+# Seconds between checks of the stored partition state
+PARTITION_CHECK_INTERVAL = 1
+# How long maintenance waits for every worker to see a partition change
+PARTITION_SETTLE_SECONDS = 3
+PARTITION_STATE_KEY = "event_partitions"
+
+
+class _PartitionList:
+    """Partition names cached for one database, with the stored state they were listed under"""
+
+    def __init__(self, names: List[str], state: Optional[str], has_state: bool):
+        self.names = names
+        self.state = state
+        self.has_state = has_state
+        self.listed_at = self.checked_at = time.monotonic()
+
+
+# Database URL -> _PartitionList
+_partition_lists = {}
+_partition_lock = threading.Lock()
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + (value.month == 12), value.month % 12 + 1, 1)
+
+
+def months_before(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 - count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"events_{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> datetime:
+    year, month = PARTITION_NAME.match(name).groups()
+    return datetime(int(year), int(month), 1)
+
+
+def _month_bound(month: datetime) -> str:
+    """
+    Month boundary as a date-only string.
+
+    Timestamps are compared in their stored form (as in keyset pagination):
+    a date-only bound sorts correctly against both the microsecond format
+    SQLAlchemy writes and the shorter format of server-default timestamps.
+    """
+    return month.strftime("%Y-%m-%d")
+
+
+def _in_month(columns, month: datetime):
+    stored = type_coerce(columns.timestamp, String)
+    return (stored >= _month_bound(month)) & (stored < _month_bound(next_month(month)))
+
+
+def partition_table(name: str) -> Table:
+    """Table object for a partition, with the events columns and list indexes"""
+    if name in partition_metadata.tables:
+        return partition_metadata.tables[name]
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in Event.__table__.columns
+    ]
+    return Table(
+        name,
+        partition_metadata,
+        *columns,
+        Index(f"ix_{name}_customer_id_timestamp", "customer_id", "timestamp"),
+        Index(f"ix_{name}_event_type_timestamp", "event_type", "timestamp"),
+        Index(f"ix_{name}_timestamp", "timestamp"),
+    )
+
+
+def _read_partition_state(bind) -> Optional[str]:
+    if isinstance(bind, Connection):
+        return read_state(bind, PARTITION_STATE_KEY)
+    with bind.connect() as conn:
+        return read_state(conn, PARTITION_STATE_KEY)
+
+
+def list_partitions(bind, refresh: bool = False) -> List[str]:
+    """
+    Names of readable partitions, oldest first.
+
+    Cached per process; listed again when the stored partition state has
+    changed (checked every PARTITION_CHECK_INTERVAL) or after
+    PARTITION_LIST_TTL. Partitions retired for dropping are left out.
+    """
+    key = str(bind.engine.url)
+    with _partition_lock:
+        cached = _partition_lists.get(key)
+        now = time.monotonic()
+        if not refresh and cached is not None and now - cached.listed_at <= PARTITION_LIST_TTL:
+            if not cached.has_state or now - cached.checked_at < PARTITION_CHECK_INTERVAL:
+                return list(cached.names)
+            cached.checked_at = now
+            if _read_partition_state(bind) == cached.state:
+                return list(cached.names)
+
+        tables = inspect(bind).get_table_names()
+        has_state = schema_state.name in tables
+        state = _read_partition_state(bind) if has_state else None
+        retiring = set(json.loads(state)["retiring"]) if state else set()
+        names = sorted(name for name in tables if PARTITION_NAME.match(name) and name not in retiring)
+        _partition_lists[key] = _PartitionList(names, state, has_state)
+        return list(names)
+
+
+def _record_partition_change(bind, retiring: List[str]):
+    """Bump the stored partition generation so every worker lists the partitions again"""
+    schema_state.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        state = read_state(conn, PARTITION_STATE_KEY)
+        generation = json.loads(state)["generation"] + 1 if state else 1
+        write_state(conn, PARTITION_STATE_KEY, json.dumps({"generation": generation, "retiring": retiring}))
+    list_partitions(bind, refresh=True)
+
+
+def partitions_for_range(bind, start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None) -> List[Table]:
+    """Partitions that can hold events between start_date and end_date (pruning)"""
+    tables = []
+    for name in list_partitions(bind):
+        month = partition_month(name)
+        if start_date and next_month(month) <= month_start(start_date.replace(tzinfo=None)):
+            continue
+        if end_date and month > end_date.replace(tzinfo=None):
+            continue
+        tables.append(partition_table(name))
+    return tables
+
+
+def event_tables(bind, refresh: bool = False) -> List[Table]:
+    """The hot events table followed by every partition"""
+    return [Event.__table__] + [partition_table(name) for name in list_partitions(bind, refresh)]
+
+
+def ensure_event_id_sequence(conn) -> int:
+    """
+    Make SQLite never reuse event IDs; returns the number of events copied.
+
+    A database created before `events` was declared AUTOINCREMENT has the
+    table rebuilt with it (renamed, recreated with its indexes, copied and
+    dropped, in the caller's transaction). The sequence is then raised to
+    the highest ID in the hot table or any partition, since IDs archived
+    out of the table would otherwise be handed out again.
+    """
+    if conn.dialect.name != "sqlite":
+        return 0
+    copied = 0
+    definition = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'events'"))
+    if "AUTOINCREMENT" not in definition.upper():
+        conn.execute(text("ALTER TABLE events RENAME TO events_rebuild"))
+        # The indexes moved with the old table; free their names for the new one
+        for index in inspect(conn).get_indexes("events_rebuild"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        # Indexes are built after the copy, which is several times faster
+        conn.execute(CreateTable(Event.__table__))
+        columns = ", ".join(f'"{column.name}"' for column in Event.__table__.columns)
+        copied = conn.execute(text(f"INSERT INTO events ({columns}) SELECT {columns} FROM events_rebuild")).rowcount
+        conn.execute(text("DROP TABLE events_rebuild"))
+        for index in Event.__table__.indexes:
+            index.create(conn)
+
+    highest = max(conn.scalar(select(func.max(table.c.event_id))) or 0 for table in event_tables(conn, refresh=True))
+    sequence = conn.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = 'events'"))
+    if sequence is None:
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('events', :seq)"), {"seq": highest})
+    elif sequence < highest:
+        conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'events'"), {"seq": highest})
+    return copied
+
+
+def events_union(tables: List[Table], build_branch):
+    """
+    UNION ALL of `build_branch(table)` over the hot table and the given partitions.
+
+    build_branch receives each table and returns a select of all its columns
+    (typically filtered, ordered and limited); the result is a subquery that
+    can be mapped onto Event with aliased().
+    """
+    branches = [
+        select(build_branch(table).subquery())
+        for table in [Event.__table__, *tables]
+    ]
+    return union_all(*branches).subquery("events_all")
+
+
+def archive_events(bind, hot_months: int, batch_size: int = 10000, now: datetime = None) -> dict:
+    """
+    Move events older than the hot window into monthly partitions.
+
+    The hot window is the current (UTC) month plus the `hot_months - 1`
+    before it, since event timestamps are written in UTC.
+    Rows are moved in batches of `batch_size`, each batch in its own
+    transaction, so writers are only blocked briefly. Returns the number of
+    rows moved per partition.
+    """
+    cutoff = months_before(month_start(now or utc_now()), max(hot_months, 1) - 1)
+    hot = Event.__table__
+    moved = {}
+
+    while True:
+        # Months are moved oldest first, so no empty partition is ever created
+        with bind.connect() as conn:
+            oldest = conn.execute(
+                select(type_coerce(hot.c.timestamp, String)).order_by(hot.c.timestamp).limit(1)
+            ).scalar()
+        if oldest is None:
+            break
+        month = month_start(datetime.fromisoformat(oldest[:10]))
+        if month >= cutoff:
+            break
+
+        name = partition_name(month)
+        table = partition_table(name)
+        if not inspect(bind).has_table(name):
+            table.create(bind=bind)
+            # Workers must read the new partition before events move into it
+            _record_partition_change(bind, [])
+            time.sleep(PARTITION_SETTLE_SECONDS)
+        moved.setdefault(name, 0)
+        while True:
+            with bind.begin() as conn:
+                ids = conn.execute(
+                    select(hot.c.event_id).where(_in_month(hot.c, month)).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                conn.execute(insert(table).from_select(
+                    [column.name for column in hot.columns],
+                    select(hot).where(hot.c.event_id.in_(ids))
+                ))
+                conn.execute(delete(hot).where(hot.c.event_id.in_(ids)))
+            moved[name] += len(ids)
+        if not moved[name]:
+            raise RuntimeError(f"Could not match the oldest event timestamp {oldest!r} to {name}")
+
+    list_partitions(bind, refresh=True)
+    return moved
+
+
+def enforce_retention(bind, retention_months: int, archive_dir: Optional[str] = None,
+                      now: datetime = None) -> List[str]:
+    """
+    Drop partitions older than `retention_months` (counted from the current
+    UTC month), archiving them first.
+
+    With an archive directory, each partition is written to
+    `<archive_dir>/<partition>.ndjson.gz` before it is dropped. Returns the
+    names of the dropped partitions.
+    """
+    if retention_months <= 0:
+        return []
+    oldest_kept = months_before(month_start(now or utc_now()), retention_months)
+
+    # Listed from the tables, so partitions retired by an interrupted run are dropped too
+    expired = sorted(
+        name for name in inspect(bind).get_table_names()
+        if PARTITION_NAME.match(name) and partition_month(name) < oldest_kept
+    )
+    if not expired:
+        return []
+    for name in expired:
+        if archive_dir:
+            _write_archive(bind, partition_table(name), Path(archive_dir) / f"{name}.ndjson.gz")
+
+    # Workers must stop reading the partitions before they are dropped
+    _record_partition_change(bind, expired)
+    time.sleep(PARTITION_SETTLE_SECONDS)
+    for name in expired:
+        partition_table(name).drop(bind=bind)
+    _record_partition_change(bind, [])
+    return expired
+
+
+def _write_archive(bind, table: Table, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    with bind.connect() as conn, gzip.open(partial, "wt", encoding="utf-8") as archive:
+        result = conn.execute(select(table).order_by(table.c.event_id).execution_options(yield_per=5000))
+        for row in result.mappings():
+            archive.write(json.dumps(dict(row), default=str) + "\n")
+    # Only a complete archive gets the final name
+    partial.replace(path)
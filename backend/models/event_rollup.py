@@ -0,0 +1,327 @@
+"""
+Pre-aggregated event counts for timeline charts.
+
+event_rollups holds the number of events per customer, event type and
+channel in hourly and daily buckets (UTC, like event timestamps), and
+event_rollup_totals the same counts summed over all customers, so timelines
+across every customer read a few rows per bucket. The event write paths
+add to event_rollups in the same transaction as the events (one upserted
+row per bucket and granularity), so per-customer timelines are exact for
+every bucket, including the current one.
+
+Every event would otherwise upsert the same few event_rollup_totals rows,
+so all writers would queue on them. Once rollup_totals is started (by the
+app's lifespan), committed increments are summed per process instead and
+written every EVENT_ROLLUP_FLUSH_MS by a flusher thread, one upsert per
+bucket per flush: all-customer timelines lag by up to that interval, and
+the increments of a process that dies before its flush are lost until the
+rollups are rebuilt. Without the flusher (scripts, tests) they are written
+in the event's transaction. Deleting an event or a customer subtracts from
+both tables directly. GET /events/timeline reads them instead of the raw
+events.
+
+rebuild_event_rollups() recounts the rollups of a range of customers from
+the hot table and the partitions with one GROUP BY per granularity, and
+moves the totals by the difference. The 0002 migration runs it in batches
+to fill the rollups of existing events; rebuild_all_event_rollups() (the
+rebuild_event_rollups job, also run by seed_data.py) repairs them after
+events were written outside the API. Rollups are kept when partitions are
+dropped by retention, so timelines keep their history.
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Tuple
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Integer, String, and_, delete, event, func, literal, select, union_all, update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import config
+from models.database import Base
+from models.customer import Customer
+from models.event_partition import event_tables
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+
+# Rollup rows per upsert statement
+ROLLUP_CHUNK = 5000
+
+# Bucket starts in SQLAlchemy's SQLite DateTime storage format
+_SQLITE_BUCKET_FORMATS = {"hour": "%Y-%m-%d %H:00:00.000000", "day": "%Y-%m-%d 00:00:00.000000"}
+
+
+class EventRollup(Base):
+    """Event count per customer, event type, channel and hourly or daily bucket"""
+    __tablename__ = "event_rollups"
+
+    granularity = Column(String(4), primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.customer_id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    channel = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class EventRollupTotal(Base):
+    """Event count per event type, channel and hourly or daily bucket, over all customers"""
+    __tablename__ = "event_rollup_totals"
+
+    granularity = Column(String(4), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    channel = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Columns shared by both tables, in EventRollupTotal's primary key order
+_TOTAL_KEYS = ("granularity", "bucket_start", "event_type", "channel")
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the (UTC) hour or day containing `timestamp`"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    start = timestamp.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if granularity == "day" else start
+
+
+def bucket_width(granularity: str) -> timedelta:
+    return timedelta(days=1) if granularity == "day" else timedelta(hours=1)
+
+
+def _sql_bucket_start(timestamp, granularity: str, dialect_name: str):
+    """bucket_start() as a SQL expression"""
+    if dialect_name == "postgresql":
+        return func.date_trunc(granularity, func.timezone("UTC", timestamp))
+    return func.strftime(_SQLITE_BUCKET_FORMATS[granularity], timestamp)
+
+
+def _add_counts(conn, table, rows=None, from_select=None):
+    """Upsert counts into `table`, adding to existing rows; from dicts or a select of all columns"""
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(table)
+    if from_select is not None:
+        statement = statement.from_select([column.name for column in table.columns], from_select)
+    statement = statement.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={"count": table.c.count + statement.excluded["count"]},
+    )
+    if from_select is not None:
+        conn.execute(statement)
+        return
+    for start in range(0, len(rows), ROLLUP_CHUNK):
+        conn.execute(statement, rows[start:start + ROLLUP_CHUNK])
+
+
+def _total_rows(totals: Counter) -> list:
+    return [dict(zip(_TOTAL_KEYS, key), count=count) for key, count in totals.items()]
+
+
+class RollupTotals:
+    """Committed event_rollup_totals increments of this process, written by a flusher thread"""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._bind = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopping.is_set()
+
+    def start(self, bind):
+        """Start flushing to `bind` every flush_interval seconds"""
+        self._bind = bind
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-totals-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher once it has written every pending increment"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def add(self, totals: Counter):
+        with self._lock:
+            self._counts.update(totals)
+
+    def flush(self) -> int:
+        """Write the pending increments in one transaction; returns the number of rows upserted"""
+        with self._lock:
+            totals, self._counts = self._counts, Counter()
+        if not totals:
+            return 0
+        try:
+            with self._bind.begin() as conn:
+                _add_counts(conn, EventRollupTotal.__table__, _total_rows(totals))
+        except Exception:
+            # Kept for the next flush
+            self.add(totals)
+            raise
+        return len(totals)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            stopping = self._stopping.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing event rollup totals failed; retrying at the next flush")
+
+
+rollup_totals = RollupTotals(config.EVENT_ROLLUP_FLUSH_MS / 1000)
+
+# Session.info key of the totals of the session's open transaction
+_PENDING_TOTALS = "pending_rollup_totals"
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_totals(session):
+    totals = session.info.pop(_PENDING_TOTALS, None)
+    if totals:
+        rollup_totals.add(totals)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_totals(session):
+    session.info.pop(_PENDING_TOTALS, None)
+
+
+def rollups_added(db, events: Iterable[Tuple[int, str, str, datetime]]):
+    """Count new events given as (customer_id, event_type, channel, timestamp)"""
+    counts = Counter()
+    totals = Counter()
+    for customer_id, event_type, channel, timestamp in events:
+        for granularity in GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            counts[granularity, customer_id, start, event_type, channel] += 1
+            totals[granularity, start, event_type, channel] += 1
+    if not counts:
+        return
+    conn = db.connection()
+    _add_counts(conn, EventRollup.__table__, [
+        {"granularity": granularity, "customer_id": customer_id, "bucket_start": start,
+         "event_type": event_type, "channel": channel, "count": count}
+        for (granularity, customer_id, start, event_type, channel), count in counts.items()
+    ])
+    if rollup_totals.running:
+        # Handed to the flusher when the transaction commits
+        db.info.setdefault(_PENDING_TOTALS, Counter()).update(totals)
+    else:
+        _add_counts(conn, EventRollupTotal.__table__, _total_rows(totals))
+
+
+def rollup_removed(db, customer_id: int, event_type: str, channel: str, timestamp: datetime):
+    """Uncount a deleted event"""
+    for granularity in GRANULARITIES:
+        start = bucket_start(timestamp, granularity)
+        for model in (EventRollup, EventRollupTotal):
+            statement = update(model).where(
+                model.granularity == granularity,
+                model.bucket_start == start,
+                model.event_type == event_type,
+                model.channel == channel,
+            )
+            if model is EventRollup:
+                statement = statement.where(EventRollup.customer_id == customer_id)
+            db.execute(statement.values(count=model.count - 1),
+                       execution_options={"synchronize_session": False})
+
+
+def _customers(key_range):
+    # Every granularity is listed so the range seeks on the primary key
+    return and_(EventRollup.granularity.in_(GRANULARITIES), EventRollup.customer_id.between(*key_range))
+
+
+def _move_totals(conn, key_range, sign: int):
+    """Add (sign=1) or subtract (sign=-1) the rollups of a customer range to the totals"""
+    rollups = EventRollup.__table__
+    keys = [rollups.c[name] for name in _TOTAL_KEYS]
+    _add_counts(conn, EventRollupTotal.__table__, from_select=(
+        select(*keys, sign * func.sum(rollups.c.count)).where(_customers(key_range)).group_by(*keys)
+    ))
+
+
+def customer_rollups_removed(db, customer_id: int):
+    """Drop the rollups of a deleted customer"""
+    conn = db.connection()
+    _move_totals(conn, (customer_id, customer_id), -1)
+    conn.execute(delete(EventRollup.__table__).where(_customers((customer_id, customer_id))))
+
+
+def rebuild_event_rollups(conn, key_range=None) -> int:
+    """
+    Recount the rollups of all customers, or of those with IDs in the
+    inclusive `key_range`; returns the number of events counted.
+    """
+    rollups = EventRollup.__table__
+    totals = EventRollupTotal.__table__
+    # On SQLite, writing first takes the write lock, so no event is written
+    # between reading the events and writing their rollups
+    if key_range is None:
+        conn.execute(delete(totals))
+        conn.execute(delete(rollups))
+    else:
+        _move_totals(conn, key_range, -1)
+        conn.execute(delete(rollups).where(_customers(key_range)))
+
+    branches = []
+    for table in event_tables(conn, refresh=True):
+        branch = select(table.c.customer_id, table.c.event_type, table.c.channel, table.c.timestamp)
+        if key_range is not None:
+            branch = branch.where(table.c.customer_id.between(*key_range))
+        branches.append(branch)
+    events = union_all(*branches).subquery()
+    for granularity in GRANULARITIES:
+        start = _sql_bucket_start(events.c.timestamp, granularity, conn.dialect.name)
+        groups = (events.c.customer_id, start, events.c.event_type, events.c.channel)
+        conn.execute(rollups.insert().from_select(
+            ["granularity", "customer_id", "bucket_start", "event_type", "channel", "count"],
+            select(literal(granularity), *groups, func.count()).group_by(*groups),
+        ))
+
+    if key_range is None:
+        keys = [rollups.c[name] for name in _TOTAL_KEYS]
+        conn.execute(totals.insert().from_select(
+            [*_TOTAL_KEYS, "count"], select(*keys, func.sum(rollups.c.count)).group_by(*keys)
+        ))
+        counted = select(func.sum(rollups.c.count)).where(rollups.c.granularity == "day")
+    else:
+        _move_totals(conn, key_range, 1)
+        counted = (
+            select(func.sum(rollups.c.count))
+            .where(rollups.c.granularity == "day", rollups.c.customer_id.between(*key_range))
+        )
+    return conn.scalar(counted) or 0
+
+
+def rebuild_all_event_rollups(bind, batch_size: int = 500) -> int:
+    """rebuild_event_rollups() for every customer, in one transaction per `batch_size` customers"""
+    last = 0
+    total = 0
+    while True:
+        with bind.begin() as conn:
+            customer_ids = conn.scalars(
+                select(Customer.customer_id).where(Customer.customer_id > last)
+                .order_by(Customer.customer_id).limit(batch_size)
+            ).all()
+            if not customer_ids:
+                break
+            total += rebuild_event_rollups(conn, (customer_ids[0], customer_ids[-1]))
+        last = customer_ids[-1]
+        if len(customer_ids) < batch_size:
+            break
+    return total
@@ -0,0 +1,220 @@
+"""
+Schema migrations with batched, resumable data backfills.
+
+init_db() runs migrate() whenever the schema fingerprint changed. migrate()
+first brings the structure up to the models: create_all() for new tables,
+create_missing_columns() for new columns and create_missing_indexes() for
+new indexes (built CONCURRENTLY on PostgreSQL so writes continue; SQLite
+holds the write lock while it builds an index, readers carry on under
+WAL). It then applies, in order, the MIGRATIONS not yet recorded in the
+schema_state table. Append new migrations to MIGRATIONS; their IDs are part
+of the schema fingerprint, so a release with a new one migrates on start.
+
+A migration is a list of steps. A Backfill walks a table in primary-key
+order and commits every batch of `batch_size` keys in its own transaction,
+together with the last key it processed, so writers wait for one batch at
+most and an interrupted backfill resumes after its last committed batch
+the next time migrations run. A Call runs a structural change, such as a
+table rebuild, in a single transaction. Completed steps are recorded too,
+and a migration is recorded once all its steps are, so steps must be safe
+to re-run.
+
+Every step reports its duration, and long backfills their progress,
+through the `progress` callback (logged at startup, printed by migrate.py).
+"""
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, select, text
+
+import config
+from models.database import (
+    Base, create_missing_columns, create_missing_indexes, read_state, schema_state, write_state,
+)
+from models.customer import Customer
+from models.contract import Contract
+from models.summary import rebuild_contract_counters, rebuild_customer_counters, rebuild_event_counters
+from models.event_rollup import rebuild_event_rollups
+from models.event_partition import ensure_event_id_sequence
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+
+# Seconds between progress reports of a running backfill
+PROGRESS_INTERVAL = 5
+
+
+class Step(ABC):
+    """One unit of a migration; run() returns the rows it affected"""
+
+    name = ""
+
+    @abstractmethod
+    def run(self, bind, state_key: str, progress: Callable[[str], None]) -> int:
+        """Apply the step, resuming from the progress stored under `state_key`"""
+
+
+class Backfill(Step):
+    """
+    Call `apply(conn, (low, high))` for consecutive ranges of `key_column`.
+
+    Each range holds up to `batch_size` existing keys; `apply` updates the
+    rows whose key lies in the inclusive range and returns their number.
+    """
+
+    def __init__(self, name: str, key_column, apply: Callable, batch_size: Optional[int] = None):
+        self.name = name
+        self.key_column = key_column
+        self.apply = apply
+        self.batch_size = batch_size
+
+    def run(self, bind, state_key, progress) -> int:
+        batch_size = self.batch_size or config.MIGRATION_BATCH_SIZE
+        with bind.connect() as conn:
+            last = read_state(conn, state_key)
+        if last is not None:
+            last = int(last)
+            progress(f"  {self.name}: resuming after key {last}")
+
+        rows = batches = 0
+        reported = time.perf_counter()
+        while True:
+            with bind.begin() as conn:
+                keys = select(self.key_column).order_by(self.key_column).limit(batch_size)
+                if last is not None:
+                    keys = keys.where(self.key_column > last)
+                keys = conn.scalars(keys).all()
+                if not keys:
+                    break
+                rows += self.apply(conn, (keys[0], keys[-1])) or 0
+                last = keys[-1]
+                write_state(conn, state_key, str(last))
+            batches += 1
+            if time.perf_counter() - reported >= PROGRESS_INTERVAL:
+                reported = time.perf_counter()
+                progress(f"  {self.name}: {batches} batches, {rows} rows, up to key {last}")
+            if len(keys) < batch_size:
+                break
+        return rows
+
+
+class Call(Step):
+    """Run `apply(conn)` in one transaction, for structural steps that cannot be batched"""
+
+    def __init__(self, name: str, apply: Callable):
+        self.name = name
+        self.apply = apply
+
+    def run(self, bind, state_key, progress) -> int:
+        with bind.begin() as conn:
+            return self.apply(conn) or 0
+
+
+class Migration:
+    """Ordered steps applied once, recorded under `id` in schema_state"""
+
+    def __init__(self, id: str, description: str, steps: List[Step]):
+        self.id = id
+        self.description = description
+        self.steps = steps
+
+    @property
+    def state_key(self) -> str:
+        return f"migration:{self.id}"
+
+
+def drop_index(name: str) -> Callable:
+    """Call `apply` dropping an index removed from the models, if the database still has it"""
+    def apply(conn) -> int:
+        conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        return 0
+    return apply
+
+
+# IDs must never change once released
+MIGRATIONS = [
+    Migration("0001_summary_counters", "Fill the summary counter columns", [
+        Backfill("contract counters", Contract.contract_id, rebuild_contract_counters),
+        Backfill("customer contract counters", Customer.customer_id, rebuild_customer_counters),
+        Backfill("customer event counters", Customer.customer_id, rebuild_event_counters),
+    ]),
+    Migration("0002_event_rollups", "Fill the event timeline rollups", [
+        Backfill("event rollups", Customer.customer_id, rebuild_event_rollups, batch_size=500),
+    ]),
+    Migration("0003_event_id_autoincrement", "Never reuse the IDs of archived events", [
+        Call("events table rebuild", ensure_event_id_sequence),
+    ]),
+    Migration("0004_drop_ix_contracts_status", "Drop the status index covered by (status, expiration_date)", [
+        Call("drop ix_contracts_status", drop_index("ix_contracts_status")),
+    ]),
+]
+
+
+def _timed(progress, label: str, func):
+    started = time.perf_counter()
+    result = func()
+    progress(f"{label} in {time.perf_counter() - started:.2f}s")
+    return result
+
+
+def migrate(bind, progress: Callable[[str], None] = logger.info) -> List[str]:
+    """Create missing tables, columns and indexes, then apply pending migrations; returns their IDs"""
+    schema_state.create(bind, checkfirst=True)
+    _timed(progress, "Tables checked", lambda: Base.metadata.create_all(bind=bind))
+    added = _timed(progress, "Columns checked", lambda: create_missing_columns(bind))
+    for column in added:
+        progress(f"  added column {column}")
+    _timed(progress, "Indexes checked", lambda: create_missing_indexes(bind, progress))
+
+    with bind.connect() as conn:
+        applied = {row.key for row in conn.execute(
+            select(schema_state.c.key).where(schema_state.c.key.like("migration:%"))
+        )}
+    pending = [migration for migration in MIGRATIONS if migration.state_key not in applied]
+    for migration in pending:
+        _timed(progress, f"Migration {migration.id} applied", lambda: _apply(bind, migration, progress))
+    return [migration.id for migration in pending]
+
+
+def _apply(bind, migration: Migration, progress):
+    progress(f"Migration {migration.id}: {migration.description}")
+    for number, step in enumerate(migration.steps, 1):
+        state_key = f"{migration.state_key}:{number}"
+        with bind.connect() as conn:
+            if read_state(conn, state_key) == DONE:
+                continue
+        started = time.perf_counter()
+        rows = step.run(bind, state_key, progress)
+        with bind.begin() as conn:
+            write_state(conn, state_key, DONE)
+        progress(f"  {step.name}: {rows} rows in {time.perf_counter() - started:.2f}s")
+
+    with bind.begin() as conn:
+        conn.execute(delete(schema_state).where(schema_state.c.key.like(f"{migration.state_key}:%")))
+        write_state(conn, migration.state_key, datetime.now().isoformat(timespec="seconds"))
+
+
+def migration_status(bind) -> List[dict]:
+    """Each migration with when it was applied, or how far its steps got"""
+    schema_state.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        state = dict(conn.execute(
+            select(schema_state.c.key, schema_state.c.value).where(schema_state.c.key.like("migration:%"))
+        ).all())
+    status = []
+    for migration in MIGRATIONS:
+        steps = [
+            {"step": step.name, "state": state.get(f"{migration.state_key}:{number}")}
+            for number, step in enumerate(migration.steps, 1)
+        ]
+        status.append({
+            "id": migration.id,
+            "description": migration.description,
+            "applied_at": state.get(migration.state_key),
+            "steps": steps,
+        })
+    return status
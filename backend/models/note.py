@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from models.database import Base
@@ -7,6 +7,12 @@ from models.database import Base
 class Note(Base):
     """Note model for contract comments"""
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_contract_id_created_at", "contract_id", "created_at"),
+        Index("ix_notes_created_at", "created_at"),
+        # Replies of a note (thread traversal)
+        Index("ix_notes_parent_comment_id", "parent_comment_id"),
+    )
 
     note_id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.contract_id"), nullable=False, index=True)
@@ -0,0 +1,222 @@
+"""
+Full-text search index over customers, contracts, notes and actions.
+
+A single SQLite FTS5 table holds one document per searchable row with a
+`title` and a `body` column. The rowid encodes the source row as
+`id * len(SEARCH_KINDS) + kind code`, so a document is replaced or removed
+by rowid lookup rather than by scanning the index. The write handlers keep
+the index in sync inside their own transaction; rebuild_search_index()
+repopulates it after rows were written outside the API (e.g. by the seed
+script). On other databases the index is not created and the helpers do
+nothing.
+"""
+import html
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, delete, event, func, insert, literal_column, select, table, text
+from sqlalchemy.orm import Session
+
+from models.database import Base
+from models.customer import Customer
+from models.contract import Contract
+from models.note import Note
+from models.action import Action
+
+SEARCH_TABLE = "search_index"
+
+# kind -> (model, id column, title column, body column); the position is the kind code
+SEARCH_KINDS = {
+    "customer": (Customer, Customer.customer_id, Customer.name, Customer.email),
+    "contract": (Contract, Contract.contract_id, Contract.type, Contract.terms_ref),
+    "note": (Note, Note.note_id, None, Note.body),
+    "action": (Action, Action.action_id, Action.action_type, Action.action_note),
+}
+KIND_CODES = {kind: code for code, kind in enumerate(SEARCH_KINDS)}
+KIND_BY_MODEL = {source[0]: kind for kind, source in SEARCH_KINDS.items()}
+
+# Shortest word matched as a prefix (the index keeps 2-4 character prefixes)
+MIN_PREFIX_LENGTH = 2
+
+# Relative bm25 weight of a match in the title and body columns
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+# snippet() wraps matches in these control characters, which tokenize as
+# separators; _highlight() swaps them for <mark> tags after escaping the text
+MATCH_START, MATCH_END = "\x02", "\x03"
+
+search_documents = table(SEARCH_TABLE, column("rowid"), column("title"), column("body"))
+
+# Prefix indexes make "term*" queries for short prefixes an index lookup
+CREATE_SEARCH_INDEX = text(
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+
+def _is_sqlite(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def search_rowid(kind: str, row_id):
+    """Index rowid of a source row (works on ints and SQL expressions)"""
+    return row_id * len(SEARCH_KINDS) + KIND_CODES[kind]
+
+
+def _create_search_index(conn):
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+    ).first()
+    if not exists:
+        conn.execute(CREATE_SEARCH_INDEX)
+        _rebuild_search_index(conn)
+
+
+def _documents_from(kind: str, *criteria):
+    """INSERT ... SELECT of the documents for the `kind` rows matching `criteria`"""
+    _, id_column, title_column, body_column = SEARCH_KINDS[kind]
+    title = func.coalesce(title_column, "") if title_column is not None else literal_column("''")
+    rows = select(search_rowid(kind, id_column), title, func.coalesce(body_column, "")).where(*criteria)
+    return insert(search_documents).from_select(["rowid", "title", "body"], rows)
+
+
+def _rebuild_search_index(conn):
+    conn.execute(delete(search_documents))
+    for kind in SEARCH_KINDS:
+        conn.execute(_documents_from(kind))
+    # Merge the index b-trees built by the bulk insert
+    conn.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+def _drop_search_index(conn):
+    conn.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+
+
+def create_search_index(bind):
+    """Create the FTS5 table if it is missing and fill it from the source tables"""
+    if _is_sqlite(bind):
+        with bind.begin() as conn:
+            _create_search_index(conn)
+
+
+def rebuild_search_index(bind):
+    """Replace the index contents with one document per current source row"""
+    if _is_sqlite(bind):
+        with bind.begin() as conn:
+            _rebuild_search_index(conn)
+
+
+# create_all()/drop_all() manage the index along with the tables it covers
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    if _is_sqlite(connection):
+        _create_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw):
+    if _is_sqlite(connection):
+        _drop_search_index(connection)
+
+
+def index_document(db: Session, row):
+    """Add or replace the document for a customer, contract, note or action (flush first)"""
+    if not _is_sqlite(db.get_bind()):
+        return
+    kind = KIND_BY_MODEL[type(row)]
+    _, id_column, title_column, body_column = SEARCH_KINDS[kind]
+    rowid = search_rowid(kind, getattr(row, id_column.key))
+    db.execute(delete(search_documents).where(search_documents.c.rowid == rowid))
+    db.execute(insert(search_documents).values(
+        rowid=rowid,
+        title=(getattr(row, title_column.key) or "") if title_column is not None else "",
+        body=getattr(row, body_column.key) or "",
+    ))
+
+
+def index_documents(db: Session, kind: str, *criteria):
+    """Add the documents of many new `kind` rows matching `criteria` with one INSERT ... SELECT"""
+    if _is_sqlite(db.get_bind()):
+        db.execute(_documents_from(kind, *criteria))
+
+
+def unindex_documents(db: Session, kind: str, *criteria):
+    """Remove the documents of the `kind` rows matching `criteria`"""
+    if not _is_sqlite(db.get_bind()):
+        return
+    _, id_column, _, _ = SEARCH_KINDS[kind]
+    rowids = select(search_rowid(kind, id_column)).where(*criteria)
+    db.execute(delete(search_documents).where(search_documents.c.rowid.in_(rowids)))
+
+
+def unindex_contract(db: Session, contract_id: int):
+    """Remove a contract and the notes and actions deleted along with it"""
+    unindex_documents(db, "note", Note.contract_id == contract_id)
+    unindex_documents(db, "action", Action.contract_id == contract_id)
+    unindex_documents(db, "contract", Contract.contract_id == contract_id)
+
+
+def unindex_customer(db: Session, customer_id: int):
+    """Remove a customer and everything deleted along with it"""
+    contract_ids = select(Contract.contract_id).where(Contract.customer_id == customer_id)
+    unindex_documents(db, "note", Note.contract_id.in_(contract_ids))
+    unindex_documents(db, "action", Action.contract_id.in_(contract_ids))
+    unindex_documents(db, "contract", Contract.customer_id == customer_id)
+    unindex_documents(db, "customer", Customer.customer_id == customer_id)
+
+
+def fts_query(q: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in user input are
+    matched literally instead of being parsed. Returns None when `q`
+    contains no words.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    # A one-letter prefix matches most of the index, so single letters match exactly
+    return " ".join(f'"{word}"*' if len(word) >= MIN_PREFIX_LENGTH else f'"{word}"' for word in words)
+
+
+def _highlight(fragment: Optional[str]) -> Optional[str]:
+    """HTML-escape a snippet of stored text and turn its match markers into <mark> tags"""
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+
+
+def search_documents_page(db: Session, match: str, kinds: Optional[List[str]] = None,
+                          skip: int = 0, limit: int = 20):
+    """
+    Best-ranked documents for an FTS5 query as (kind, id, score, title, snippet) rows.
+
+    Scores are negated bm25 ranks, so higher is better. Titles and snippets
+    are HTML: the stored text escaped, with matches wrapped in <mark>.
+    """
+    rank = func.bm25(literal_column(SEARCH_TABLE), TITLE_WEIGHT, BODY_WEIGHT)
+    statement = select(
+        search_documents.c.rowid,
+        rank.label("score"),
+        func.snippet(literal_column(SEARCH_TABLE), 0, MATCH_START, MATCH_END, "…", 8).label("title"),
+        func.snippet(literal_column(SEARCH_TABLE), 1, MATCH_START, MATCH_END, "…", 16).label("snippet"),
+    ).where(literal_column(SEARCH_TABLE).op("MATCH")(match))
+    if kinds:
+        statement = statement.where(
+            (search_documents.c.rowid % len(SEARCH_KINDS)).in_([KIND_CODES[kind] for kind in kinds])
+        )
+    statement = statement.order_by(rank, search_documents.c.rowid).offset(skip).limit(limit)
+
+    kind_names = list(SEARCH_KINDS)
+    return [
+        (
+            kind_names[row.rowid % len(SEARCH_KINDS)],
+            row.rowid // len(SEARCH_KINDS),
+            -row.score,
+            _highlight(row.title) or None,
+            _highlight(row.snippet),
+        )
+        for row in db.execute(statement)
+    ]
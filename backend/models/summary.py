@@ -0,0 +1,275 @@
+"""
+Materialized summary counters on customers and contracts.
+
+List pages show per-row counts (contracts, open approvals, events, notes,
+actions) that would otherwise take a query per row. The counters live in
+columns on the customer and contract rows; the write handlers adjust them
+with relative UPDATEs (`count = count + n`) in the same transaction as the
+write, so concurrent requests do not overwrite each other's increments.
+rebuild_summaries() recomputes every counter from the source tables to
+repair drift, e.g. after rows were written outside the API; the
+rebuild_*_counters() functions it uses can also recompute one ID range,
+which is how the summary migration backfills them in batches.
+
+Contract, note and action writes invalidate the cached customer and
+contract responses that show the counters. Events are written far too
+often for that, so event counters on cached customer responses can lag by
+up to CACHE_TTL.
+
+recent_events_count counts events of the last RECENT_EVENTS_DAYS days (in
+UTC, like event timestamps). New events are added as they arrive, but
+events only leave the window when the event counters are rebuilt: by
+partition_events.py, the events_maintenance job (off unless
+EVENTS_MAINTENANCE_INTERVAL is set) or rebuild_summaries.py. Without one of
+these scheduled, the count only grows.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import String, bindparam, case, func, select, true, type_coerce, union_all, update
+from sqlalchemy.orm import Session
+
+from models.customer import Customer
+from models.contract import Contract
+from models.note import Note
+from models.action import Action
+from models.database import utc_now
+from models.event_partition import event_tables
+
+# Contracts in this status count as open approvals
+OPEN_APPROVAL_STATUS = "Pending Approval"
+
+# Window of recent_events_count
+RECENT_EVENTS_DAYS = 30
+
+_NO_SYNC = {"synchronize_session": False}
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """
+    `value` as a naive UTC datetime. SQLite returns timestamps naive (in
+    UTC, as CURRENT_TIMESTAMP writes them), PostgreSQL timezone-aware.
+    """
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def recent_events_since(now: Optional[datetime] = None) -> datetime:
+    """Start of the recent_events_count window, as a naive UTC datetime"""
+    return _naive_utc(now or utc_now()) - timedelta(days=RECENT_EVENTS_DAYS)
+
+
+def _is_open(status: Optional[str]) -> int:
+    return int(status == OPEN_APPROVAL_STATUS)
+
+
+def _add_to_customer(db: Session, customer_id: int, **deltas):
+    values = {name: getattr(Customer, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.execute(update(Customer).where(Customer.customer_id == customer_id).values(**values),
+                   execution_options=_NO_SYNC)
+
+
+def _add_to_contract(db: Session, contract_id: int, **deltas):
+    values = {name: getattr(Contract, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.execute(update(Contract).where(Contract.contract_id == contract_id).values(**values),
+                   execution_options=_NO_SYNC)
+
+
+def contract_added(db: Session, customer_id: int, status: str):
+    _add_to_customer(db, customer_id, contracts_count=1, open_approvals_count=_is_open(status))
+
+
+def contract_removed(db: Session, customer_id: int, status: str):
+    _add_to_customer(db, customer_id, contracts_count=-1, open_approvals_count=-_is_open(status))
+
+
+def contract_status_changed(db: Session, customer_id: int, prior_status: str, new_status: str):
+    _add_to_customer(db, customer_id, open_approvals_count=_is_open(new_status) - _is_open(prior_status))
+
+
+def contract_statuses_changed(db: Session, changes: Iterable[Tuple[int, str, str]]):
+    """Apply many (customer_id, prior status, new status) changes with one executemany"""
+    deltas = defaultdict(int)
+    for customer_id, prior_status, new_status in changes:
+        deltas[customer_id] += _is_open(new_status) - _is_open(prior_status)
+    params = [{"b_id": customer_id, "b_delta": delta} for customer_id, delta in deltas.items() if delta]
+    if params:
+        db.connection().execute(
+            update(Customer.__table__)
+            .where(Customer.customer_id == bindparam("b_id"))
+            .values(open_approvals_count=Customer.open_approvals_count + bindparam("b_delta")),
+            params
+        )
+
+
+def notes_added(db: Session, contract_id: int, count: int = 1):
+    _add_to_contract(db, contract_id, notes_count=count)
+
+
+def actions_added(db: Session, contract_id: int, count: int = 1):
+    _add_to_contract(db, contract_id, actions_count=count)
+
+
+def events_added(db: Session, events: Iterable[Tuple[int, datetime]], now: Optional[datetime] = None):
+    """Count new events given as (customer_id, timestamp) pairs, one UPDATE per customer"""
+    since = recent_events_since(now)
+    totals = defaultdict(lambda: [0, 0, None])
+    for customer_id, timestamp in events:
+        total = totals[customer_id]
+        total[0] += 1
+        total[1] += _naive_utc(timestamp) >= since
+        total[2] = timestamp if total[2] is None else max(total[2], timestamp, key=_naive_utc)
+    if not totals:
+        return
+
+    latest = bindparam("b_latest", type_=Customer.last_event_at.type)
+    db.connection().execute(
+        update(Customer.__table__)
+        .where(Customer.customer_id == bindparam("b_id"))
+        .values(
+            events_count=Customer.events_count + bindparam("b_count"),
+            recent_events_count=Customer.recent_events_count + bindparam("b_recent"),
+            last_event_at=case(
+                (Customer.last_event_at.is_(None) | (Customer.last_event_at < latest), latest),
+                else_=Customer.last_event_at
+            ),
+        ),
+        [
+            {"b_id": customer_id, "b_count": count, "b_recent": recent, "b_latest": latest_at}
+            for customer_id, (count, recent, latest_at) in totals.items()
+        ]
+    )
+
+
+def _latest_event_at(db: Session, customer_id: int) -> Optional[datetime]:
+    latest = [
+        db.scalar(select(func.max(table.c.timestamp)).where(table.c.customer_id == customer_id))
+        for table in event_tables(db.get_bind())
+    ]
+    latest = [value for value in latest if value is not None]
+    return max(latest) if latest else None
+
+
+def event_removed(db: Session, customer_id: int, timestamp: datetime, now: Optional[datetime] = None):
+    """Uncount a deleted event (flush the delete first)"""
+    _add_to_customer(
+        db, customer_id, events_count=-1, recent_events_count=-int(_naive_utc(timestamp) >= recent_events_since(now))
+    )
+    last_event_at = db.scalar(select(Customer.last_event_at).where(Customer.customer_id == customer_id))
+    if last_event_at is not None and _naive_utc(timestamp) >= _naive_utc(last_event_at):
+        db.execute(
+            update(Customer).where(Customer.customer_id == customer_id)
+            .values(last_event_at=_latest_event_at(db, customer_id)),
+            execution_options=_NO_SYNC
+        )
+
+
+def _reset_and_set(conn, model, id_column, reset: dict, rows, key_range=None) -> int:
+    """
+    Reset the counters in `reset` on every row (or on the rows whose ID is in
+    the inclusive `key_range`), then set them from (id, *values) rows.
+    Returns the number of rows reset.
+    """
+    table = model.__table__
+    reset_rows = update(table).values(**reset)
+    if key_range is not None:
+        reset_rows = reset_rows.where(id_column.between(*key_range))
+    count = conn.execute(reset_rows).rowcount
+    names = list(reset)
+    params = [
+        {"b_id": row[0], **{f"b_{name}": value for name, value in zip(names, row[1:])}}
+        for row in rows
+    ]
+    if params:
+        conn.execute(
+            update(table).where(id_column == bindparam("b_id"))
+            .values(**{name: bindparam(f"b_{name}") for name in names}),
+            params
+        )
+    return count
+
+
+def _in_range(column, key_range):
+    return column.between(*key_range) if key_range is not None else true()
+
+
+def rebuild_summaries(bind, now: Optional[datetime] = None):
+    """Recompute every counter from the source tables in one transaction"""
+    with bind.begin() as conn:
+        rebuild_contract_counters(conn)
+        rebuild_customer_counters(conn)
+        rebuild_event_counters(conn, now=now)
+
+
+def rebuild_event_summaries(bind, now: Optional[datetime] = None):
+    """Recompute the event counters only (after partitions were dropped, and to age the window)"""
+    with bind.begin() as conn:
+        rebuild_event_counters(conn, now=now)
+
+
+def rebuild_contract_counters(conn, key_range=None) -> int:
+    """Recompute notes_count/actions_count of all contracts, or of those with IDs in `key_range`"""
+    notes = (
+        select(Note.contract_id, func.count().label("notes"))
+        .where(_in_range(Note.contract_id, key_range)).group_by(Note.contract_id).subquery()
+    )
+    actions = (
+        select(Action.contract_id, func.count().label("actions"))
+        .where(_in_range(Action.contract_id, key_range)).group_by(Action.contract_id).subquery()
+    )
+    rows = conn.execute(
+        select(Contract.contract_id, func.coalesce(notes.c.notes, 0), func.coalesce(actions.c.actions, 0))
+        .outerjoin(notes, notes.c.contract_id == Contract.contract_id)
+        .outerjoin(actions, actions.c.contract_id == Contract.contract_id)
+        .where((notes.c.notes.is_not(None)) | (actions.c.actions.is_not(None)))
+        .where(_in_range(Contract.contract_id, key_range))
+    ).all()
+    return _reset_and_set(conn, Contract, Contract.contract_id,
+                          {"notes_count": 0, "actions_count": 0}, rows, key_range)
+
+
+def rebuild_customer_counters(conn, key_range=None) -> int:
+    """Recompute contracts_count/open_approvals_count of all customers, or of those in `key_range`"""
+    open_approval = case((Contract.status == OPEN_APPROVAL_STATUS, 1), else_=0)
+    rows = conn.execute(
+        select(Contract.customer_id, func.count(), func.sum(open_approval))
+        .where(_in_range(Contract.customer_id, key_range))
+        .group_by(Contract.customer_id)
+    ).all()
+    return _reset_and_set(conn, Customer, Customer.customer_id,
+                          {"contracts_count": 0, "open_approvals_count": 0}, rows, key_range)
+
+
+def rebuild_event_counters(conn, key_range=None, now: Optional[datetime] = None) -> int:
+    """Recompute the event counters of all customers, or of those with IDs in `key_range`"""
+    since = recent_events_since(now)
+    branches = []
+    for table in event_tables(conn, refresh=True):
+        stored = type_coerce(table.c.timestamp, String)
+        recent = case((stored >= type_coerce(since, table.c.timestamp.type), 1), else_=0)
+        branches.append(
+            select(
+                table.c.customer_id,
+                func.count().label("events"),
+                func.sum(recent).label("recent"),
+                func.max(stored).label("latest"),
+            )
+            .where(_in_range(table.c.customer_id, key_range))
+            .group_by(table.c.customer_id)
+        )
+    per_table = union_all(*branches).subquery()
+    rows = conn.execute(
+        select(
+            per_table.c.customer_id,
+            func.sum(per_table.c.events),
+            func.sum(per_table.c.recent),
+            type_coerce(func.max(per_table.c.latest), Customer.last_event_at.type),
+        ).group_by(per_table.c.customer_id)
+    ).all()
+    return _reset_and_set(conn, Customer, Customer.customer_id,
+                          {"events_count": 0, "recent_events_count": 0, "last_event_at": None},
+                          rows, key_range)
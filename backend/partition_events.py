@@ -0,0 +1,60 @@
+"""
+Event partition maintenance.
+
+Moves events older than the hot window out of the `events` table into
+monthly partitions, drops (and archives) partitions past the retention
+period and refreshes the per-customer event counters. Safe to run
+repeatedly, e.g. nightly from cron:
+
+    python partition_events.py
+    python partition_events.py --hot-months 1 --retention-months 24 --vacuum
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+import config
+from models.database import engine, init_db
+from models.event_partition import archive_events, enforce_retention
+from models.summary import rebuild_event_summaries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Partition, archive and expire events")
+    parser.add_argument("--hot-months", type=int, default=config.EVENTS_HOT_MONTHS,
+                        help="Months kept in the events table, including the current one")
+    parser.add_argument("--retention-months", type=int, default=config.EVENTS_RETENTION_MONTHS,
+                        help="Months of partitions to keep (0 keeps everything)")
+    parser.add_argument("--archive-dir", default=config.EVENTS_ARCHIVE_DIR,
+                        help="Directory for archives of dropped partitions")
+    parser.add_argument("--no-archive", action="store_true", help="Drop expired partitions without archiving")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows moved per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim free space afterwards (SQLite)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    init_db()
+
+    started = time.perf_counter()
+    moved = archive_events(engine, args.hot_months, batch_size=args.batch_size)
+    for name, count in moved.items():
+        print(f"Moved {count} events to {name}")
+
+    archive_dir = None if args.no_archive else args.archive_dir
+    for name in enforce_retention(engine, args.retention_months, archive_dir):
+        print(f"Dropped {name}" + (f" (archived to {archive_dir})" if archive_dir else ""))
+
+    # Counts dropped events out and ages the recent-events window
+    rebuild_event_summaries(engine)
+
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
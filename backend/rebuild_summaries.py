@@ -0,0 +1,38 @@
+"""
+Summary counter repair.
+
+Recomputes the per-customer and per-contract counters (see
+models/summary.py) from the source tables. Run it after writing rows
+outside the API or whenever the counters are suspected to have drifted:
+
+    python rebuild_summaries.py
+    python rebuild_summaries.py --events-only
+"""
+import argparse
+import time
+
+from models.database import engine, init_db
+from models.summary import rebuild_event_summaries, rebuild_summaries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild customer and contract summary counters")
+    parser.add_argument("--events-only", action="store_true",
+                        help="Only recompute the event counters (cheaper; ages the recent-events window)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    init_db()
+
+    started = time.perf_counter()
+    if args.events_only:
+        rebuild_event_summaries(engine)
+    else:
+        rebuild_summaries(engine)
+    print(f"Summary counters rebuilt in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ from routes.contracts import router as contracts_router
 from routes.events import router as events_router
 from routes.notes import router as notes_router
 from routes.actions import router as actions_router
+from routes.stats import router as stats_router
+from routes.search import router as search_router
+from routes.async_api import router as async_router
 
 __all__ = [
     "customers_router",
@@ -10,4 +13,7 @@ __all__ = [
     "events_router",
     "notes_router",
     "actions_router",
+    "stats_router",
+    "search_router",
+    "async_router",
 ]
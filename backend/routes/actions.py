@@ -1,14 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from typing import List
 from models import get_db, Action, Contract
-from schemas import ActionCreate, ActionResponse
+from models.database import utc_now
+from models.search_index import index_document, index_documents, unindex_documents
+from models.summary import actions_added, contract_status_changed, contract_statuses_changed
+from schemas import ActionCreate, ActionResponse, ActionBulkCreate, ActionBulkResult, ActionBulkResponse
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.serialization import FastJSONResponse, projected_columns, fetch_dicts, keyset_dicts
+from utils.cache import invalidate_cache
 
 router = APIRouter(
     prefix="/actions",
     tags=["actions"]
 )
 
+# Contract status set by each workflow action ("flag" leaves it unchanged)
+ACTION_STATUSES = {
+    "approve": "Approved",
+    "reject": "Rejected",
+    "reopen": "Pending Approval",
+}
+# Keep IN lists well under SQLite's bound-parameter limit
+CONTRACT_CHUNK = 5000
+
 
 @router.post("/", response_model=ActionResponse, status_code=201)
 def create_action(
@@ -34,40 +50,137 @@ def create_action(
     )
     
     # Update contract status based on action type
-    if action.action_type == "approve":
-        contract.status = "Approved"
-        db_action.new_status = "Approved"
-    elif action.action_type == "reject":
-        contract.status = "Rejected"
-        db_action.new_status = "Rejected"
-    elif action.action_type == "reopen":
-        contract.status = "Pending Approval"
-        db_action.new_status = "Pending Approval"
+    if action.action_type in ACTION_STATUSES:
+        contract.status = ACTION_STATUSES[action.action_type]
+        db_action.new_status = contract.status
     
     db.add(db_action)
+    db.flush()
+    index_document(db, db_action)
+    actions_added(db, contract.contract_id)
+    contract_status_changed(db, contract.customer_id, prior_status, contract.status)
     db.commit()
     db.refresh(db_action)
+    # The contract's status and counters changed, and with them the customer's open approvals
+    invalidate_cache("contracts", "customers")
     return db_action
 
 
+@router.post("/bulk", response_model=ActionBulkResponse)
+def create_actions_bulk(
+    bulk: ActionBulkCreate,
+    db: Session = Depends(get_db)
+):
+    """Apply approve/reject/reopen to many contracts in one transaction"""
+    new_status = ACTION_STATUSES[bulk.action_type]
+
+    # Load the current status of every requested contract with one IN query per chunk
+    requested = list(dict.fromkeys(bulk.contract_ids))
+    prior_statuses = {}
+    customer_ids = {}
+    for start in range(0, len(requested), CONTRACT_CHUNK):
+        chunk = requested[start:start + CONTRACT_CHUNK]
+        for contract_id, status, customer_id in db.execute(
+            select(Contract.contract_id, Contract.status, Contract.customer_id)
+            .where(Contract.contract_id.in_(chunk))
+        ):
+            prior_statuses[contract_id] = status
+            customer_ids[contract_id] = customer_id
+
+    found = [contract_id for contract_id in requested if contract_id in prior_statuses]
+    action_ids = {}
+    if found:
+        # UTC, like the CURRENT_TIMESTAMP default single actions get
+        acted_at = utc_now()
+        inserted = db.scalars(
+            insert(Action).returning(Action.action_id, sort_by_parameter_order=True),
+            [
+                {
+                    "contract_id": contract_id,
+                    "action_type": bulk.action_type,
+                    "action_note": bulk.action_note,
+                    "acted_by": bulk.acted_by,
+                    "acted_at": acted_at,
+                    "prior_status": prior_statuses[contract_id],
+                    "new_status": new_status,
+                }
+                for contract_id in found
+            ]
+        ).all()
+        action_ids = dict(zip(found, inserted))
+
+        for start in range(0, len(found), CONTRACT_CHUNK):
+            chunk = found[start:start + CONTRACT_CHUNK]
+            db.execute(
+                update(Contract).where(Contract.contract_id.in_(chunk)).values(
+                    status=new_status, last_action_at=acted_at, updated_by=bulk.acted_by,
+                    actions_count=Contract.actions_count + 1
+                ),
+                execution_options={"synchronize_session": False}
+            )
+            index_documents(db, "action", Action.action_id.in_([action_ids[c] for c in chunk]))
+        contract_statuses_changed(
+            db, ((customer_ids[c], prior_statuses[c], new_status) for c in found)
+        )
+        db.commit()
+        # Contract statuses and counters changed, and with them customers' open approvals
+        invalidate_cache("contracts", "customers")
+
+    results = []
+    seen = set()
+    for contract_id in bulk.contract_ids:
+        if contract_id not in prior_statuses:
+            error = "Contract not found"
+        elif contract_id in seen:
+            error = "Duplicate contract ID"
+        else:
+            error = None
+        if error:
+            results.append(ActionBulkResult(contract_id=contract_id, status="rejected", error=error))
+        else:
+            seen.add(contract_id)
+            results.append(ActionBulkResult(
+                contract_id=contract_id,
+                status="applied",
+                action_id=action_ids[contract_id],
+                prior_status=prior_statuses[contract_id],
+                new_status=new_status,
+            ))
+
+    return ActionBulkResponse(
+        applied=len(found),
+        rejected=len(bulk.contract_ids) - len(found),
+        results=results
+    )
+
+
 @router.get("/", response_model=List[ActionResponse])
 def get_actions(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     contract_id: int = Query(None),
     action_type: str = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
     db: Session = Depends(get_db)
 ):
     """Get all actions with optional filtering"""
-    query = db.query(Action)
+    statement = select(*projected_columns(Action, ActionResponse, fields))
     
     if contract_id:
-        query = query.filter(Action.contract_id == contract_id)
+        statement = statement.where(Action.contract_id == contract_id)
     if action_type:
-        query = query.filter(Action.action_type == action_type)
+        statement = statement.where(Action.action_type == action_type)
     
-    actions = query.order_by(Action.acted_at.desc()).offset(skip).limit(limit).all()
-    return actions
+    if cursor is not None:
+        actions, next_cursor = keyset_dicts(
+            db, statement, Action.action_id, cursor, limit, sort_column=Action.acted_at
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return FastJSONResponse(actions, headers=headers)
+
+    statement = statement.order_by(Action.acted_at.desc(), Action.action_id.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(fetch_dicts(db, statement))
 
 
 @router.get("/{action_id}", response_model=ActionResponse)
@@ -92,6 +205,9 @@ def delete_action(
     if not action:
         raise HTTPException(status_code=404, detail="Action not found")
     
+    unindex_documents(db, "action", Action.action_id == action_id)
+    actions_added(db, action.contract_id, -1)
     db.delete(action)
     db.commit()
+    invalidate_cache("contracts")
     return None
@@ -0,0 +1,252 @@
+"""
+Async variants of the hottest read routes and event ingest.
+
+These handlers use an AsyncSession, so a request waiting on the database
+does not hold one of Starlette's threadpool workers. They are mounted ahead
+of the sync routers when DB_ASYNC is enabled and take over the same paths
+and methods; every other route keeps using the sync handlers. List routes
+take the same parameters as their sync versions, including `?fields=`, and
+share their fast JSON path: projected Core rows (fetch_dicts/keyset_dicts,
+run on the AsyncSession through run_sync) rendered by FastJSONResponse.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from datetime import datetime
+from models import get_async_db, Customer, Contract, Event, Note, Action
+from schemas import (
+    CustomerResponse,
+    ContractResponse,
+    EventCreate,
+    EventResponse,
+    EventAccepted,
+    NoteResponse,
+    ActionResponse,
+)
+from routes.contracts import apply_contract_filters, estimate_contracts
+from routes.events import (
+    apply_event_filters, buffer_event, estimate_events, event_buffer, event_count_statement, find_event,
+    partitioned_events
+)
+from models.event_partition import partitions_for_range
+from models.summary import events_added
+from models.event_rollup import rollups_added
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.serialization import FastJSONResponse, projected_columns, fetch_dicts, keyset_dicts
+from utils.cache import invalidate_cache
+from utils.counts import INCLUDE_TOTAL_PATTERN, total_count
+from utils.existence import row_exists_async
+
+router = APIRouter()
+
+
+async def _list_response(db, statement, headers=None, cursor=None, id_column=None, limit=None,
+                         sort_column=None) -> FastJSONResponse:
+    """
+    Rows of a projected select as JSON: the keyset page after `cursor` (with
+    the next-cursor header), or the statement as given when there is no cursor.
+    """
+    headers = dict(headers or {})
+    if cursor is None:
+        return FastJSONResponse(await db.run_sync(fetch_dicts, statement), headers=headers)
+    rows, next_cursor = await db.run_sync(keyset_dicts, statement, id_column, cursor, limit, sort_column)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return FastJSONResponse(rows, headers=headers)
+
+
+async def _get_or_404(db, model, id_column, row_id, detail):
+    row = (await db.execute(select(model).where(id_column == row_id))).scalar_one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail=detail)
+    return row
+
+
+@router.get("/customers/", response_model=List[CustomerResponse], tags=["customers"])
+async def get_customers(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all customers with pagination"""
+    statement = select(*projected_columns(Customer, CustomerResponse, fields))
+    if cursor is None:
+        statement = statement.order_by(Customer.customer_id).offset(skip).limit(limit)
+    return await _list_response(db, statement, cursor=cursor, id_column=Customer.customer_id, limit=limit)
+
+
+@router.get("/customers/{customer_id}", response_model=CustomerResponse, tags=["customers"])
+async def get_customer(
+    customer_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a customer by ID"""
+    return await _get_or_404(db, Customer, Customer.customer_id, customer_id, "Customer not found")
+
+
+@router.get("/contracts/", response_model=List[ContractResponse], tags=["contracts"])
+async def get_contracts(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    customer_id: int = Query(None),
+    status: str = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    include_total: str = Query(None, pattern=INCLUDE_TOTAL_PATTERN,
+                               description="Return the total in X-Total-Count: exact or estimate"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all contracts with optional filtering"""
+    statement = apply_contract_filters(
+        select(*projected_columns(Contract, ContractResponse, fields)), customer_id, status
+    )
+    headers = {}
+    if include_total:
+        headers.update(await db.run_sync(lambda session: total_count(
+            session, "contracts", {"customer_id": customer_id, "status": status},
+            apply_contract_filters(select(Contract.contract_id), customer_id, status), include_total,
+            estimate=lambda: estimate_contracts(session, customer_id, status)
+        )))
+    if cursor is None:
+        statement = statement.order_by(Contract.contract_id).offset(skip).limit(limit)
+    return await _list_response(
+        db, statement, headers, cursor=cursor, id_column=Contract.contract_id, limit=limit
+    )
+
+
+@router.get("/contracts/{contract_id}", response_model=ContractResponse, tags=["contracts"])
+async def get_contract(
+    contract_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a contract by ID"""
+    return await _get_or_404(db, Contract, Contract.contract_id, contract_id, "Contract not found")
+
+
+@router.post("/events/", response_model=EventResponse, status_code=201, tags=["events"],
+             responses={202: {"model": EventAccepted, "description": "Queued (write-behind mode)"},
+                        429: {"description": "Event queue is full"}})
+async def create_event(
+    event: EventCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new event (queued and answered with 202 when the event buffer is running)"""
+    if not await row_exists_async(db, Customer.customer_id, event.customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    if event_buffer.running:
+        return buffer_event(event)
+
+    db_event = Event(**event.model_dump())
+    db.add(db_event)
+    await db.flush()
+    await db.refresh(db_event, ["timestamp"])
+    await db.run_sync(events_added, [(db_event.customer_id, db_event.timestamp)])
+    await db.run_sync(
+        rollups_added, [(db_event.customer_id, db_event.event_type, db_event.channel, db_event.timestamp)]
+    )
+    await db.commit()
+    await db.refresh(db_event)
+    invalidate_cache("events")
+    return db_event
+
+
+@router.get("/events/", response_model=List[EventResponse], tags=["events"])
+async def get_events(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    customer_id: int = Query(None),
+    event_type: str = Query(None),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    include_total: str = Query(None, pattern=INCLUDE_TOTAL_PATTERN,
+                               description="Return the total in X-Total-Count: exact or estimate"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all events with optional filtering"""
+    partitions = await db.run_sync(
+        lambda session: partitions_for_range(session.get_bind(), start_date, end_date)
+    )
+    headers = {}
+    if include_total:
+        filters = dict(customer_id=customer_id, event_type=event_type, start_date=start_date, end_date=end_date)
+        headers.update(await db.run_sync(lambda session: total_count(
+            session, "events", filters, event_count_statement(partitions, **filters), include_total,
+            estimate=lambda: estimate_events(session, partitions, **filters)
+        )))
+    if partitions:
+        depth = limit + 1 if cursor is not None else skip + limit
+        entity = partitioned_events(
+            partitions, customer_id, event_type, start_date, end_date, cursor, depth
+        )
+        statement = select(*projected_columns(entity, EventResponse, fields))
+    else:
+        entity = Event
+        statement = apply_event_filters(
+            select(*projected_columns(Event, EventResponse, fields)), customer_id, event_type, start_date, end_date
+        )
+    if cursor is None:
+        statement = statement.order_by(entity.timestamp.desc(), entity.event_id.desc()).offset(skip).limit(limit)
+    return await _list_response(
+        db, statement, headers, cursor=cursor, id_column=entity.event_id, limit=limit, sort_column=entity.timestamp
+    )
+
+
+@router.get("/events/{event_id}", response_model=EventResponse, tags=["events"])
+async def get_event(
+    event_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get an event by ID"""
+    # Falls back to the archived partitions when the event has left the hot table
+    event, _ = await db.run_sync(find_event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
+
+
+@router.get("/notes/", response_model=List[NoteResponse], tags=["notes"])
+async def get_notes(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    contract_id: int = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all notes with optional filtering"""
+    statement = select(*projected_columns(Note, NoteResponse, fields))
+    if contract_id:
+        statement = statement.where(Note.contract_id == contract_id)
+    if cursor is None:
+        statement = statement.order_by(Note.created_at.desc(), Note.note_id.desc()).offset(skip).limit(limit)
+    return await _list_response(
+        db, statement, cursor=cursor, id_column=Note.note_id, limit=limit, sort_column=Note.created_at
+    )
+
+
+@router.get("/actions/", response_model=List[ActionResponse], tags=["actions"])
+async def get_actions(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    contract_id: int = Query(None),
+    action_type: str = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all actions with optional filtering"""
+    statement = select(*projected_columns(Action, ActionResponse, fields))
+    if contract_id:
+        statement = statement.where(Action.contract_id == contract_id)
+    if action_type:
+        statement = statement.where(Action.action_type == action_type)
+    if cursor is None:
+        statement = statement.order_by(Action.acted_at.desc(), Action.action_id.desc()).offset(skip).limit(limit)
+    return await _list_response(
+        db, statement, cursor=cursor, id_column=Action.action_id, limit=limit, sort_column=Action.acted_at
+    )
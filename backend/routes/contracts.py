@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import case, exists, func, literal, select
+from sqlalchemy.orm import Session, aliased
 from typing import List
-from models import get_db, Contract, Customer
-from schemas import ContractCreate, ContractUpdate, ContractResponse
+from models import get_db, Contract, Customer, Note
+from models.search_index import index_document, unindex_contract
+from models.summary import OPEN_APPROVAL_STATUS, contract_added, contract_removed, contract_status_changed
+from schemas import ContractCreate, ContractUpdate, ContractResponse, NoteResponse, NoteThread
+from utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_filter, sort_key
+from utils.export import stream_export
+from utils.cache import cached_response, cache_response, cache_body, invalidate_cache
+from utils.serialization import FastJSONResponse, dumps, projected_columns, fetch_dicts, keyset_dicts
+from utils.counts import INCLUDE_TOTAL_PATTERN, id_span, total_count
+from utils.existence import existence_cache, row_exists
 
 router = APIRouter(
     prefix="/contracts",
@@ -10,54 +19,212 @@ router = APIRouter(
 )
 
 
+def apply_contract_filters(query, customer_id=None, status=None):
+    """Apply the list filters shared by contract listing and export"""
+    if customer_id:
+        query = query.filter(Contract.customer_id == customer_id)
+    if status:
+        query = query.filter(Contract.status == status)
+    return query
+
+
+def estimate_contracts(db: Session, customer_id=None, status=None):
+    """Cheap contract total for the filters, or None when only a COUNT would do"""
+    if customer_id is None and status is None:
+        return id_span(db, Contract.contract_id)
+    if customer_id is not None and status in (None, OPEN_APPROVAL_STATUS):
+        column = Customer.contracts_count if status is None else Customer.open_approvals_count
+        return db.scalar(select(column).where(Customer.customer_id == customer_id)) or 0
+    return None
+
+
 @router.post("/", response_model=ContractResponse, status_code=201)
 def create_contract(
     contract: ContractCreate,
     db: Session = Depends(get_db)
 ):
     """Create a new contract"""
-    # Check if customer exists
-    customer = db.query(Customer).filter(Customer.customer_id == contract.customer_id).first()
-    if not customer:
+    if not row_exists(db, Customer.customer_id, contract.customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
     
     db_contract = Contract(**contract.model_dump())
     db.add(db_contract)
+    db.flush()
+    index_document(db, db_contract)
+    contract_added(db, db_contract.customer_id, db_contract.status)
+    generation = existence_cache.generation(Contract.contract_id)
     db.commit()
+    existence_cache.add(Contract.contract_id, [db_contract.contract_id], generation)
     db.refresh(db_contract)
+    invalidate_cache("contracts", "customers")
     return db_contract
 
 
 @router.get("/", response_model=List[ContractResponse])
 def get_contracts(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     customer_id: int = Query(None),
     status: str = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    include_total: str = Query(None, pattern=INCLUDE_TOTAL_PATTERN,
+                               description="Return the total in X-Total-Count: exact or estimate"),
     db: Session = Depends(get_db)
 ):
     """Get all contracts with optional filtering"""
-    query = db.query(Contract)
-    
-    if customer_id:
-        query = query.filter(Contract.customer_id == customer_id)
-    if status:
-        query = query.filter(Contract.status == status)
-    
-    contracts = query.offset(skip).limit(limit).all()
-    return contracts
+    cached = cached_response(request, "contracts")
+    if cached:
+        return cached
+
+    statement = apply_contract_filters(
+        select(*projected_columns(Contract, ContractResponse, fields)), customer_id, status
+    )
+    headers = {}
+    if include_total:
+        headers.update(total_count(
+            db, "contracts", {"customer_id": customer_id, "status": status},
+            apply_contract_filters(select(Contract.contract_id), customer_id, status), include_total,
+            estimate=lambda: estimate_contracts(db, customer_id, status)
+        ))
+
+    if cursor is not None:
+        contracts, next_cursor = keyset_dicts(db, statement, Contract.contract_id, cursor, limit)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        contracts = fetch_dicts(db, statement.order_by(Contract.contract_id).offset(skip).limit(limit))
+
+    return cache_body(request, "contracts", dumps(contracts), headers)
+
+
+@router.get("/export")
+def export_contracts(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    customer_id: int = Query(None),
+    status: str = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Stream all matching contracts as NDJSON or CSV"""
+    statement = apply_contract_filters(
+        select(Contract.__table__), customer_id, status
+    ).order_by(Contract.contract_id)
+    return stream_export(db, statement, "contracts", export_format)
 
 
 @router.get("/{contract_id}", response_model=ContractResponse)
 def get_contract(
     contract_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get a contract by ID"""
+    cached = cached_response(request, "contracts")
+    if cached:
+        return cached
+
     contract = db.query(Contract).filter(Contract.contract_id == contract_id).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-    return contract
+    return cache_response(request, "contracts", ContractResponse.model_validate(contract))
+
+
+def note_thread_statement(contract_id: int, skip: int, limit: int, cursor: str = None, max_depth: int = None):
+    """
+    One page of root notes of a contract with their replies, as a single recursive CTE.
+
+    Roots are numbered newest first; replies inherit their root's position
+    and carry their depth. In cursor mode one extra root is fetched (without
+    its replies) to tell whether another page follows.
+    """
+    order = (Note.created_at.desc(), Note.note_id.desc())
+    roots = select(
+        Note.note_id, func.row_number().over(order_by=order).label("position")
+    ).where(Note.contract_id == contract_id, Note.parent_comment_id.is_(None))
+    if cursor is not None:
+        after_cursor = keyset_filter(Note.note_id, cursor, Note.created_at)
+        if after_cursor is not None:
+            roots = roots.where(after_cursor)
+        roots = roots.order_by(*order).limit(limit + 1)
+        last_position = limit
+    else:
+        roots = roots.order_by(*order).offset(skip).limit(limit)
+        last_position = skip + limit
+    roots = roots.subquery()
+
+    thread = select(
+        roots.c.note_id, literal(0).label("depth"), roots.c.position
+    ).cte("thread", recursive=True)
+    reply = aliased(Note)
+    descend = [
+        reply.parent_comment_id == thread.c.note_id,
+        reply.contract_id == contract_id,
+        thread.c.position <= last_position,
+    ]
+    if max_depth is not None:
+        descend.append(thread.c.depth < max_depth)
+    thread = thread.union_all(
+        select(reply.note_id, thread.c.depth + 1, thread.c.position).where(*descend)
+    )
+
+    child = aliased(Note)
+    has_more = literal(False)
+    if max_depth is not None:
+        has_more = case(
+            (thread.c.depth == max_depth, exists().where(child.parent_comment_id == Note.note_id)),
+            else_=False
+        )
+    return (
+        select(
+            *projected_columns(Note, NoteResponse, None),
+            thread.c.depth,
+            has_more.label("has_more_replies"),
+            thread.c.position,
+            sort_key(Note.created_at).label("sort_key"),
+        )
+        .join(thread, Note.note_id == thread.c.note_id)
+        .order_by(thread.c.position, Note.created_at, Note.note_id)
+    )
+
+
+@router.get("/{contract_id}/notes/tree", response_model=List[NoteThread])
+def get_contract_notes_tree(
+    contract_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100, description="Root comments per page"),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    max_depth: int = Query(None, ge=0, description="Deepest reply level to return (0 returns roots only)"),
+    db: Session = Depends(get_db)
+):
+    """Get a page of a contract's comment threads, newest root first, with nested replies"""
+    rows = db.execute(note_thread_statement(contract_id, skip, limit, cursor, max_depth)).all()
+    if not rows and not db.scalar(select(Contract.contract_id).where(Contract.contract_id == contract_id)):
+        raise HTTPException(status_code=404, detail="Contract not found")
+
+    # Rows arrive ordered by root, then oldest first: index every note, then
+    # attach each reply to its parent, in two linear passes
+    nodes = {}
+    roots = []
+    sort_keys = {}
+    for row in rows:
+        node = dict(row._mapping)
+        del node["position"]
+        sort_keys[node["note_id"]] = node.pop("sort_key")
+        node["has_more_replies"] = bool(node["has_more_replies"])
+        node["replies"] = []
+        nodes[node["note_id"]] = node
+    for node in nodes.values():
+        if node["depth"] == 0:
+            roots.append(node)
+        else:
+            nodes[node["parent_comment_id"]]["replies"].append(node)
+
+    headers = {}
+    if cursor is not None and len(roots) > limit:
+        roots = roots[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_keys[roots[-1]["note_id"]], roots[-1]["note_id"])
+    return FastJSONResponse(roots, headers=headers)
 
 
 @router.put("/{contract_id}", response_model=ContractResponse)
@@ -71,12 +238,16 @@ def update_contract(
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
+    prior_status = contract.status
     update_data = contract_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(contract, field, value)
     
+    index_document(db, contract)
+    contract_status_changed(db, contract.customer_id, prior_status, contract.status)
     db.commit()
     db.refresh(contract)
+    invalidate_cache("contracts", "customers")
     return contract
 
 
@@ -90,6 +261,10 @@ def delete_contract(
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
     
+    unindex_contract(db, contract_id)
+    contract_removed(db, contract.customer_id, contract.status)
     db.delete(contract)
     db.commit()
+    existence_cache.forget(Contract.contract_id)
+    invalidate_cache("contracts", "customers")
     return None
@@ -1,8 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session, aliased, selectinload
 from typing import List
-from models import get_db, Customer
-from schemas import CustomerCreate, CustomerUpdate, CustomerResponse
+from models import get_db, Customer, Contract, Event, Note, Action
+from models.search_index import index_document, unindex_customer
+from models.event_rollup import customer_rollups_removed
+from models.event_partition import partitions_for_range
+from routes.events import partitioned_events
+from schemas import (
+    CustomerCreate,
+    CustomerUpdate,
+    CustomerResponse,
+    ContractResponse,
+    ContractOverview,
+    CustomerOverview,
+    EventResponse,
+    NoteResponse,
+    ActionResponse,
+)
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.cache import cached_response, cache_response, cache_body, invalidate_cache
+from utils.serialization import dumps, projected_columns, fetch_dicts, keyset_dicts
+from utils.existence import existence_cache
 
 router = APIRouter(
     prefix="/customers",
@@ -18,32 +37,124 @@ def create_customer(
     """Create a new customer"""
     db_customer = Customer(**customer.model_dump())
     db.add(db_customer)
+    db.flush()
+    index_document(db, db_customer)
+    generation = existence_cache.generation(Customer.customer_id)
     db.commit()
+    existence_cache.add(Customer.customer_id, [db_customer.customer_id], generation)
     db.refresh(db_customer)
+    invalidate_cache("customers")
     return db_customer
 
 
 @router.get("/", response_model=List[CustomerResponse])
 def get_customers(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
     db: Session = Depends(get_db)
 ):
     """Get all customers with pagination"""
-    customers = db.query(Customer).offset(skip).limit(limit).all()
-    return customers
+    cached = cached_response(request, "customers")
+    if cached:
+        return cached
+
+    statement = select(*projected_columns(Customer, CustomerResponse, fields))
+    headers = {}
+
+    if cursor is not None:
+        customers, next_cursor = keyset_dicts(db, statement, Customer.customer_id, cursor, limit)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        customers = fetch_dicts(db, statement.order_by(Customer.customer_id).offset(skip).limit(limit))
+
+    return cache_body(request, "customers", dumps(customers), headers)
 
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
 def get_customer(
     customer_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Get a customer by ID"""
+    cached = cached_response(request, "customers")
+    if cached:
+        return cached
+
     customer = db.query(Customer).filter(Customer.customer_id == customer_id).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    return cache_response(request, "customers", CustomerResponse.model_validate(customer))
+
+
+def _newest_per_contract(db: Session, model, timestamp_column, id_column, contract_ids, limit: int) -> dict:
+    """
+    The newest `limit` rows of `model` per contract by (timestamp, id), newest
+    first, keyed by contract ID; one query ranking rows with row_number()
+    over the (contract_id, timestamp) index instead of loading every row.
+    """
+    newest = {contract_id: [] for contract_id in contract_ids}
+    if not contract_ids or limit == 0:
+        return newest
+    rank = func.row_number().over(
+        partition_by=model.contract_id,
+        order_by=(timestamp_column.desc().nulls_last(), id_column.desc()),
+    ).label("rank")
+    ranked = select(model, rank).where(model.contract_id.in_(contract_ids)).subquery()
+    row = aliased(model, ranked)
+    for item in db.scalars(
+        select(row).where(ranked.c.rank <= limit).order_by(ranked.c.contract_id, ranked.c.rank)
+    ):
+        newest[item.contract_id].append(item)
+    return newest
+
+
+@router.get("/{customer_id}/overview", response_model=CustomerOverview)
+def get_customer_overview(
+    customer_id: int,
+    notes_limit: int = Query(5, ge=0, le=50),
+    actions_limit: int = Query(5, ge=0, le=50),
+    events_limit: int = Query(20, ge=0, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get a customer with their contracts, latest notes/actions and recent events"""
+    # One query per level: customer, contracts, then the newest notes and
+    # actions of all contracts, each trimmed per contract in SQL
+    customer = db.query(Customer).options(
+        selectinload(Customer.contracts)
+    ).filter(Customer.customer_id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    contract_ids = sorted(contract.contract_id for contract in customer.contracts)
+    notes = _newest_per_contract(db, Note, Note.created_at, Note.note_id, contract_ids, notes_limit)
+    actions = _newest_per_contract(db, Action, Action.acted_at, Action.action_id, contract_ids, actions_limit)
+
+    # Events are unbounded per customer, so fetch only the recent ones
+    # through the (customer_id, timestamp) index instead of Customer.events;
+    # with partitions, each table contributes at most its newest events_limit
+    partitions = partitions_for_range(db.get_bind())
+    events = partitioned_events(partitions, customer_id, depth=events_limit) if partitions else Event
+    recent_events = db.query(events).filter(
+        events.customer_id == customer_id
+    ).order_by(events.timestamp.desc(), events.event_id.desc()).limit(events_limit).all()
+
+    contracts = [
+        ContractOverview(
+            **ContractResponse.model_validate(contract).model_dump(),
+            latest_notes=[NoteResponse.model_validate(note) for note in notes[contract.contract_id]],
+            latest_actions=[ActionResponse.model_validate(action) for action in actions[contract.contract_id]],
+        )
+        for contract in sorted(customer.contracts, key=lambda contract: contract.contract_id)
+    ]
+    return CustomerOverview(
+        **CustomerResponse.model_validate(customer).model_dump(),
+        contracts=contracts,
+        recent_events=[EventResponse.model_validate(event) for event in recent_events],
+    )
 
 
 @router.put("/{customer_id}", response_model=CustomerResponse)
@@ -61,8 +172,10 @@ def update_customer(
     for field, value in update_data.items():
         setattr(customer, field, value)
     
+    index_document(db, customer)
     db.commit()
     db.refresh(customer)
+    invalidate_cache("customers")
     return customer
 
 
@@ -76,6 +189,16 @@ def delete_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    unindex_customer(db, customer_id)
+    customer_rollups_removed(db, customer_id)
+    # The cascade only reaches the hot events table; archived events have no
+    # foreign key, so they are deleted from each partition explicitly
+    for table in partitions_for_range(db.get_bind()):
+        db.execute(delete(table).where(table.c.customer_id == customer_id))
     db.delete(customer)
     db.commit()
+    # Contracts are deleted along with the customer
+    existence_cache.forget(Customer.customer_id)
+    existence_cache.forget(Contract.contract_id)
+    invalidate_cache("customers", "contracts", "events")
     return None
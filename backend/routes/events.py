@@ -1,34 +1,265 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import Session, aliased
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
+import json
+import logging
+import uuid
+import config
 from models import get_db, Event, Customer
-from schemas import EventCreate, EventResponse
+from models.event_partition import events_union, partitions_for_range
+from models.summary import events_added, event_removed
+from models.event_rollup import EventRollup, EventRollupTotal, bucket_start, bucket_width, rollups_added, rollup_removed
+from schemas import (
+    EventCreate, EventResponse, EventAccepted, EventBatchResult, EventBatchResponse, EventTimelineBucket,
+)
+from utils.pagination import keyset_filter, NEXT_CURSOR_HEADER
+from utils.export import stream_export
+from utils.serialization import FastJSONResponse, projected_columns, fetch_dicts, keyset_dicts
+from utils.cache import invalidate_cache
+from utils.counts import INCLUDE_TOTAL_PATTERN, id_span, total_count
+from utils.event_buffer import EventBuffer
+from utils.existence import existing_ids, row_exists
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/events",
     tags=["events"]
 )
 
+# Upper bound on rows accepted by a single batch upload
+MAX_BATCH_SIZE = 50000
+# Keep IN lists well under SQLite's bound-parameter limit
+CUSTOMER_LOOKUP_CHUNK = 5000
+# Buckets shown when a timeline has no start_date, and the most one may span
+TIMELINE_DEFAULT_BUCKETS = {"hour": 48, "day": 30}
+MAX_TIMELINE_BUCKETS = 5000
+
+
+async def read_event_batch(request: Request) -> list:
+    """Dependency that parses a batch upload body as a JSON array or NDJSON"""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed batch body")
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON")
+    if len(rows) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} events")
+    return rows
+
+
+def apply_event_filters(query, customer_id=None, event_type=None, start_date=None, end_date=None,
+                        columns=Event):
+    """
+    Apply the list filters shared by event listing and export.
+
+    `columns` is the entity or table columns to filter on, so the same
+    filters apply to the hot table and to archived partitions.
+    """
+    if customer_id:
+        query = query.filter(columns.customer_id == customer_id)
+    if event_type:
+        query = query.filter(columns.event_type == event_type)
+    if start_date:
+        query = query.filter(columns.timestamp >= start_date)
+    if end_date:
+        query = query.filter(columns.timestamp <= end_date)
+    return query
+
+
+def partitioned_events(partitions, customer_id=None, event_type=None, start_date=None, end_date=None,
+                       cursor=None, depth=None):
+    """
+    Event entity mapped over the hot table and the given partitions.
+
+    Filters (and the keyset cursor) are applied inside every branch of the
+    UNION ALL so each table is searched through its own indexes; with a
+    `depth`, each branch also returns only its newest `depth` rows, which is
+    all a page at that depth can need.
+    """
+    def branch(table):
+        statement = apply_event_filters(
+            select(table), customer_id, event_type, start_date, end_date, columns=table.c
+        )
+        after_cursor = keyset_filter(table.c.event_id, cursor, table.c.timestamp)
+        if after_cursor is not None:
+            statement = statement.where(after_cursor)
+        if depth is not None:
+            statement = statement.order_by(table.c.timestamp.desc(), table.c.event_id.desc()).limit(depth)
+        return statement
+
+    return aliased(Event, events_union(partitions, branch), adapt_on_names=True)
+
+
+def event_count_statement(partitions, customer_id=None, event_type=None, start_date=None, end_date=None):
+    """IDs of the matching events in the hot table and the given partitions, for counting"""
+    return union_all(*(
+        apply_event_filters(select(table.c.event_id), customer_id, event_type, start_date, end_date,
+                            columns=table.c)
+        for table in [Event.__table__, *partitions]
+    ))
+
+
+def estimate_events(db: Session, partitions, customer_id=None, event_type=None, start_date=None,
+                    end_date=None):
+    """Cheap event total for the filters, or None when only a COUNT would do"""
+    if event_type or start_date or end_date:
+        return None
+    if customer_id:
+        return db.scalar(select(Customer.events_count).where(Customer.customer_id == customer_id)) or 0
+    return id_span(db, Event.event_id, *(table.c.event_id for table in partitions))
+
+
+def find_event(db: Session, event_id: int):
+    """Look up an event in the hot table, then in the archived partitions; returns (event, table)"""
+    event = db.query(Event).filter(Event.event_id == event_id).first()
+    if event:
+        return event, Event.__table__
+    for table in reversed(partitions_for_range(db.get_bind())):
+        archived = aliased(Event, table, adapt_on_names=True)
+        event = db.query(archived).filter(archived.event_id == event_id).first()
+        if event:
+            return event, table
+    return None, None
+
+
+def known_customer_ids(db: Session, customer_ids) -> set:
+    """The given customer IDs that exist, from the existence cache or one IN query per chunk"""
+    return existing_ids(db, Customer.customer_id, customer_ids, CUSTOMER_LOOKUP_CHUNK)
+
+
+def insert_events(db: Session, rows: list) -> list:
+    """Insert event dicts with one executemany and count them; returns (event_id, timestamp) rows"""
+    inserted = db.execute(
+        insert(Event).returning(Event.event_id, Event.timestamp, sort_by_parameter_order=True), rows
+    ).all()
+    events_added(db, ((row["customer_id"], timestamp) for row, (_, timestamp) in zip(rows, inserted)))
+    rollups_added(db, (
+        (row["customer_id"], row["event_type"], row["channel"], timestamp)
+        for row, (_, timestamp) in zip(rows, inserted)
+    ))
+    return inserted
+
+
+def write_buffered_events(db: Session, rows: list) -> int:
+    """Write a batch from the event buffer in one transaction; returns the number written"""
+    known = known_customer_ids(db, (row["customer_id"] for row in rows))
+    # Customers deleted since their events were queued
+    writable = [row for row in rows if row["customer_id"] in known]
+    if len(writable) < len(rows):
+        logger.warning("Dropped %d buffered events of deleted customers", len(rows) - len(writable))
+    if writable:
+        insert_events(db, writable)
+        db.commit()
+        invalidate_cache("events")
+    return len(writable)
+
+
+event_buffer = EventBuffer(
+    write_buffered_events,
+    max_rows=config.EVENT_BUFFER_MAX_ROWS,
+    batch_size=config.EVENT_BUFFER_BATCH,
+    flush_interval=config.EVENT_BUFFER_FLUSH_MS / 1000,
+)
+
+
+def buffer_event(event: EventCreate) -> JSONResponse:
+    """Queue a validated event for the buffer's writer; 202, or 429 when the queue is full"""
+    row = event.model_dump()
+    row["correlation_id"] = row["correlation_id"] or uuid.uuid4().hex
+    if not event_buffer.enqueue(row):
+        raise HTTPException(status_code=429, detail="Event queue is full, retry later",
+                            headers={"Retry-After": "1"})
+    return JSONResponse(
+        status_code=202,
+        content=EventAccepted(correlation_id=row["correlation_id"]).model_dump()
+    )
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'body'}: {error['msg']}"
+        for error in exc.errors()
+    )
 
-@router.post("/", response_model=EventResponse, status_code=201)
+
+@router.post("/", response_model=EventResponse, status_code=201,
+             responses={202: {"model": EventAccepted, "description": "Queued (write-behind mode)"},
+                        429: {"description": "Event queue is full"}})
 def create_event(
     event: EventCreate,
     db: Session = Depends(get_db)
 ):
-    """Create a new event"""
-    # Check if customer exists
-    customer = db.query(Customer).filter(Customer.customer_id == event.customer_id).first()
-    if not customer:
+    """Create a new event (queued and answered with 202 when the event buffer is running)"""
+    if not row_exists(db, Customer.customer_id, event.customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
+    if event_buffer.running:
+        return buffer_event(event)
     
     db_event = Event(**event.model_dump())
     db.add(db_event)
+    db.flush()
+    # Loads the server-default timestamp
+    events_added(db, [(db_event.customer_id, db_event.timestamp)])
+    rollups_added(db, [(db_event.customer_id, db_event.event_type, db_event.channel, db_event.timestamp)])
     db.commit()
     db.refresh(db_event)
+    invalidate_cache("events")
     return db_event
 
 
+@router.post("/batch", response_model=EventBatchResponse)
+def create_events_batch(
+    rows: list = Depends(read_event_batch),
+    db: Session = Depends(get_db)
+):
+    """Create many events in one transaction, reporting the outcome per row"""
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, EventCreate.model_validate(row)))
+        except ValidationError as exc:
+            results[index] = EventBatchResult(
+                index=index, status="rejected", error=_format_validation_error(exc)
+            )
+
+    known_customers = known_customer_ids(db, (event.customer_id for _, event in valid))
+
+    to_insert = []
+    for index, event in valid:
+        if event.customer_id in known_customers:
+            to_insert.append((index, event.model_dump()))
+        else:
+            results[index] = EventBatchResult(
+                index=index, status="rejected", error="Customer not found"
+            )
+
+    if to_insert:
+        inserted = insert_events(db, [values for _, values in to_insert])
+        db.commit()
+        invalidate_cache("events")
+        for (index, _), (event_id, _) in zip(to_insert, inserted):
+            results[index] = EventBatchResult(index=index, status="accepted", event_id=event_id)
+
+    return EventBatchResponse(
+        accepted=len(to_insert),
+        rejected=len(rows) - len(to_insert),
+        results=results
+    )
+
+
 @router.get("/", response_model=List[EventResponse])
 def get_events(
     skip: int = Query(0, ge=0),
@@ -37,22 +268,114 @@ def get_events(
     event_type: str = Query(None),
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
+    include_total: str = Query(None, pattern=INCLUDE_TOTAL_PATTERN,
+                               description="Return the total in X-Total-Count: exact or estimate"),
     db: Session = Depends(get_db)
 ):
     """Get all events with optional filtering"""
-    query = db.query(Event)
-    
-    if customer_id:
-        query = query.filter(Event.customer_id == customer_id)
-    if event_type:
-        query = query.filter(Event.event_type == event_type)
-    if start_date:
-        query = query.filter(Event.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Event.timestamp <= end_date)
-    
-    events = query.order_by(Event.timestamp.desc()).offset(skip).limit(limit).all()
-    return events
+    # Only partitions overlapping the requested date range are read
+    partitions = partitions_for_range(db.get_bind(), start_date, end_date)
+    headers = {}
+    if include_total:
+        filters = dict(customer_id=customer_id, event_type=event_type, start_date=start_date, end_date=end_date)
+        headers.update(total_count(
+            db, "events", filters, event_count_statement(partitions, **filters), include_total,
+            estimate=lambda: estimate_events(db, partitions, **filters)
+        ))
+
+    if partitions:
+        depth = limit + 1 if cursor is not None else skip + limit
+        entity = partitioned_events(
+            partitions, customer_id, event_type, start_date, end_date, cursor, depth
+        )
+        statement = select(*projected_columns(entity, EventResponse, fields))
+    else:
+        entity = Event
+        statement = apply_event_filters(
+            select(*projected_columns(Event, EventResponse, fields)), customer_id, event_type, start_date, end_date
+        )
+
+    if cursor is not None:
+        events, next_cursor = keyset_dicts(
+            db, statement, entity.event_id, cursor, limit, sort_column=entity.timestamp
+        )
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return FastJSONResponse(events, headers=headers)
+
+    statement = statement.order_by(entity.timestamp.desc(), entity.event_id.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(fetch_dicts(db, statement), headers=headers)
+
+
+@router.get("/export")
+def export_events(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    customer_id: int = Query(None),
+    event_type: str = Query(None),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Stream all matching events as NDJSON or CSV"""
+    partitions = partitions_for_range(db.get_bind(), start_date, end_date)
+    if partitions:
+        events = partitioned_events(partitions, customer_id, event_type, start_date, end_date)
+        statement = select(*(getattr(events, column.key) for column in Event.__table__.columns))
+    else:
+        events = Event
+        statement = apply_event_filters(
+            select(Event.__table__), customer_id, event_type, start_date, end_date
+        )
+    statement = statement.order_by(events.timestamp.desc(), events.event_id.desc())
+    return stream_export(db, statement, "events", export_format)
+
+
+@router.get("/timeline", response_model=List[EventTimelineBucket])
+def get_event_timeline(
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    customer_id: int = Query(None),
+    event_type: str = Query(None),
+    channel: str = Query(None),
+    group_by: str = Query(None, pattern="^(event_type|channel)$",
+                          description="Split each bucket by event type or channel"),
+    db: Session = Depends(get_db)
+):
+    """Event counts per hour or day from the rollups; buckets without events are left out"""
+    width = bucket_width(granularity)
+    end = bucket_start(end_date or datetime.now(timezone.utc), granularity)
+    if start_date is not None:
+        start = bucket_start(start_date, granularity)
+    else:
+        start = end - width * (TIMELINE_DEFAULT_BUCKETS[granularity] - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date is after end_date")
+    if (end - start) / width >= MAX_TIMELINE_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Timelines span at most {MAX_TIMELINE_BUCKETS} buckets")
+
+    # Timelines across all customers read the customer-agnostic totals
+    rollups = EventRollup if customer_id is not None else EventRollupTotal
+    columns = [rollups.bucket_start]
+    if group_by:
+        columns.append(getattr(rollups, group_by))
+    total = func.sum(rollups.count)
+    statement = (
+        select(*columns, total.label("count"))
+        .where(rollups.granularity == granularity, rollups.bucket_start.between(start, end))
+        .group_by(*columns)
+        .having(total > 0)
+        .order_by(*columns)
+    )
+    filters = [(rollups.event_type, event_type), (rollups.channel, channel)]
+    if customer_id is not None:
+        filters.append((EventRollup.customer_id, customer_id))
+    for column, value in filters:
+        if value is not None:
+            statement = statement.where(column == value)
+    return FastJSONResponse(fetch_dicts(db, statement))
 
 
 @router.get("/{event_id}", response_model=EventResponse)
@@ -61,7 +384,7 @@ def get_event(
     db: Session = Depends(get_db)
 ):
     """Get an event by ID"""
-    event = db.query(Event).filter(Event.event_id == event_id).first()
+    event, _ = find_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
@@ -73,10 +396,18 @@ def delete_event(
     db: Session = Depends(get_db)
 ):
     """Delete an event"""
-    event = db.query(Event).filter(Event.event_id == event_id).first()
+    event, table = find_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    db.delete(event)
+    customer_id, event_type, channel, timestamp = event.customer_id, event.event_type, event.channel, event.timestamp
+    if table is Event.__table__:
+        db.delete(event)
+    else:
+        db.execute(delete(table).where(table.c.event_id == event_id))
+    db.flush()
+    event_removed(db, customer_id, timestamp)
+    rollup_removed(db, customer_id, event_type, channel, timestamp)
     db.commit()
+    invalidate_cache("events")
     return None
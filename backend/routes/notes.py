@@ -1,9 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 from models import get_db, Note, Contract
+from models.search_index import index_document, unindex_documents
+from models.summary import notes_added
 from schemas import NoteCreate, NoteUpdate, NoteResponse
+from utils.cache import invalidate_cache
+from utils.existence import row_exists
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.serialization import FastJSONResponse, projected_columns, fetch_dicts, keyset_dicts
 
 router = APIRouter(
     prefix="/notes",
@@ -17,9 +24,7 @@ def create_note(
     db: Session = Depends(get_db)
 ):
     """Create a new note"""
-    # Check if contract exists
-    contract = db.query(Contract).filter(Contract.contract_id == note.contract_id).first()
-    if not contract:
+    if not row_exists(db, Contract.contract_id, note.contract_id):
         raise HTTPException(status_code=404, detail="Contract not found")
     
     # If parent_comment_id is provided, check if it exists
@@ -30,8 +35,13 @@ def create_note(
     
     db_note = Note(**note.model_dump())
     db.add(db_note)
+    db.flush()
+    index_document(db, db_note)
+    notes_added(db, db_note.contract_id)
     db.commit()
     db.refresh(db_note)
+    # The contract's notes_count changed
+    invalidate_cache("contracts")
     return db_note
 
 
@@ -40,16 +50,25 @@ def get_notes(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     contract_id: int = Query(None),
+    cursor: str = Query(None, description="Keyset cursor; pass empty for the first page"),
+    fields: str = Query(None, description="Comma-separated response fields to return"),
     db: Session = Depends(get_db)
 ):
     """Get all notes with optional filtering"""
-    query = db.query(Note)
+    statement = select(*projected_columns(Note, NoteResponse, fields))
     
     if contract_id:
-        query = query.filter(Note.contract_id == contract_id)
+        statement = statement.where(Note.contract_id == contract_id)
     
-    notes = query.order_by(Note.created_at.desc()).offset(skip).limit(limit).all()
-    return notes
+    if cursor is not None:
+        notes, next_cursor = keyset_dicts(
+            db, statement, Note.note_id, cursor, limit, sort_column=Note.created_at
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return FastJSONResponse(notes, headers=headers)
+
+    statement = statement.order_by(Note.created_at.desc(), Note.note_id.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(fetch_dicts(db, statement))
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
@@ -80,6 +99,7 @@ def update_note(
         setattr(note, field, value)
     
     note.edited_at = datetime.now()
+    index_document(db, note)
     db.commit()
     db.refresh(note)
     return note
@@ -95,6 +115,9 @@ def delete_note(
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
+    unindex_documents(db, "note", Note.note_id == note_id)
+    notes_added(db, note.contract_id, -1)
     db.delete(note)
     db.commit()
+    invalidate_cache("contracts")
     return None
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from models import get_db
+from models.search_index import SEARCH_KINDS, fts_query, search_documents_page
+from schemas import SearchResult
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"]
+)
+
+
+@router.get("/", response_model=List[SearchResult])
+def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find; each matches as a prefix"),
+    types: List[str] = Query(
+        None, alias="type", description=f"Restrict to {', '.join(SEARCH_KINDS)} (repeatable)"
+    ),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over customers, contracts, notes and actions, best matches first"""
+    if db.get_bind().dialect.name != "sqlite":
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite FTS5")
+    unknown = set(types or []) - set(SEARCH_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {', '.join(sorted(unknown))}")
+    match = fts_query(q)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Query must contain at least one word")
+
+    return [
+        SearchResult(type=kind, id=row_id, score=score, title=title, snippet=snippet)
+        for kind, row_id, score, title, snippet in search_documents_page(db, match, types, skip, limit)
+    ]
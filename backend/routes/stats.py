@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from models import get_db, Contract, Event, Action
+from models.database import utc_now
+from models.event_partition import partitions_for_range
+from routes.events import apply_event_filters, partitioned_events
+from schemas import StatsTable
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"]
+)
+
+# strftime formats for SQLite and date_trunc units for other databases
+TIME_BUCKETS = {
+    "hour": ("%Y-%m-%d %H:00:00", "hour"),
+    "day": ("%Y-%m-%d", "day"),
+}
+
+
+def time_bucket(db: Session, column, bucket: str):
+    """SQL expression truncating a timestamp column to an hour or day bucket"""
+    sqlite_format, trunc_unit = TIME_BUCKETS[bucket]
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime(sqlite_format, column)
+    return func.date_trunc(trunc_unit, column)
+
+
+def _table(columns, rows) -> StatsTable:
+    return StatsTable(columns=columns, rows=[list(row) for row in rows])
+
+
+@router.get("/contracts", response_model=StatsTable)
+def contract_stats(
+    group_by: str = Query("status", pattern="^(status|type)$"),
+    customer_id: int = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Count contracts per status or type"""
+    key = getattr(Contract, group_by)
+    query = db.query(key, func.count(Contract.contract_id))
+    if customer_id:
+        query = query.filter(Contract.customer_id == customer_id)
+    rows = query.group_by(key).order_by(key).all()
+    return _table([group_by, "count"], rows)
+
+
+@router.get("/contracts/expiring", response_model=StatsTable)
+def expiring_contract_stats(
+    days: int = Query(30, ge=1, le=3650),
+    db: Session = Depends(get_db)
+):
+    """Count contracts expiring within the next N days, per expiration day and status"""
+    now = utc_now()
+    day = func.date(Contract.expiration_date)
+    rows = db.query(day, Contract.status, func.count(Contract.contract_id)).filter(
+        Contract.expiration_date >= now,
+        Contract.expiration_date < now + timedelta(days=days)
+    ).group_by(day, Contract.status).order_by(day, Contract.status).all()
+    return _table(["expiration_date", "status", "count"], rows)
+
+
+@router.get("/events", response_model=StatsTable)
+def event_stats(
+    group_by: str = Query("event_type", pattern="^(event_type|channel)$"),
+    bucket: str = Query("day", pattern="^(hour|day)$"),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    customer_id: int = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Count events per event type or channel, bucketed by hour or day"""
+    # Archived months count too; only partitions overlapping the range are read
+    partitions = partitions_for_range(db.get_bind(), start_date, end_date)
+    events = partitioned_events(partitions, customer_id, None, start_date, end_date) if partitions else Event
+    key = getattr(events, group_by)
+    period = time_bucket(db, events.timestamp, bucket)
+    query = db.query(period, key, func.count(events.event_id))
+    if not partitions:
+        query = apply_event_filters(query, customer_id, None, start_date, end_date)
+    rows = query.group_by(period, key).order_by(period, key).all()
+    return _table([bucket, group_by, "count"], rows)
+
+
+@router.get("/actions", response_model=StatsTable)
+def action_stats(
+    group_by: str = Query("acted_by", pattern="^(acted_by|action_type)$"),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Count actions per user or action type"""
+    key = getattr(Action, group_by)
+    query = db.query(key, func.count(Action.action_id))
+    if start_date:
+        query = query.filter(Action.acted_at >= start_date)
+    if end_date:
+        query = query.filter(Action.acted_at <= end_date)
+    rows = query.group_by(key).order_by(key).all()
+    return _table([group_by, "count"], rows)
@@ -1,21 +1,43 @@
-from schemas.customer import CustomerCreate, CustomerUpdate, CustomerResponse
+from schemas.customer import (
+    CustomerCreate,
+    CustomerUpdate,
+    CustomerResponse,
+    ContractOverview,
+    CustomerOverview,
+)
 from schemas.contract import ContractCreate, ContractUpdate, ContractResponse
-from schemas.event import EventCreate, EventResponse
-from schemas.note import NoteCreate, NoteUpdate, NoteResponse
-from schemas.action import ActionCreate, ActionResponse
+from schemas.event import (
+    EventCreate, EventResponse, EventAccepted, EventBatchResult, EventBatchResponse, EventTimelineBucket,
+)
+from schemas.note import NoteCreate, NoteUpdate, NoteResponse, NoteThread
+from schemas.action import ActionCreate, ActionResponse, ActionBulkCreate, ActionBulkResult, ActionBulkResponse
+from schemas.stats import StatsTable
+from schemas.search import SearchResult
 
 __all__ = [
     "CustomerCreate",
     "CustomerUpdate", 
     "CustomerResponse",
+    "ContractOverview",
+    "CustomerOverview",
     "ContractCreate",
     "ContractUpdate",
     "ContractResponse",
     "EventCreate",
     "EventResponse",
+    "EventAccepted",
+    "EventTimelineBucket",
+    "EventBatchResult",
+    "EventBatchResponse",
     "NoteCreate",
     "NoteUpdate",
     "NoteResponse",
+    "NoteThread",
     "ActionCreate",
     "ActionResponse",
+    "ActionBulkCreate",
+    "ActionBulkResult",
+    "ActionBulkResponse",
+    "StatsTable",
+    "SearchResult",
 ]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 class ActionCreate(BaseModel):
@@ -24,3 +24,28 @@ class ActionResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ActionBulkCreate(BaseModel):
+    """Schema for applying one workflow action to many contracts"""
+    contract_ids: List[int] = Field(..., min_length=1, max_length=10000, description="Contracts to act on")
+    action_type: str = Field(..., pattern="^(approve|reject|reopen)$", description="approve, reject or reopen")
+    action_note: Optional[str] = Field(None, description="Note stored on every created action")
+    acted_by: str = Field(..., description="User who performed the action")
+
+
+class ActionBulkResult(BaseModel):
+    """Schema for the outcome of a bulk action for one contract"""
+    contract_id: int
+    status: str = Field(..., description="applied or rejected")
+    action_id: Optional[int] = None
+    prior_status: Optional[str] = None
+    new_status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ActionBulkResponse(BaseModel):
+    """Schema for bulk action response"""
+    applied: int
+    rejected: int
+    results: List[ActionBulkResult]
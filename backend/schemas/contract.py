@@ -40,6 +40,8 @@ class ContractResponse(ContractBase):
     last_action_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
+    notes_count: int = Field(0, description="Number of notes")
+    actions_count: int = Field(0, description="Number of actions")
 
     class Config:
         from_attributes = True
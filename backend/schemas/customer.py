@@ -1,6 +1,10 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
+from schemas.contract import ContractResponse
+from schemas.event import EventResponse
+from schemas.note import NoteResponse
+from schemas.action import ActionResponse
 
 
 class CustomerBase(BaseModel):
@@ -33,7 +37,26 @@ class CustomerResponse(CustomerBase):
     customer_id: int
     created_at: datetime
     updated_at: datetime
+    contracts_count: int = Field(0, description="Number of contracts")
+    open_approvals_count: int = Field(0, description="Contracts pending approval")
+    events_count: int = Field(0, description="Number of events")
+    recent_events_count: int = Field(0, description=(
+        "Events in the last 30 days; older events leave the count only when the event "
+        "counters are rebuilt (partition_events.py or the events_maintenance job)"
+    ))
+    last_event_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True  # For Pydantic v2 compatibility with SQLAlchemy
 
+
+class ContractOverview(ContractResponse):
+    """Schema for a contract with its latest notes and actions"""
+    latest_notes: List[NoteResponse] = []
+    latest_actions: List[ActionResponse] = []
+
+
+class CustomerOverview(CustomerResponse):
+    """Schema for the customer detail page: contracts and recent activity"""
+    contracts: List[ContractOverview] = []
+    recent_events: List[EventResponse] = []
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class EventCreate(BaseModel):
@@ -29,3 +29,31 @@ class EventResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class EventTimelineBucket(BaseModel):
+    """Schema for one bucket of an event timeline"""
+    bucket_start: datetime = Field(..., description="Start of the hour or day (UTC)")
+    event_type: Optional[str] = Field(None, description="Set when grouped by event_type")
+    channel: Optional[str] = Field(None, description="Set when grouped by channel")
+    count: int
+
+
+class EventAccepted(BaseModel):
+    """Schema for an event queued by the write-behind event buffer"""
+    status: str = "queued"
+    correlation_id: str = Field(..., description="The event's correlation_id (server-assigned when not sent)")
+
+
+class EventBatchResult(BaseModel):
+    """Schema for the outcome of one row of a batch event upload"""
+    index: int = Field(..., description="Position of the row in the submitted batch")
+    status: str = Field(..., description="accepted or rejected")
+    event_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class EventBatchResponse(BaseModel):
+    """Schema for batch event upload response"""
+    accepted: int
+    rejected: int
+    results: List[EventBatchResult]
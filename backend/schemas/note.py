@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class NoteBase(BaseModel):
@@ -33,3 +33,10 @@ class NoteResponse(NoteBase):
     class Config:
         from_attributes = True
 
+
+
+class NoteThread(NoteResponse):
+    """Schema for a note with its replies, oldest first"""
+    depth: int = Field(..., description="0 for a root comment")
+    has_more_replies: bool = Field(False, description="Replies exist below the requested max_depth")
+    replies: List["NoteThread"] = []
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class SearchResult(BaseModel):
+    """Schema for one full-text search hit"""
+    type: str = Field(..., description="customer, contract, note or action")
+    id: int = Field(..., description="ID of the matching row")
+    score: float = Field(..., description="Relevance; higher is better")
+    title: Optional[str] = Field(None, description="Name, type or action type, HTML-escaped, with matches in <mark>")
+    snippet: str = Field(..., description="Excerpt of the matching text, HTML-escaped, with matches in <mark>")
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import List, Any
+
+
+class StatsTable(BaseModel):
+    """Schema for aggregate results as a header plus compact rows"""
+    columns: List[str] = Field(..., description="Column names for each row")
+    rows: List[List[Any]] = Field(..., description="One array of values per group")
@@ -1,39 +1,63 @@
 """
 Seed data script for populating the database with fake data using Faker.
+
+Run without arguments to insert a handful of rows through the ORM. Pass
+--bulk (with optional row counts) to generate large datasets: columns are
+generated a batch at a time from pre-built Faker pools, optionally across
+worker processes, and written with Core executemany in large transactions.
+
+    python seed_data.py --bulk --events 5000000 --contracts 200000 --workers 4
 """
 from faker import Faker
-from datetime import datetime
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+import argparse
 import random
+import time
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from models.database import SessionLocal, engine
+from models.database import SessionLocal, engine, init_db
 from models.customer import Customer
 from models.contract import Contract
 from models.event import Event
-from models.database import Base
+from models.note import Note
+from models.action import Action
+from models.search_index import rebuild_search_index
+from models.summary import rebuild_summaries
+from models.event_rollup import rebuild_all_event_rollups
 
 # Initialize Faker
 fake = Faker()
 
-# Initialize database tables
-Base.metadata.create_all(bind=engine)
+SEGMENTS = ["Retail", "Corporate", "SME", "Enterprise", "Government"]
+RISK_LEVELS = ["Low", "Medium", "High"]
+CUSTOMER_STATUSES = ["Active", "Inactive", "Pending"]
+CONTRACT_TYPES = ["Service Agreement", "License Agreement", "Maintenance Contract",
+                  "Support Contract", "NDA", "Purchase Agreement", "SLA"]
+CONTRACT_STATUSES = ["Draft", "Pending Approval", "Approved", "Rejected", "Active", "Expired"]
+USERS = ["admin", "john.doe", "jane.smith", "manager", "sales.rep"]
+EVENT_TYPES = ["Login", "Logout", "Password Reset", "Contract View", "Contract Download",
+               "Profile Update", "Payment", "Contract Sign", "Document Upload", "Query"]
+CHANNELS = ["Web", "Mobile", "API"]
+ACTION_STATUSES = {"approve": "Approved", "reject": "Rejected", "reopen": "Pending Approval", "flag": None}
+
+# Number of distinct Faker values generated per pool in bulk mode
+FAKER_POOL_SIZE = 1000
 
 
 def seed_customers(db: Session, count: int = 5):
     """Create fake customers"""
     customers = []
-    segments = ["Retail", "Corporate", "SME", "Enterprise", "Government"]
-    risk_levels = ["Low", "Medium", "High"]
-    statuses = ["Active", "Inactive", "Pending"]
     
     for _ in range(count):
         customer = Customer(
             name=fake.company() if random.choice([True, False]) else fake.name(),
             email=fake.unique.email(),
             phone=fake.phone_number()[:20],  # Limit to 20 chars
-            segment=random.choice(segments),
-            risk_level=random.choice(risk_levels),
-            status=random.choice(statuses)
+            segment=random.choice(SEGMENTS),
+            risk_level=random.choice(RISK_LEVELS),
+            status=random.choice(CUSTOMER_STATUSES)
         )
         db.add(customer)
         customers.append(customer)
@@ -45,10 +69,6 @@ def seed_customers(db: Session, count: int = 5):
 def seed_contracts(db: Session, customers: list, count: int = 10):
     """Create fake contracts for customers"""
     contracts = []
-    contract_types = ["Service Agreement", "License Agreement", "Maintenance Contract", 
-                     "Support Contract", "NDA", "Purchase Agreement", "SLA"]
-    contract_statuses = ["Draft", "Pending Approval", "Approved", "Rejected", "Active", "Expired"]
-    users = ["admin", "john.doe", "jane.smith", "manager", "sales.rep"]
     
     for _ in range(count):
         customer = random.choice(customers)
@@ -59,14 +79,14 @@ def seed_contracts(db: Session, customers: list, count: int = 10):
         
         contract = Contract(
             customer_id=customer.customer_id,
-            type=random.choice(contract_types),
-            status=random.choice(contract_statuses),
+            type=random.choice(CONTRACT_TYPES),
+            status=random.choice(CONTRACT_STATUSES),
             effective_date=effective_date,
             expiration_date=expiration_date,
             terms_ref=fake.url() if random.choice([True, False]) else None,
             attachments_ref=fake.file_path(depth=2) if random.choice([True, False]) else None,
-            created_by=random.choice(users),
-            updated_by=random.choice(users),
+            created_by=random.choice(USERS),
+            updated_by=random.choice(USERS),
             last_action_at=fake.date_time_between(start_date=effective_date, end_date="now") if random.choice([True, False]) else None
         )
         db.add(contract)
@@ -79,9 +99,6 @@ def seed_contracts(db: Session, customers: list, count: int = 10):
 def seed_events(db: Session, customers: list, count: int = 20):
     """Create fake events for customers"""
     events = []
-    event_types = ["Login", "Logout", "Password Reset", "Contract View", "Contract Download",
-                  "Profile Update", "Payment", "Contract Sign", "Document Upload", "Query"]
-    channels = ["Web", "Mobile", "API"]
     
     for _ in range(count):
         customer = random.choice(customers)
@@ -89,9 +106,9 @@ def seed_events(db: Session, customers: list, count: int = 20):
         
         event = Event(
             customer_id=customer.customer_id,
-            event_type=random.choice(event_types),
+            event_type=random.choice(EVENT_TYPES),
             timestamp=timestamp,
-            channel=random.choice(channels),
+            channel=random.choice(CHANNELS),
             ip_address=fake.ipv4() if random.choice([True, False]) else None,
             user_agent=fake.user_agent() if random.choice([True, False]) else None,
             metadata_json={"action": fake.word(), "result": fake.word(), "details": fake.sentence()} if random.choice([True, False]) else None,
@@ -104,6 +121,250 @@ def seed_events(db: Session, customers: list, count: int = 20):
     return events
 
 
+# ---------------------------------------------------------------------------
+# Bulk mode
+# ---------------------------------------------------------------------------
+
+_faker_pools = {}
+
+
+def _pools(seed: int) -> dict:
+    """Pre-generated Faker values sampled by the batch generators (built once per process)"""
+    if seed not in _faker_pools:
+        pool_fake = Faker()
+        pool_fake.seed_instance(seed)
+        size = FAKER_POOL_SIZE
+        _faker_pools[seed] = {
+            "names": [pool_fake.company() if i % 2 else pool_fake.name() for i in range(size)],
+            "phones": [pool_fake.phone_number()[:20] for _ in range(size)],
+            # Nullable columns: padding with None gives a 50% null rate
+            "urls": [pool_fake.url() for _ in range(size)] + [None] * size,
+            "paths": [pool_fake.file_path(depth=2) for _ in range(size)] + [None] * size,
+            "ips": [pool_fake.ipv4() for _ in range(size)] + [None] * size,
+            "user_agents": [pool_fake.user_agent() for _ in range(size)] + [None] * size,
+            "metadata": [
+                {"action": pool_fake.word(), "result": pool_fake.word(), "details": pool_fake.sentence()}
+                for _ in range(size)
+            ] + [None] * size,
+            "sentences": [pool_fake.paragraph(nb_sentences=2)[:1000] for _ in range(size)],
+            "action_notes": [pool_fake.sentence() for _ in range(size)] + [None] * size,
+        }
+    return _faker_pools[seed]
+
+
+def _rows(columns: dict) -> list:
+    """Turn {column: [values]} into the list of dicts executemany expects"""
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def _seconds_before(rng, now: datetime, max_days: int, size: int) -> list:
+    return [now - timedelta(seconds=s) for s in rng.choices(range(max_days * 86400), k=size)]
+
+
+def _customer_batch(spec):
+    seed, start, size, context = spec
+    rng = random.Random(f"customers-{seed}-{start}")
+    pools = _pools(seed)
+    first_id = context["first_id"] + start
+    return _rows({
+        "name": rng.choices(pools["names"], k=size),
+        "email": [f"customer{first_id + i}@bulk.example.com" for i in range(size)],
+        "phone": rng.choices(pools["phones"], k=size),
+        "segment": rng.choices(SEGMENTS, k=size),
+        "risk_level": rng.choices(RISK_LEVELS, k=size),
+        "status": rng.choices(CUSTOMER_STATUSES, k=size),
+    })
+
+
+def _contract_batch(spec):
+    seed, start, size, context = spec
+    rng = random.Random(f"contracts-{seed}-{start}")
+    pools = _pools(seed)
+    now = context["now"]
+    effective = _seconds_before(rng, now, 730, size)
+    has_expiration = rng.choices((True, False), k=size)
+    expiration_days = rng.choices(range(1, 1460), k=size)
+    last_action_days = rng.choices(range(0, 730), k=size)
+    return _rows({
+        "customer_id": rng.choices(range(context["customer_min"], context["customer_max"] + 1), k=size),
+        "type": rng.choices(CONTRACT_TYPES, k=size),
+        "status": rng.choices(CONTRACT_STATUSES, k=size),
+        "effective_date": effective,
+        "expiration_date": [
+            eff + timedelta(days=days) if has else None
+            for eff, has, days in zip(effective, has_expiration, expiration_days)
+        ],
+        "terms_ref": rng.choices(pools["urls"], k=size),
+        "attachments_ref": rng.choices(pools["paths"], k=size),
+        "created_by": rng.choices(USERS, k=size),
+        "updated_by": rng.choices(USERS, k=size),
+        "last_action_at": [
+            min(now, eff + timedelta(days=days)) if has else None
+            for eff, has, days in zip(effective, has_expiration, last_action_days)
+        ],
+    })
+
+
+def _event_batch(spec):
+    seed, start, size, context = spec
+    rng = random.Random(f"events-{seed}-{start}")
+    pools = _pools(seed)
+    has_correlation = rng.choices((True, False), k=size)
+    return _rows({
+        "customer_id": rng.choices(range(context["customer_min"], context["customer_max"] + 1), k=size),
+        "event_type": rng.choices(EVENT_TYPES, k=size),
+        "timestamp": _seconds_before(rng, context["now"], 365, size),
+        "channel": rng.choices(CHANNELS, k=size),
+        "ip_address": rng.choices(pools["ips"], k=size),
+        "user_agent": rng.choices(pools["user_agents"], k=size),
+        "metadata_json": rng.choices(pools["metadata"], k=size),
+        "correlation_id": [f"{rng.getrandbits(128):032x}" if has else None for has in has_correlation],
+    })
+
+
+def _note_batch(spec):
+    seed, start, size, context = spec
+    rng = random.Random(f"notes-{seed}-{start}")
+    pools = _pools(seed)
+    first_id = context["first_id"] + start
+    contract_ids = rng.choices(range(context["contract_min"], context["contract_max"] + 1), k=size)
+    created_at = _seconds_before(rng, context["now"], 365, size)
+    parent_ids = [None] * size
+    # About one note in five replies to an earlier note of the same batch
+    for i in range(1, size):
+        if rng.random() < 0.2:
+            parent = rng.randrange(i)
+            parent_ids[i] = first_id + parent
+            contract_ids[i] = contract_ids[parent]
+            created_at[i] = max(created_at[i], created_at[parent])
+    return _rows({
+        "contract_id": contract_ids,
+        "body": rng.choices(pools["sentences"], k=size),
+        "parent_comment_id": parent_ids,
+        "created_by": rng.choices(USERS, k=size),
+        "created_at": created_at,
+    })
+
+
+def _action_batch(spec):
+    seed, start, size, context = spec
+    rng = random.Random(f"actions-{seed}-{start}")
+    pools = _pools(seed)
+    action_types = rng.choices(list(ACTION_STATUSES), k=size)
+    return _rows({
+        "contract_id": rng.choices(range(context["contract_min"], context["contract_max"] + 1), k=size),
+        "action_type": action_types,
+        "action_note": rng.choices(pools["action_notes"], k=size),
+        "acted_by": rng.choices(USERS, k=size),
+        "acted_at": _seconds_before(rng, context["now"], 365, size),
+        "prior_status": rng.choices(CONTRACT_STATUSES, k=size),
+        "new_status": [ACTION_STATUSES[action_type] for action_type in action_types],
+    })
+
+
+def _id_range(bind, column):
+    with bind.connect() as conn:
+        low, high = conn.execute(select(func.min(column), func.max(column))).one()
+    return low or 0, high or 0
+
+
+def _bulk_insert(bind, table, generate, count, batch_size, seed, context, pool, progress,
+                 defer_indexes=False):
+    """Generate `count` rows in batches and insert each batch in its own transaction"""
+    if count <= 0:
+        return
+    specs = [
+        (seed, start, min(batch_size, count - start), context)
+        for start in range(0, count, batch_size)
+    ]
+    # Unique indexes stay in place so duplicate keys still fail the load
+    deferred = [index for index in table.indexes if not index.unique] if defer_indexes else []
+    for index in deferred:
+        index.drop(bind=bind, checkfirst=True)
+
+    batches = pool.imap(generate, specs) if pool else map(generate, specs)
+    started = time.perf_counter()
+    inserted = 0
+    for rows in batches:
+        with bind.begin() as conn:
+            conn.execute(table.insert(), rows)
+        inserted += len(rows)
+        progress(f"  {table.name}: {inserted}/{count}")
+
+    # Building an index from sorted data is much cheaper than updating it row by row
+    for index in deferred:
+        index.create(bind=bind, checkfirst=True)
+    elapsed = time.perf_counter() - started
+    progress(f"  {table.name}: {count} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+
+
+def seed_bulk(bind=engine, customers: int = 10000, contracts: int = 100000, events: int = 1000000,
+              notes: int = 100000, actions: int = 100000, seed: int = 42, batch_size: int = 50000,
+              workers: int = 1, defer_indexes: bool = False, progress=print):
+    """
+    Insert large volumes of generated rows with Core executemany.
+
+    New contracts and events reference the customers in the table (and new
+    notes and actions the contracts), so existing data can be extended.
+    With workers > 1, batches are generated in a process pool while the
+    parent process does the inserts. defer_indexes drops each table's
+    non-unique indexes while it is loaded and rebuilds them afterwards;
+    only use it on a database nothing else is reading.
+    """
+    context = {"now": datetime.now().replace(microsecond=0)}
+    pool = Pool(workers) if workers > 1 else None
+    load = dict(batch_size=batch_size, seed=seed, context=context, pool=pool,
+                progress=progress, defer_indexes=defer_indexes)
+    try:
+        context["first_id"] = _id_range(bind, Customer.customer_id)[1] + 1
+        _bulk_insert(bind, Customer.__table__, _customer_batch, customers, **load)
+        context["customer_min"], context["customer_max"] = _id_range(bind, Customer.customer_id)
+        if (contracts or events) and not context["customer_max"]:
+            raise ValueError("Contracts and events need at least one customer")
+
+        _bulk_insert(bind, Contract.__table__, _contract_batch, contracts, **load)
+        _bulk_insert(bind, Event.__table__, _event_batch, events, **load)
+
+        context["contract_min"], context["contract_max"] = _id_range(bind, Contract.contract_id)
+        if (notes or actions) and not context["contract_max"]:
+            raise ValueError("Notes and actions need at least one contract")
+        context["first_id"] = _id_range(bind, Note.note_id)[1] + 1
+        _bulk_insert(bind, Note.__table__, _note_batch, notes, **load)
+        _bulk_insert(bind, Action.__table__, _action_batch, actions, **load)
+
+        # Rows inserted here bypass the API handlers that maintain the search index
+        started = time.perf_counter()
+        rebuild_search_index(bind)
+        progress(f"  search index rebuilt in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        rebuild_summaries(bind)
+        progress(f"  summary counters rebuilt in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        rebuild_all_event_rollups(bind)
+        progress(f"  event rollups rebuilt in {time.perf_counter() - started:.1f}s")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the database with fake data")
+    parser.add_argument("--bulk", action="store_true", help="Generate large volumes with Core executemany")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--contracts", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--actions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed yields the same data")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per generated batch and transaction")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating batches in parallel")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop non-unique indexes while loading and rebuild them afterwards")
+    return parser.parse_args(argv)
+
+
 def main():
     """Main function to seed the database"""
     db: Session = SessionLocal()
@@ -125,6 +386,9 @@ def main():
         print("Creating events...")
         events = seed_events(db, customers, count=20)
         
+        rebuild_search_index(engine)
+        rebuild_summaries(engine)
+        rebuild_all_event_rollups(engine)
         print("Seed data inserted")
         
     except Exception as e:
@@ -136,5 +400,23 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    # Initialize database tables
+    init_db()
+    if args.bulk:
+        seed_bulk(
+            engine,
+            customers=args.customers,
+            contracts=args.contracts,
+            events=args.events,
+            notes=args.notes,
+            actions=args.actions,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            defer_indexes=args.defer_indexes,
+        )
+    else:
+        main()
+
 
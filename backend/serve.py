@@ -0,0 +1,68 @@
+"""
+Production launcher.
+
+Runs the API in several uvicorn worker processes sharing one port:
+
+    python serve.py                          # WEB_CONCURRENCY workers (default: one per CPU)
+    python serve.py --workers 16 --port 8000
+    python serve.py --migrate                # schema step only, e.g. on deploy
+
+The launcher brings the schema up to date once before starting the workers
+(--no-preload leaves it to the first worker). Each worker then only
+compares the stored schema fingerprint when it starts, which keeps
+restarts of a crashed worker fast; uvicorn logs each worker's cold start.
+Workers share nothing else: each has its own connection pool, response
+cache (use CACHE_BACKEND=shared), event buffer and background jobs.
+"""
+import argparse
+import copy
+import time
+
+import uvicorn
+
+import config
+from models.database import init_db
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument("--workers", type=int, default=config.WEB_CONCURRENCY,
+                        help="Worker processes (default: WEB_CONCURRENCY)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Do not update the schema before starting the workers")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Check every table, column, index and migration, then exit without serving")
+    parser.add_argument("--log-level", default="info", help="Log level of uvicorn and the application")
+    return parser.parse_args(argv)
+
+
+def log_config(level: str) -> dict:
+    """uvicorn's logging setup, extended to the application's loggers"""
+    log_config = copy.deepcopy(uvicorn.config.LOGGING_CONFIG)
+    log_config["loggers"][""] = {"handlers": ["default"], "level": level.upper()}
+    return log_config
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.migrate or not args.no_preload:
+        started = time.perf_counter()
+        updated = init_db(force=args.migrate, progress=print)
+        print(f"Schema {'updated' if updated else 'up to date'} in {time.perf_counter() - started:.2f}s")
+    if args.migrate:
+        return
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        log_config=log_config(args.log_level),
+    )
+
+
+if __name__ == "__main__":
+    main()
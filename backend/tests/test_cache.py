@@ -0,0 +1,36 @@
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.cache import LRUResponseCache, LocalSharedClient, SharedResponseCache
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires_entries():
+    """Test that the in-process cache honours its size bound and TTL"""
+    cache = LRUResponseCache(max_entries=2, ttl=60)
+    cache.set("a", {"body": "a"})
+    cache.set("b", {"body": "b"})
+    assert cache.get("a") == {"body": "a"}
+    cache.set("c", {"body": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"body": "a"}
+
+    expiring = LRUResponseCache(max_entries=2, ttl=0)
+    expiring.set("a", {"body": "a"})
+    time.sleep(0.01)
+    assert expiring.get("a") is None
+
+
+def test_shared_cache_generations_invalidate_namespace():
+    """Test that invalidating a namespace moves readers to a new generation"""
+    cache = SharedResponseCache(LocalSharedClient(), ttl=60)
+    cache.set("contracts:0:/contracts/1?", {"body": "{}"})
+    assert cache.get("contracts:0:/contracts/1?") == {"body": "{}"}
+    assert cache.generation("contracts") == 0
+    cache.invalidate("contracts")
+    assert cache.generation("contracts") == 1
+    assert cache.generation("customers") == 0
@@ -0,0 +1,242 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import QueuePool
+
+from models.database import Base, create_db_engine, create_missing_columns, create_missing_indexes, init_db
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+
+def test_sqlite_engine_applies_tuning_pragmas(tmp_path):
+    """Test that new SQLite connections run in WAL mode with the tuned PRAGMAs"""
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    try:
+        assert isinstance(db_engine.pool, QueuePool)
+        assert not db_engine.pool._pre_ping  # local files do not go stale
+        with db_engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+            assert conn.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+    finally:
+        db_engine.dispose()
+
+
+def test_failed_statements_do_not_leave_timing_state_on_pooled_connections(tmp_path):
+    """Test that a statement error pops the start time pushed by the timing hook"""
+    import pytest
+    from sqlalchemy.exc import OperationalError
+
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'errors.db'}")
+    try:
+        with db_engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+            assert conn.info["query_started"] == []
+    finally:
+        db_engine.dispose()
+
+
+def test_create_missing_indexes_adds_indexes_to_existing_tables(tmp_path):
+    """Test that indexes added to models are created on an existing database"""
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'existing.db'}")
+    try:
+        Base.metadata.create_all(bind=db_engine)
+        with db_engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_events_customer_id_timestamp"))
+
+        create_missing_indexes(db_engine)
+
+        index_names = {index["name"] for index in inspect(db_engine).get_indexes("events")}
+        assert "ix_events_customer_id_timestamp" in index_names
+    finally:
+        db_engine.dispose()
+
+
+def test_create_missing_columns_compiles_server_defaults_through_the_dialect(tmp_path):
+    """Test that added columns get the DEFAULT clause create_all() would emit, not a quoted repr"""
+    from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, Table, func
+    from sqlalchemy.dialects import postgresql
+    from models.database import add_column_ddl
+
+    table = Table(
+        "defaults", MetaData(),
+        Column("seen_at", DateTime(timezone=True), server_default=func.now()),
+        Column("flagged", Boolean, server_default=text("false")),
+        Column("notes_count", Integer, nullable=False, server_default="0"),
+    )
+    assert [add_column_ddl(table, column, postgresql.dialect()) for column in table.columns] == [
+        "ALTER TABLE defaults ADD COLUMN seen_at TIMESTAMP WITH TIME ZONE DEFAULT now()",
+        "ALTER TABLE defaults ADD COLUMN flagged BOOLEAN DEFAULT false",
+        "ALTER TABLE defaults ADD COLUMN notes_count INTEGER DEFAULT '0' NOT NULL",
+    ]
+
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'columns.db'}")
+    try:
+        Base.metadata.create_all(bind=db_engine)
+        with db_engine.begin() as conn:
+            conn.execute(text("ALTER TABLE customers DROP COLUMN recent_events_count"))
+            conn.execute(text(
+                "INSERT INTO customers (name, email, phone, segment, risk_level, status, contracts_count, "
+                "open_approvals_count, events_count) VALUES ('A', 'a@example.com', '1', 'S', 'Low', 'Active', 0, 0, 0)"
+            ))
+
+        assert create_missing_columns(db_engine) == ["customers.recent_events_count"]
+        with db_engine.connect() as conn:
+            assert conn.scalar(text("SELECT recent_events_count FROM customers")) == 0
+    finally:
+        db_engine.dispose()
+
+
+def test_init_db_runs_once_per_schema_fingerprint(tmp_path):
+    """Test that init_db creates the schema once and later only compares the stored fingerprint"""
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    try:
+        assert init_db(db_engine) is True
+        assert (tmp_path / "startup.db.schema.lock").exists()
+        assert "customers" in inspect(db_engine).get_table_names()
+
+        with db_engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_events_customer_id_timestamp"))
+        assert init_db(db_engine) is False
+        assert init_db(db_engine, force=True) is True
+        index_names = {index["name"] for index in inspect(db_engine).get_indexes("events")}
+        assert "ix_events_customer_id_timestamp" in index_names
+    finally:
+        db_engine.dispose()
+
+
+def test_migrations_drop_the_redundant_contract_status_index(tmp_path):
+    """Test that an existing database loses ix_contracts_status, which the (status, expiration_date) index covers"""
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'indexed.db'}")
+    try:
+        Base.metadata.create_all(bind=db_engine)
+        with db_engine.begin() as conn:
+            conn.execute(text("CREATE INDEX ix_contracts_status ON contracts (status)"))
+
+        assert init_db(db_engine) is True
+
+        index_names = {index["name"] for index in inspect(db_engine).get_indexes("contracts")}
+        assert "ix_contracts_status" not in index_names
+        assert "ix_contracts_status_expiration_date" in index_names
+    finally:
+        db_engine.dispose()
+
+
+def test_event_id_migration_rebuilds_legacy_events_table(tmp_path):
+    """Test that a pre-AUTOINCREMENT events table is rebuilt and its sequence skips archived IDs"""
+    from datetime import datetime
+    from models.event_partition import ensure_event_id_sequence, partition_table
+
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    try:
+        archived = partition_table("events_2020_01")
+        archived.create(db_engine)
+        with db_engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE events (event_id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, "
+                "event_type VARCHAR(50) NOT NULL, timestamp DATETIME, channel VARCHAR(50) NOT NULL, "
+                "ip_address VARCHAR(45), user_agent VARCHAR(500), metadata_json JSON, correlation_id VARCHAR(100))"
+            ))
+            conn.execute(text("CREATE INDEX ix_events_customer_id_timestamp ON events (customer_id, timestamp)"))
+            conn.execute(text(
+                "INSERT INTO events (event_id, customer_id, event_type, channel, timestamp) "
+                "VALUES (1, 1, 'Login', 'Web', '2026-01-01 00:00:00')"
+            ))
+            conn.execute(archived.insert().values(
+                event_id=7, customer_id=1, event_type="Login", channel="Web", timestamp=datetime(2020, 1, 5)
+            ))
+            assert ensure_event_id_sequence(conn) == 1
+
+        with db_engine.begin() as conn:
+            assert "AUTOINCREMENT" in conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'events'"))
+            conn.execute(text("INSERT INTO events (customer_id, event_type, channel) VALUES (1, 'Login', 'Web')"))
+            assert conn.scalar(text("SELECT max(event_id) FROM events")) == 8
+        index_names = {index["name"] for index in inspect(db_engine).get_indexes("events")}
+        assert "ix_events_customer_id_timestamp" in index_names
+    finally:
+        db_engine.dispose()
+
+
+def test_seed_bulk_generates_linked_rows(tmp_path):
+    """Test that bulk seeding inserts the requested counts with valid references"""
+    from seed_data import seed_bulk
+
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'seeded.db'}")
+    try:
+        Base.metadata.create_all(bind=db_engine)
+        seed_bulk(db_engine, customers=20, contracts=50, events=500, notes=100, actions=40,
+                  batch_size=64, defer_indexes=True, progress=lambda message: None)
+        with db_engine.connect() as conn:
+            counts = {
+                table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                for table in ("customers", "contracts", "events", "notes", "actions")
+            }
+            orphan_events = conn.execute(text(
+                "SELECT COUNT(*) FROM events WHERE customer_id NOT IN (SELECT customer_id FROM customers)"
+            )).scalar()
+            mismatched_replies = conn.execute(text(
+                "SELECT COUNT(*) FROM notes n JOIN notes p ON n.parent_comment_id = p.note_id "
+                "WHERE n.contract_id != p.contract_id"
+            )).scalar()
+        assert counts == {"customers": 20, "contracts": 50, "events": 500, "notes": 100, "actions": 40}
+        assert orphan_events == 0
+        assert mismatched_replies == 0
+        index_names = {index["name"] for index in inspect(db_engine).get_indexes("events")}
+        assert "ix_events_customer_id_timestamp" in index_names
+    finally:
+        db_engine.dispose()
+
+
+def test_backfill_commits_batches_and_resumes_after_failure(tmp_path, monkeypatch):
+    """Test that an interrupted backfill keeps its committed batches and resumes after them"""
+    import pytest
+    from seed_data import seed_bulk
+    from models import Customer, migrations
+    from models.summary import rebuild_customer_counters
+
+    db_engine = create_db_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    try:
+        Base.metadata.create_all(bind=db_engine)
+        seed_bulk(db_engine, customers=20, contracts=50, events=100, notes=10, actions=10,
+                  batch_size=64, progress=lambda message: None)
+        with db_engine.begin() as conn:
+            expected = dict(conn.execute(text(
+                "SELECT customer_id, COUNT(*) FROM contracts GROUP BY customer_id"
+            )).all())
+            conn.execute(text("UPDATE customers SET contracts_count = 0"))
+
+        ranges = []
+
+        def apply(conn, key_range):
+            ranges.append(key_range)
+            if len(ranges) == 3:
+                raise RuntimeError("interrupted")
+            return rebuild_customer_counters(conn, key_range)
+
+        monkeypatch.setattr(migrations, "MIGRATIONS", [migrations.Migration("test", "Test backfill", [
+            migrations.Backfill("contract counts", Customer.customer_id, apply, batch_size=5)
+        ])])
+        messages = []
+        with pytest.raises(RuntimeError):
+            migrations.migrate(db_engine, messages.append)
+        step = migrations.migration_status(db_engine)[0]["steps"][0]
+        assert step["state"] == str(ranges[1][1])
+
+        assert migrations.migrate(db_engine, messages.append) == ["test"]
+        assert ranges[3][0] > ranges[1][1]
+        assert len(ranges) == 5
+        assert migrations.migration_status(db_engine)[0]["applied_at"] is not None
+        assert f"  contract counts: resuming after key {ranges[1][1]}" in messages
+        assert any(message.startswith("  contract counts: 10 rows in") for message in messages)
+        with db_engine.connect() as conn:
+            counts = dict(conn.execute(text("SELECT customer_id, contracts_count FROM customers")).all())
+        assert {customer_id: count for customer_id, count in counts.items() if count} == expected
+    finally:
+        db_engine.dispose()
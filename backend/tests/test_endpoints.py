@@ -12,13 +12,28 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from main import app
-from models.database import Base, get_db
+from models.database import Base, get_db, schema_state
 from models.customer import Customer
 from models.contract import Contract
 from models.event import Event
 from models.note import Note  # Import to ensure table is created
 from models.action import Action  # Import to ensure table is created
-from datetime import datetime
+from models import event_partition
+from models.event_partition import list_partitions
+from models.summary import rebuild_summaries
+from models.contract_expiration import expire_contracts
+from models.event_rollup import rebuild_all_event_rollups
+from utils.jobs import JobRunner
+from routes.events import event_buffer
+from utils.cache import response_cache
+from utils.pagination import encode_cursor
+from utils.existence import existence_cache
+from utils.metrics import EXISTENCE_LOOKUPS
+from utils.metrics import instrument_engine
+from datetime import datetime, timedelta
+import json
+import asyncio
+import threading
 
 
 # Create test database
@@ -28,6 +43,7 @@ engine = create_engine(
     connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
 
 
 @pytest.fixture(scope="function")
@@ -35,6 +51,7 @@ def db_session():
     """Create a fresh database for each test"""
     # Drop all tables and create new ones
     Base.metadata.drop_all(bind=engine)
+    schema_state.drop(bind=engine, checkfirst=True)
     Base.metadata.create_all(bind=engine)
     
     db = TestingSessionLocal()
@@ -47,14 +64,21 @@ def db_session():
 
 
 @pytest.fixture(scope="function")
-def override_get_db(db_session):
+def override_get_db(db_session, monkeypatch):
     """Override the get_db dependency"""
+    # Partition maintenance in tests has no other workers to wait for
+    monkeypatch.setattr(event_partition, "PARTITION_SETTLE_SECONDS", 0)
     def _get_db():
         try:
             yield db_session
         finally:
             pass
     app.dependency_overrides[get_db] = _get_db
+    # Each test starts from a fresh database, so drop responses cached by earlier tests
+    response_cache.clear()
+    existence_cache.clear()
+    # Read the (empty) partition list up front so it is not counted as a request query
+    list_partitions(engine, refresh=True)
     yield
     app.dependency_overrides.clear()
 
@@ -216,3 +240,1190 @@ async def test_get_events_returns_events_linked_to_existing_customers(
         assert event["customer_id"] in customer_ids, \
             f"Event {event.get('event_id')} has invalid customer_id {event['customer_id']}"
 
+
+
+@pytest.mark.asyncio
+async def test_get_events_cursor_pagination_walks_all_pages(
+    client, db_session, sample_customers
+):
+    """Test that cursor pagination returns every event exactly once, newest first"""
+    shared_timestamp = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(5):
+        db_session.add(Event(
+            customer_id=sample_customers[0].customer_id,
+            event_type="Login",
+            timestamp=shared_timestamp,
+            channel="Web"
+        ))
+    # Server-default timestamps are stored without microseconds
+    for i in range(3):
+        db_session.add(Event(
+            customer_id=sample_customers[1].customer_id,
+            event_type="Logout",
+            channel="Mobile"
+        ))
+    db_session.commit()
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get("/events", params={"cursor": cursor, "limit": 3})
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+
+    event_ids = [event["event_id"] for event in seen]
+    assert len(event_ids) == 8
+    assert len(set(event_ids)) == 8
+    timestamps = [event["timestamp"] for event in seen]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    response = await client.get("/events", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    response = await client.get("/events", params={"cursor": encode_cursor("not-a-timestamp", 1)})
+    assert response.status_code == 400
+
+
+def test_keyset_cursor_values_are_compared_natively_off_sqlite():
+    """Test that cursor values bind as the sort column's type on PostgreSQL and as stored text on SQLite"""
+    from datetime import timezone
+    from sqlalchemy.dialects import postgresql, sqlite
+    from sqlalchemy.types import DateTime
+    from utils.pagination import keyset_filter
+
+    clause = keyset_filter(Event.event_id, encode_cursor("2024-05-01 10:00:00.500000+00:00", 7), Event.timestamp)
+    key_type = clause.clauses[0].left.type
+    pg = postgresql.psycopg2.dialect()
+    assert isinstance(key_type.load_dialect_impl(pg), DateTime)
+    assert key_type.process_bind_param("2024-05-01 10:00:00.500000+00:00", pg) == datetime(
+        2024, 5, 1, 10, 0, 0, 500000, tzinfo=timezone.utc
+    )
+    assert key_type.process_bind_param("2024-05-01 10:00:00", sqlite.dialect()) == "2024-05-01 10:00:00"
+    assert "CAST" not in str(clause.compile(dialect=pg))
+
+
+@pytest.mark.asyncio
+async def test_create_events_batch_reports_per_row_results(client, sample_customers):
+    """Test that /events/batch inserts valid rows and rejects invalid ones"""
+    customer_id = sample_customers[0].customer_id
+    rows = [
+        {"customer_id": customer_id, "event_type": "Login", "channel": "Web"},
+        {"customer_id": 999999, "event_type": "Login", "channel": "Web"},
+        {"customer_id": customer_id, "channel": "Mobile"},
+        {"customer_id": customer_id, "event_type": "Payment", "channel": "API",
+         "metadata_json": {"amount": 10}},
+    ]
+    response = await client.post("/events/batch", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 2
+    statuses = [result["status"] for result in data["results"]]
+    assert statuses == ["accepted", "rejected", "rejected", "accepted"]
+    assert data["results"][1]["error"] == "Customer not found"
+
+    event_id = data["results"][3]["event_id"]
+    event = (await client.get(f"/events/{event_id}")).json()
+    assert event["event_type"] == "Payment"
+    assert event["metadata_json"] == {"amount": 10}
+
+    ndjson = "\n".join(json.dumps(row) for row in rows[:1] * 3)
+    response = await client.post(
+        "/events/batch",
+        content=ndjson,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_export_events_streams_filtered_ndjson_and_csv(
+    client, sample_customers, sample_events
+):
+    """Test that /events/export streams the same rows the list filters select"""
+    customer_id = sample_customers[0].customer_id
+    response = await client.get("/events/export", params={"customer_id": customer_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["customer_id"] == customer_id
+    assert rows[0]["event_type"] == "Login"
+
+    response = await client.get("/events/export", params={"format": "csv"})
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("event_id,customer_id,event_type")
+    assert len(lines) == 3
+
+
+@pytest.mark.asyncio
+async def test_export_contracts_streams_csv(client, sample_contracts):
+    """Test that /contracts/export streams contracts as CSV"""
+    response = await client.get("/contracts/export", params={"format": "csv", "status": "Draft"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert len(lines) == 2
+    assert "License Agreement" in lines[1]
+
+
+@pytest_asyncio.fixture
+async def async_client(db_session):
+    """Create a test client for an app serving the async route variants"""
+    from fastapi import FastAPI
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from models.database import create_async_db_engine, get_async_db
+    from routes import async_router
+
+    async_engine = create_async_db_engine("sqlite+aiosqlite:///./test_customer_contracts.db")
+    session_factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def _get_async_db():
+        async with session_factory() as session:
+            yield session
+
+    async_app = FastAPI()
+    async_app.include_router(async_router)
+    async_app.dependency_overrides[get_async_db] = _get_async_db
+    transport = ASGITransport(app=async_app)
+    async_client = AsyncClient(transport=transport, base_url="http://test", follow_redirects=True)
+    try:
+        yield async_client
+    finally:
+        await async_client.aclose()
+        await async_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_routes_read_and_create_events(async_client, sample_customers, sample_events):
+    """Test that the async route variants serve the same data as the sync ones"""
+    response = await async_client.get("/customers")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    customer_id = sample_customers[0].customer_id
+    response = await async_client.post(
+        "/events", json={"customer_id": customer_id, "event_type": "Login", "channel": "Web"}
+    )
+    assert response.status_code == 201
+    event_id = response.json()["event_id"]
+
+    response = await async_client.get("/events", params={"customer_id": customer_id, "cursor": ""})
+    assert response.status_code == 200
+    assert event_id in [event["event_id"] for event in response.json()]
+
+    response = await async_client.get("/events/999999")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_async_list_routes_project_fields_like_the_sync_ones(
+    client, async_client, sample_contracts, sample_events
+):
+    """Test that async list routes accept ?fields= and return the same JSON as the sync routes"""
+    for path, params in [
+        ("/customers", {"fields": "customer_id,name"}),
+        ("/contracts", {"fields": "contract_id,status", "include_total": "exact"}),
+        ("/events", {"fields": "event_id,channel,timestamp"}),
+        ("/notes", {}),
+        ("/actions", {"fields": "action_id"}),
+    ]:
+        sync, async_ = await client.get(path, params=params), await async_client.get(path, params=params)
+        assert async_.status_code == 200
+        assert async_.json() == sync.json()
+        assert async_.headers.get("X-Total-Count") == sync.headers.get("X-Total-Count")
+
+    page = await async_client.get("/events", params={"cursor": "", "limit": 1, "fields": "event_id"})
+    assert list(page.json()[0]) == ["event_id"]
+    rest = await async_client.get("/events", params={"cursor": page.headers["X-Next-Cursor"], "fields": "event_id"})
+    assert len(rest.json()) == 1 and rest.json()[0] != page.json()[0]
+    assert (await async_client.get("/customers", params={"fields": "password"})).status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, params", [
+    ("/events", {}),
+    ("/events", {"customer_id": 1}),
+    ("/events", {"event_type": "Login"}),
+    ("/events", {"start_date": "2024-01-01T00:00:00", "end_date": "2030-01-01T00:00:00"}),
+    ("/events", {"customer_id": 1, "cursor": ""}),
+    ("/contracts", {"customer_id": 1, "status": "Approved"}),
+    ("/notes", {}),
+    ("/notes", {"contract_id": 1}),
+    ("/actions", {}),
+    ("/actions", {"contract_id": 1}),
+])
+async def test_list_queries_use_indexes(client, db_session, sample_contracts, path, params):
+    """Test that list queries are served by an index rather than a scan and sort"""
+    from sqlalchemy import event as sa_event, text
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    sa_event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get(path, params=params)
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    assert statements
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = [
+                row[3] for row in
+                conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            ]
+            for step in plan:
+                assert "TEMP B-TREE" not in step, f"{statement} sorts without an index: {plan}"
+                if params and step.startswith("SCAN"):
+                    assert "INDEX" in step, f"{statement} scans the table: {plan}"
+
+
+@pytest.mark.asyncio
+async def test_contract_status_filter_seeks_the_status_expiration_index(client, db_session, sample_contracts):
+    """Test that a status-only contract list seeks (status, expiration_date) rather than scanning"""
+    from sqlalchemy import event as sa_event
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sa_event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get("/contracts", params={"status": "Approved"})
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", capture)
+    assert [c["contract_id"] for c in response.json()] == [sample_contracts[0].contract_id]
+
+    with engine.connect() as conn:
+        plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statements[0][0]}", statements[0][1])]
+    # ix_contracts_status was dropped as a prefix of this index; matching rows are sorted by ID
+    assert plan[0] == "SEARCH contracts USING INDEX ix_contracts_status_expiration_date (status=?)"
+
+
+@pytest.mark.asyncio
+async def test_customer_overview_uses_fixed_number_of_queries(
+    client, db_session, sample_customers, sample_contracts, sample_events
+):
+    """Test that /customers/{id}/overview does not fan out per contract"""
+    from sqlalchemy import event as sa_event
+
+    customer = sample_customers[0]
+    for i in range(4):
+        contract = Contract(
+            customer_id=customer.customer_id,
+            type="NDA",
+            status="Draft",
+            effective_date=datetime.now(),
+            created_by="test_user",
+            updated_by="test_user"
+        )
+        db_session.add(contract)
+        db_session.flush()
+        for j in range(3):
+            db_session.add(Note(contract_id=contract.contract_id, body=f"note {j}", created_by="test_user"))
+        db_session.add(Action(contract_id=contract.contract_id, action_type="flag", acted_by="test_user"))
+    db_session.commit()
+    customer_id = customer.customer_id
+    db_session.expire_all()
+
+    selects = []
+
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    sa_event.listen(engine, "before_cursor_execute", count_selects)
+    try:
+        response = await client.get(
+            f"/customers/{customer_id}/overview", params={"notes_limit": 2}
+        )
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", count_selects)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["customer_id"] == customer_id
+    assert len(data["contracts"]) == 5
+    assert all(len(contract["latest_notes"]) <= 2 for contract in data["contracts"])
+    # Notes created in the same instant are ordered by ID, newest first
+    latest = data["contracts"][-1]["latest_notes"]
+    assert [note["body"] for note in latest] == ["note 2", "note 1"]
+    assert sum("row_number() OVER" in statement for statement in selects) == 2
+    assert sum(len(contract["latest_actions"]) for contract in data["contracts"]) == 4
+    assert len(data["recent_events"]) == 1
+    assert len(selects) == 5
+
+    response = await client.get("/customers/999999/overview")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_contract_reads_are_cached_and_invalidated_by_actions(
+    client, db_session, sample_contracts
+):
+    """Test that contract reads are served from cache, revalidate via ETag and see writes"""
+    contract_id = sample_contracts[1].contract_id
+    first = await client.get(f"/contracts/{contract_id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    # A write that bypasses the API is not visible until the cache is invalidated
+    db_session.query(Contract).filter(Contract.contract_id == contract_id).update(
+        {"terms_ref": "changed-directly"}
+    )
+    db_session.commit()
+    cached = await client.get(f"/contracts/{contract_id}")
+    assert cached.json() == first.json()
+
+    not_modified = await client.get(f"/contracts/{contract_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    response = await client.post("/actions", json={
+        "contract_id": contract_id, "action_type": "approve", "acted_by": "approver"
+    })
+    assert response.status_code == 201
+
+    updated = await client.get(f"/contracts/{contract_id}", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["status"] == "Approved"
+    assert updated.json()["terms_ref"] == "changed-directly"
+    assert updated.headers["ETag"] != etag
+
+    listed = await client.get("/contracts", params={"status": "Approved"})
+    assert contract_id in [contract["contract_id"] for contract in listed.json()]
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoints_aggregate_in_sql(client, db_session, sample_contracts, sample_events):
+    """Test that /stats endpoints return grouped counts as compact rows"""
+    from datetime import timedelta
+
+    sample_contracts[1].expiration_date = datetime.now() + timedelta(days=5)
+    db_session.commit()
+
+    response = await client.get("/stats/contracts", params={"group_by": "status"})
+    assert response.status_code == 200
+    assert response.json() == {"columns": ["status", "count"], "rows": [["Approved", 1], ["Draft", 1]]}
+
+    response = await client.get("/stats/contracts/expiring", params={"days": 10})
+    rows = response.json()["rows"]
+    assert len(rows) == 1
+    assert rows[0][1:] == ["Draft", 1]
+
+    response = await client.get("/stats/events", params={"group_by": "channel", "bucket": "hour"})
+    data = response.json()
+    assert data["columns"] == ["hour", "channel", "count"]
+    assert sorted(row[1] for row in data["rows"]) == ["API", "Web"]
+    assert sum(row[2] for row in data["rows"]) == 2
+
+    # Months moved to a partition are still counted
+    from models.event_partition import archive_events, month_start, months_before, partition_name, partition_table
+    old_month = months_before(month_start(datetime.now()), 4)
+    db_session.add(Event(customer_id=sample_events[0].customer_id, event_type="Login",
+                         timestamp=old_month + timedelta(hours=5), channel="Web"))
+    db_session.commit()
+    try:
+        assert archive_events(engine, hot_months=2) == {partition_name(old_month): 1}
+        response = await client.get("/stats/events", params={
+            "start_date": old_month.isoformat(), "end_date": (old_month + timedelta(days=1)).isoformat()
+        })
+        assert response.json()["rows"] == [[old_month.strftime("%Y-%m-%d"), "Login", 1]]
+        overview = await client.get(f"/customers/{sample_events[0].customer_id}/overview")
+        assert overview.json()["recent_events"][-1]["timestamp"].startswith(old_month.strftime("%Y-%m-%d"))
+    finally:
+        partition_table(partition_name(old_month)).drop(bind=engine, checkfirst=True)
+        list_partitions(engine, refresh=True)
+
+    await client.post("/actions", json={
+        "contract_id": sample_contracts[1].contract_id, "action_type": "approve", "acted_by": "approver"
+    })
+    response = await client.get("/stats/actions")
+    assert response.json()["rows"] == [["approver", 1]]
+
+
+@pytest.mark.asyncio
+async def test_requests_report_server_timing_metrics_and_slow_queries(
+    client, sample_events, monkeypatch, caplog
+):
+    """Test that DB work is reported per request, aggregated at /metrics and slow queries logged"""
+    import logging
+    import config
+
+    response = await client.get("/events", params={"event_type": "Login"})
+    assert response.status_code == 200
+    server_timing = response.headers["Server-Timing"]
+    assert server_timing.startswith("db;dur=")
+    assert '"1 queries"' in server_timing
+
+    monkeypatch.setattr(config, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="utils.metrics"):
+        await client.get("/events", params={"customer_id": sample_events[0].customer_id})
+    slow = [record.getMessage() for record in caplog.records if "Slow query" in record.getMessage()]
+    assert slow
+    assert "Plan:" in slow[0] and "ix_events_customer_id_timestamp" in slow[0]
+
+    metrics = await client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'http_request_db_queries_bucket{method="GET",route="/events/",le="1"}' in metrics.text
+    assert "# TYPE http_request_duration_seconds histogram" in metrics.text
+    assert "db_slow_queries_total" in metrics.text
+
+
+@pytest.mark.asyncio
+async def test_events_are_read_across_partitions_with_pruning_and_retention(
+    client, db_session, sample_customers, tmp_path
+):
+    """Test that archived months stay readable, are pruned by date and expire into archives"""
+    import gzip
+    from datetime import timedelta
+    from sqlalchemy import event as sa_event
+    from models.event_partition import (
+        archive_events, enforce_retention, month_start, months_before, partition_name, partition_table
+    )
+
+    now = datetime.now()
+    this_month = month_start(now)
+    customer_id = sample_customers[0].customer_id
+    timestamps = [now, months_before(this_month, 3) + timedelta(days=2), months_before(this_month, 14)]
+    events = [Event(customer_id=customer_id, event_type="Login", timestamp=ts, channel="Web") for ts in timestamps]
+    db_session.add_all(events)
+    db_session.commit()
+    event_ids = [event.event_id for event in events]
+    partitions = [partition_name(months_before(this_month, 3)), partition_name(months_before(this_month, 14))]
+
+    try:
+        moved = archive_events(engine, hot_months=2)
+        assert moved == {partitions[0]: 1, partitions[1]: 1}
+        assert db_session.query(Event).count() == 1
+
+        response = await client.get("/events", params={"customer_id": customer_id})
+        assert [e["event_id"] for e in response.json()] == event_ids
+
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = await client.get("/events", params={"limit": 1, "cursor": cursor})
+            seen.extend(e["event_id"] for e in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+        assert seen == event_ids
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        sa_event.listen(engine, "before_cursor_execute", capture)
+        try:
+            response = await client.get("/events", params={
+                "start_date": (timestamps[1] - timedelta(days=1)).isoformat(),
+                "end_date": (timestamps[1] + timedelta(days=1)).isoformat(),
+            })
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", capture)
+        assert [e["event_id"] for e in response.json()] == [event_ids[1]]
+        assert partitions[0] in statements[0] and partitions[1] not in statements[0]
+
+        response = await client.get(f"/events/{event_ids[2]}")
+        assert response.status_code == 200
+        assert response.json()["customer_id"] == customer_id
+
+        export = await client.get("/events/export", params={"format": "ndjson"})
+        assert [json.loads(line)["event_id"] for line in export.text.splitlines()] == event_ids
+
+        assert enforce_retention(engine, 12, str(tmp_path)) == [partitions[1]]
+        with gzip.open(tmp_path / f"{partitions[1]}.ndjson.gz", "rt") as archive:
+            assert [json.loads(line)["event_id"] for line in archive] == [event_ids[2]]
+        assert (await client.get(f"/events/{event_ids[2]}")).status_code == 404
+
+        assert (await client.delete(f"/events/{event_ids[1]}")).status_code == 204
+        assert (await client.get(f"/events/{event_ids[1]}")).status_code == 404
+    finally:
+        for name in partitions:
+            partition_table(name).drop(bind=engine, checkfirst=True)
+        list_partitions(engine, refresh=True)
+
+
+@pytest.mark.asyncio
+async def test_event_ids_moved_to_partitions_are_not_reused(client, db_session, sample_customers):
+    """Test that events created after archiving the newest IDs get new IDs and lookups stay exact"""
+    from models.event_partition import archive_events, month_start, months_before, partition_name, partition_table
+
+    old_month = months_before(month_start(datetime.now()), 5)
+    customer_id, other_id = sample_customers[0].customer_id, sample_customers[1].customer_id
+    archived = Event(customer_id=customer_id, event_type="Login", timestamp=old_month, channel="Web")
+    db_session.add(archived)
+    db_session.commit()
+    archived_id = archived.event_id
+    try:
+        assert archive_events(engine, hot_months=2) == {partition_name(old_month): 1}
+        created = await client.post("/events", json={"customer_id": other_id, "event_type": "Login", "channel": "Web"})
+        assert created.json()["event_id"] > archived_id
+
+        response = await client.get(f"/events/{archived_id}")
+        assert (response.status_code, response.json()["customer_id"]) == (200, customer_id)
+        assert (await client.get(f"/events/{created.json()['event_id']}")).json()["customer_id"] == other_id
+    finally:
+        partition_table(partition_name(old_month)).drop(bind=engine, checkfirst=True)
+        list_partitions(engine, refresh=True)
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_customer_deletes_their_archived_events(client, db_session, sample_customers):
+    """Test that a deleted customer's events are removed from the partitions as well as the hot table"""
+    from models.event_partition import archive_events, month_start, months_before, partition_name, partition_table
+
+    old_month = months_before(month_start(datetime.now()), 5)
+    customer_id, other_id = sample_customers[0].customer_id, sample_customers[1].customer_id
+    events = [
+        Event(customer_id=owner, event_type="Login", timestamp=old_month + timedelta(days=1), channel="Web")
+        for owner in (customer_id, other_id)
+    ]
+    db_session.add_all(events)
+    db_session.commit()
+    deleted_id, kept_id = (event.event_id for event in events)
+    try:
+        assert archive_events(engine, hot_months=2) == {partition_name(old_month): 2}
+        assert (await client.delete(f"/customers/{customer_id}")).status_code == 204
+
+        assert (await client.get(f"/events/{deleted_id}")).status_code == 404
+        assert [e["event_id"] for e in (await client.get("/events")).json()] == [kept_id]
+        export = await client.get("/events/export", params={"format": "ndjson"})
+        assert [json.loads(line)["event_id"] for line in export.text.splitlines()] == [kept_id]
+        stats = await client.get("/stats/events", params={"start_date": old_month.isoformat()})
+        assert sum(row[-1] for row in stats.json()["rows"]) == 1
+    finally:
+        partition_table(partition_name(old_month)).drop(bind=engine, checkfirst=True)
+        list_partitions(engine, refresh=True)
+
+
+@pytest.mark.asyncio
+async def test_partition_changes_by_another_process_reach_cached_partition_lists(
+    client, db_session, sample_customers, monkeypatch
+):
+    """Test that workers pick up partitions created or retired elsewhere from the stored state"""
+    from sqlalchemy import delete, insert, select
+    from models.database import write_state
+    from models.event_partition import PARTITION_STATE_KEY, month_start, months_before, partition_name, partition_table
+
+    monkeypatch.setattr(event_partition, "PARTITION_CHECK_INTERVAL", 0)
+    schema_state.create(bind=engine)
+    old_month = months_before(month_start(datetime.now()), 5)
+    event = Event(customer_id=sample_customers[0].customer_id, event_type="Login", timestamp=old_month, channel="Web")
+    db_session.add(event)
+    db_session.commit()
+    event_id = event.event_id
+    assert list_partitions(engine, refresh=True) == []
+
+    # What archive_events does in the maintenance process, which this worker's cache does not see
+    name = partition_name(old_month)
+    table = partition_table(name)
+    try:
+        table.create(bind=engine)
+        with engine.begin() as conn:
+            write_state(conn, PARTITION_STATE_KEY, json.dumps({"generation": 1, "retiring": []}))
+            conn.execute(insert(table).from_select([c.name for c in Event.__table__.columns], select(Event.__table__)))
+            conn.execute(delete(Event.__table__))
+        assert (await client.get(f"/events/{event_id}")).status_code == 200
+
+        # Retired partitions are no longer read, so they can be dropped under running workers
+        with engine.begin() as conn:
+            write_state(conn, PARTITION_STATE_KEY, json.dumps({"generation": 2, "retiring": [name]}))
+        assert (await client.get(f"/events/{event_id}")).status_code == 404
+        table.drop(bind=engine)
+        assert (await client.get("/events")).status_code == 200
+    finally:
+        table.drop(bind=engine, checkfirst=True)
+        list_partitions(engine, refresh=True)
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefix_matches_and_follows_writes(client, db_session):
+    """Test that /search finds rows by word prefix and stays in sync with writes"""
+    customer = (await client.post("/customers", json={
+        "name": "Globex Logistics", "email": "ops@globex.example", "phone": "555",
+        "segment": "Enterprise", "risk_level": "Low",
+    })).json()
+    contract = (await client.post("/contracts", json={
+        "customer_id": customer["customer_id"], "type": "Logistics Agreement", "status": "Draft",
+        "effective_date": "2024-01-01T00:00:00", "terms_ref": "terms/globex-2024.pdf",
+        "created_by": "tester", "updated_by": "tester",
+    })).json()
+    note = (await client.post("/notes", json={
+        "contract_id": contract["contract_id"], "body": "Renewal pricing pending from logistics team",
+        "created_by": "tester",
+    })).json()
+    action = (await client.post("/actions", json={
+        "contract_id": contract["contract_id"], "action_type": "flag",
+        "action_note": "Escalated renewal terms", "acted_by": "tester",
+    })).json()
+
+    response = await client.get("/search", params={"q": "logis"})
+    assert response.status_code == 200
+    hits = [(hit["type"], hit["id"]) for hit in response.json()]
+    assert set(hits) == {
+        ("customer", customer["customer_id"]), ("contract", contract["contract_id"]), ("note", note["note_id"])
+    }
+    # A title match outranks a body match
+    assert hits[-1] == ("note", note["note_id"])
+    assert "<mark>Logistics</mark>" in response.json()[0]["title"]
+
+    response = await client.get("/search", params={"q": "renewal", "type": "action"})
+    assert [(hit["type"], hit["id"]) for hit in response.json()] == [("action", action["action_id"])]
+
+    await client.put(f"/notes/{note['note_id']}", json={"body": "Pricing agreed"})
+    response = await client.get("/search", params={"q": "renewal pric"})
+    assert response.json() == []
+    response = await client.get("/search", params={"q": "pricing agreed"})
+    assert [hit["id"] for hit in response.json()] == [note["note_id"]]
+
+    await client.delete(f"/contracts/{contract['contract_id']}")
+    response = await client.get("/search", params={"q": "logistics renewal pricing escalated"})
+    assert response.json() == []
+    response = await client.get("/search", params={"q": "globex"})
+    assert [(hit["type"], hit["id"]) for hit in response.json()] == [("customer", customer["customer_id"])]
+
+    assert (await client.get("/search", params={"q": "\"*"})).status_code == 400
+    assert (await client.get("/search", params={"q": "x", "type": "event"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_highlights_escape_stored_markup(client, sample_contracts):
+    """Test that markup in indexed text comes back escaped, with only the match tags as HTML"""
+    await client.post("/notes", json={
+        "contract_id": sample_contracts[0].contract_id, "created_by": "tester",
+        "body": "Quarterly <img src=x onerror=alert(1)> review & sign-off",
+    })
+    response = await client.get("/search", params={"q": "quarterly"})
+    assert response.json()[0]["snippet"] == (
+        "<mark>Quarterly</mark> &lt;img src=x onerror=alert(1)&gt; review &amp; sign-off"
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_actions_update_contracts_in_one_transaction(client, db_session, sample_contracts):
+    """Test that /actions/bulk applies one action to many contracts and reports each one"""
+    ids = [contract.contract_id for contract in sample_contracts]
+    response = await client.post("/actions/bulk", json={
+        "contract_ids": [ids[0], 999999, ids[1], ids[0]],
+        "action_type": "approve",
+        "action_note": "Month-end approval",
+        "acted_by": "manager",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["applied"], body["rejected"]) == (2, 2)
+    assert [(r["contract_id"], r["status"], r["error"]) for r in body["results"]] == [
+        (ids[0], "applied", None),
+        (999999, "rejected", "Contract not found"),
+        (ids[1], "applied", None),
+        (ids[0], "rejected", "Duplicate contract ID"),
+    ]
+    assert body["results"][2]["prior_status"] == "Draft"
+
+    for contract_id in ids:
+        contract = (await client.get(f"/contracts/{contract_id}")).json()
+        assert contract["status"] == "Approved"
+        assert contract["last_action_at"] is not None
+        assert contract["updated_by"] == "manager"
+
+    actions = (await client.get("/actions", params={"contract_id": ids[1]})).json()
+    assert [(a["action_id"], a["prior_status"], a["new_status"]) for a in actions] == [
+        (body["results"][2]["action_id"], "Draft", "Approved")
+    ]
+    hits = (await client.get("/search", params={"q": "month-end", "type": "action"})).json()
+    assert len(hits) == 2
+
+    response = await client.post("/actions/bulk", json={
+        "contract_ids": ids, "action_type": "flag", "acted_by": "manager"
+    })
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_bulk_actions_use_the_same_utc_clock_as_single_actions(client, sample_contracts, monkeypatch):
+    """Test that bulk and single actions get UTC timestamps on a host whose local zone is not UTC"""
+    import time
+    ids = [contract.contract_id for contract in sample_contracts]
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        single = (await client.post("/actions", json={
+            "contract_id": ids[0], "action_type": "flag", "acted_by": "u"
+        })).json()
+        bulk = (await client.post("/actions/bulk", json={
+            "contract_ids": [ids[1]], "action_type": "approve", "acted_by": "u"
+        })).json()
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    bulk_action = (await client.get("/actions", params={"contract_id": ids[1]})).json()[0]
+    assert bulk_action["action_id"] == bulk["results"][0]["action_id"]
+    gap = datetime.fromisoformat(bulk_action["acted_at"]) - datetime.fromisoformat(single["acted_at"])
+    assert timedelta(seconds=-2) < gap < timedelta(minutes=1)
+    contract = (await client.get(f"/contracts/{ids[1]}")).json()
+    assert contract["last_action_at"] == bulk_action["acted_at"]
+
+
+@pytest.mark.asyncio
+async def test_list_fast_path_matches_schema_and_projects_fields(client, sample_contracts, sample_events):
+    """Test that Core-row list responses match the detail schema and honour ?fields="""
+    events = (await client.get("/events")).json()
+    detail = (await client.get(f"/events/{events[0]['event_id']}")).json()
+    assert events[0] == detail
+
+    contracts = (await client.get("/contracts")).json()
+    assert contracts[0] == (await client.get(f"/contracts/{contracts[0]['contract_id']}")).json()
+
+    response = await client.get("/events", params={"fields": "event_id,timestamp", "limit": 1, "cursor": ""})
+    assert response.status_code == 200
+    assert list(response.json()[0]) == ["event_id", "timestamp"]
+    assert "X-Next-Cursor" in response.headers
+
+    response = await client.get("/contracts", params={"fields": "status, contract_id"})
+    assert [list(contract) for contract in response.json()] == [["status", "contract_id"]] * 2
+
+    response = await client.get("/notes", params={"fields": "body,password"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: password"
+
+
+@pytest.mark.asyncio
+async def test_summary_counters_follow_writes_and_rebuild(client, db_session, sample_customers):
+    """Test that customer and contract counters are maintained by writes and by the rebuild"""
+    customer_id = sample_customers[0].customer_id
+    contract_ids = []
+    for status in ("Pending Approval", "Draft"):
+        response = await client.post("/contracts", json={
+            "customer_id": customer_id, "type": "Lease", "status": status,
+            "effective_date": datetime.now().isoformat(), "created_by": "u", "updated_by": "u",
+        })
+        contract_ids.append(response.json()["contract_id"])
+    await client.post("/notes", json={"contract_id": contract_ids[0], "body": "Checked", "created_by": "u"})
+    await client.post("/actions", json={"contract_id": contract_ids[1], "action_type": "reopen", "acted_by": "u"})
+    await client.post("/actions/bulk", json={"contract_ids": contract_ids, "action_type": "approve", "acted_by": "u"})
+    await client.post("/events/batch", json=[
+        {"customer_id": customer_id, "event_type": "Login", "channel": "Web"},
+        {"customer_id": customer_id, "event_type": "Logout", "channel": "Web"},
+    ])
+    created = (await client.post("/events", json={
+        "customer_id": customer_id, "event_type": "Login", "channel": "API"
+    })).json()
+
+    def summary(customer):
+        return (customer["contracts_count"], customer["open_approvals_count"], customer["events_count"],
+                customer["recent_events_count"], customer["last_event_at"])
+
+    customers = (await client.get("/customers")).json()
+    assert summary(customers[0]) == (2, 0, 3, 3, created["timestamp"])
+    assert summary(customers[1]) == (0, 0, 0, 0, None)
+    contracts = (await client.get("/contracts", params={"fields": "contract_id,notes_count,actions_count"})).json()
+    assert [(c["notes_count"], c["actions_count"]) for c in contracts] == [(1, 1), (0, 2)]
+
+    await client.put(f"/contracts/{contract_ids[0]}", json={"status": "Pending Approval"})
+    await client.delete(f"/events/{created['event_id']}")
+    customer = (await client.get(f"/customers/{customer_id}")).json()
+    assert summary(customer)[:4] == (2, 1, 2, 2)
+    remaining = (await client.get("/events", params={"customer_id": customer_id})).json()
+    assert customer["last_event_at"] == remaining[0]["timestamp"]
+
+    # Drift (e.g. rows written outside the API) is repaired by the rebuild
+    expected = [summary(c) for c in (await client.get("/customers")).json()]
+    db_session.query(Customer).update({"contracts_count": 99, "events_count": 0, "last_event_at": None})
+    db_session.query(Contract).update({"notes_count": 7})
+    db_session.commit()
+    rebuild_summaries(db_session.get_bind())
+    db_session.expire_all()
+    response_cache.clear()
+    assert [summary(c) for c in (await client.get("/customers")).json()] == expected
+    contracts = (await client.get("/contracts")).json()
+    assert [c["notes_count"] for c in contracts] == [1, 0]
+
+    await client.delete(f"/contracts/{contract_ids[0]}")
+    customer = (await client.get(f"/customers/{customer_id}")).json()
+    assert summary(customer)[:2] == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_include_total_caches_counts_until_writes(client, db_session, sample_contracts, sample_events):
+    """Test that ?include_total= returns cached exact totals and cheap estimates"""
+    customer_id = sample_contracts[0].customer_id
+    response = await client.get("/contracts", params={"include_total": "exact", "limit": 1})
+    assert response.headers["X-Total-Count"] == "2"
+    assert "X-Total-Count-Estimated" not in response.headers
+
+    # The count is cached: rows written behind the API's back are not seen...
+    db_session.add(Contract(customer_id=customer_id, type="Lease", status="Draft",
+                            effective_date=datetime.now(), created_by="u", updated_by="u"))
+    db_session.commit()
+    response = await client.get("/contracts", params={"include_total": "exact", "cursor": ""})
+    assert response.headers["X-Total-Count"] == "2"
+    # ...until a write through the API invalidates it
+    await client.put(f"/contracts/{sample_contracts[1].contract_id}", json={"status": "Active"})
+    response = await client.get("/contracts", params={"include_total": "exact"})
+    assert response.headers["X-Total-Count"] == "3"
+
+    response = await client.get("/events", params={
+        "include_total": "exact", "customer_id": customer_id, "limit": 1
+    })
+    assert response.headers["X-Total-Count"] == "1"
+    await client.post("/events", json={"customer_id": customer_id, "event_type": "Login", "channel": "Web"})
+    response = await client.get("/events", params={"include_total": "exact", "event_type": "Login"})
+    assert response.headers["X-Total-Count"] == "2"
+
+    # Estimates come from summary counters and primary-key ranges
+    response = await client.get("/events", params={"include_total": "estimate", "customer_id": customer_id})
+    assert response.headers["X-Total-Count-Estimated"] == "true"
+    assert response.headers["X-Total-Count"] == "1"  # sample events bypassed the counters
+    response = await client.get("/events", params={"include_total": "estimate"})
+    assert response.headers["X-Total-Count"] == "3"
+    response = await client.get("/contracts", params={"include_total": "estimate", "status": "Active"})
+    assert response.headers["X-Total-Count"] == "1"
+
+    response = await client.get("/contracts", params={"include_total": "yes"})
+    assert response.status_code == 422
+
+
+def test_recent_events_window_is_utc_for_naive_and_aware_timestamps(db_session, sample_customers, monkeypatch):
+    """Test that recent_events_count uses a UTC window whatever the host zone and timestamp awareness"""
+    import time
+    from datetime import timezone
+    from models.summary import RECENT_EVENTS_DAYS, events_added, recent_events_since
+
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+        assert abs(recent_events_since() - (utc_now - timedelta(days=RECENT_EVENTS_DAYS))) < timedelta(seconds=5)
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+
+    now = datetime(2024, 6, 30, 12, 0)
+    edge = now - timedelta(days=RECENT_EVENTS_DAYS)
+    eastern = timezone(timedelta(hours=-5))
+    customer_id = sample_customers[0].customer_id
+    events_added(db_session, [
+        (customer_id, edge + timedelta(minutes=1)),
+        (customer_id, (edge - timedelta(minutes=1)).replace(tzinfo=timezone.utc)),
+        # 07:30 in UTC-5 is 12:30 UTC, inside the window
+        (customer_id, (edge + timedelta(minutes=30)).replace(tzinfo=timezone.utc).astimezone(eastern)),
+    ], now=now.replace(tzinfo=timezone.utc))
+    db_session.commit()
+    db_session.refresh(sample_customers[0])
+    assert (sample_customers[0].events_count, sample_customers[0].recent_events_count) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_expiration_job_expires_lapsed_contracts_in_batches(client, db_session, sample_customers):
+    """Test that the expiration job expires lapsed contracts once and records an action for each"""
+    now = datetime.now()
+    past, future = datetime(2020, 1, 1), datetime(2999, 1, 1)
+    contracts = [
+        Contract(customer_id=sample_customers[0].customer_id, type="Lease", status=status,
+                 effective_date=datetime(2019, 1, 1), expiration_date=expiration,
+                 created_by="u", updated_by="u")
+        for status, expiration in [
+            ("Approved", past), ("Active", past), ("Approved", past), ("Draft", past), ("Approved", future),
+        ]
+    ]
+    db_session.add_all(contracts)
+    db_session.commit()
+
+    runner = JobRunner()
+    runner.add("expire_contracts", lambda: expire_contracts(db_session.get_bind(), batch_size=2, now=now), 0)
+    assert await runner.run("expire_contracts") == 3
+    assert await runner.run("expire_contracts") == 0
+    status = runner.status()[0]
+    assert (status["runs"], status["failures"], status["last_rows_affected"]) == (2, 0, 0)
+    assert status["last_duration_seconds"] >= 0
+
+    listed = (await client.get("/contracts")).json()
+    assert [(c["status"], c["updated_by"], c["actions_count"]) for c in listed] == [
+        ("Expired", "system", 1), ("Expired", "system", 1), ("Expired", "system", 1),
+        ("Draft", "u", 0), ("Approved", "u", 0),
+    ]
+    actions = (await client.get("/actions", params={"action_type": "expire"})).json()
+    assert sorted((a["contract_id"], a["prior_status"], a["new_status"]) for a in actions) == [
+        (contracts[0].contract_id, "Approved", "Expired"),
+        (contracts[1].contract_id, "Active", "Expired"),
+        (contracts[2].contract_id, "Approved", "Expired"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_contract_expiration_uses_utc_on_non_utc_hosts(client, db_session, sample_customers, monkeypatch):
+    """Test that the expiration job and /stats/contracts/expiring compare expiration dates with UTC now"""
+    import time
+    from datetime import timezone
+    utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    lapsed, upcoming = (
+        Contract(customer_id=sample_customers[0].customer_id, type="Lease", status="Approved",
+                 effective_date=datetime(2019, 1, 1), expiration_date=utc_now + offset,
+                 created_by="u", updated_by="u")
+        for offset in (timedelta(hours=-1), timedelta(hours=1))
+    )
+    db_session.add_all([lapsed, upcoming])
+    db_session.commit()
+
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        rows = (await client.get("/stats/contracts/expiring", params={"days": 1})).json()["rows"]
+        assert sum(row[2] for row in rows) == 1
+        assert expire_contracts(db_session.get_bind()) == 1
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    db_session.expire_all()
+    assert (lapsed.status, upcoming.status) == ("Expired", "Approved")
+    action = (await client.get("/actions", params={"action_type": "expire"})).json()[0]
+    assert abs(datetime.fromisoformat(action["acted_at"]) - utc_now) < timedelta(minutes=1)
+
+
+@pytest.mark.asyncio
+async def test_contract_notes_tree_nests_replies_with_depth_and_paging(client, db_session, sample_contracts):
+    """Test that /contracts/{id}/notes/tree returns nested threads in one query"""
+    contract_id = sample_contracts[0].contract_id
+
+    async def note(body, parent=None):
+        response = await client.post("/notes", json={
+            "contract_id": contract_id, "body": body, "created_by": "u", "parent_comment_id": parent
+        })
+        return response.json()["note_id"]
+
+    first = await note("first")
+    reply = await note("reply", first)
+    await note("reply to reply", reply)
+    await note("second reply", first)
+    second = await note("second")
+    third = await note("third")
+
+    response = await client.get(f"/contracts/{contract_id}/notes/tree")
+    assert response.status_code == 200
+    queries = int(response.headers["Server-Timing"].split('desc="')[1].split(" ")[0])
+    assert queries == 1
+
+    def shape(nodes):
+        return [(n["body"], n["depth"], n["has_more_replies"], shape(n["replies"])) for n in nodes]
+
+    trees = response.json()
+    # Newest root first, replies oldest first
+    assert shape(trees) == [
+        ("third", 0, False, []),
+        ("second", 0, False, []),
+        ("first", 0, False, [
+            ("reply", 1, False, [("reply to reply", 2, False, [])]),
+            ("second reply", 1, False, []),
+        ]),
+    ]
+    assert trees[2]["replies"][0]["parent_comment_id"] == first
+
+    response = await client.get(f"/contracts/{contract_id}/notes/tree", params={"max_depth": 1, "skip": 2})
+    assert shape(response.json()) == [
+        ("first", 0, False, [("reply", 1, True, []), ("second reply", 1, False, [])])
+    ]
+
+    # Root pages walk every root exactly once
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get(f"/contracts/{contract_id}/notes/tree", params={"limit": 1, "cursor": cursor})
+        page = response.json()
+        assert len(page) == 1
+        seen.append(page[0]["note_id"])
+        cursor = response.headers.get("X-Next-Cursor")
+    assert seen == [third, second, first]
+
+    response = await client.get("/contracts/999999/notes/tree")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_event_buffer_queues_events_with_backpressure_and_flushes_on_stop(
+    client, db_session, sample_customers, monkeypatch
+):
+    """Test that buffered POST /events answers 202, refuses a full queue with 429 and writes on stop"""
+    writing, gate = threading.Event(), threading.Event()
+    write = event_buffer.write
+
+    def gated_write(db, rows):
+        writing.set()
+        gate.wait(5)
+        return write(db, rows)
+
+    monkeypatch.setattr(event_buffer, "write", gated_write)
+    monkeypatch.setattr(event_buffer, "max_rows", 1)
+    monkeypatch.setattr(event_buffer, "flush_interval", 0.01)
+    event_buffer.start(sessionmaker(bind=db_session.get_bind()))
+    try:
+        customer_id = sample_customers[0].customer_id
+        event = {"customer_id": customer_id, "event_type": "Login", "channel": "Mobile"}
+        first = await client.post("/events", json=event)
+        assert first.status_code == 202
+        assert first.json()["status"] == "queued"
+        # The writer takes the first event and waits at the gate, leaving room for one more
+        assert await asyncio.to_thread(writing.wait, 5)
+        second = await client.post("/events", json={**event, "correlation_id": "sdk-42"})
+        assert (second.status_code, second.json()["correlation_id"]) == (202, "sdk-42")
+        full = await client.post("/events", json=event)
+        assert full.status_code == 429
+        assert full.headers["Retry-After"] == "1"
+        assert (await client.post("/events", json={**event, "customer_id": 999999})).status_code == 404
+    finally:
+        gate.set()
+        event_buffer.stop()
+
+    assert not event_buffer.running
+    db_session.expire_all()
+    written = db_session.query(Event).order_by(Event.event_id).all()
+    assert [e.correlation_id for e in written] == [first.json()["correlation_id"], "sdk-42"]
+    assert db_session.get(Customer, customer_id).events_count == 2
+    # Without the buffer the endpoint writes synchronously again
+    assert (await client.post("/events", json=event)).status_code == 201
+
+
+def test_event_buffer_retries_locked_writes_and_drops_only_failing_events():
+    """Test that a locked database is retried and a failing batch is written event by event"""
+    import contextlib
+    from sqlalchemy.exc import OperationalError
+    from utils.event_buffer import EventBuffer
+
+    calls, stored = [], []
+
+    def write(db, rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        if any(row["bad"] for row in rows):
+            raise ValueError("unwritable event")
+        stored.extend(rows)
+        return len(rows)
+
+    # The writer waits up to flush_interval for the rest of the batch
+    buffer = EventBuffer(write, max_rows=10, batch_size=3, flush_interval=1, retry_delay=0)
+    buffer.start(contextlib.nullcontext)
+    for number in range(3):
+        assert buffer.enqueue({"number": number, "bad": number == 1})
+    buffer.stop()
+    # Locked, retried, failed as a batch, then written one event at a time
+    assert calls == [3, 3, 1, 1, 1]
+    assert [row["number"] for row in stored] == [0, 2]
+
+
+@pytest.mark.asyncio
+async def test_existence_cache_skips_parent_lookups_until_delete(client, sample_customers):
+    """Test that repeated writes for a parent reuse its cached existence until the parent is deleted"""
+    def queries(response):
+        return int(response.headers["Server-Timing"].split('desc="')[1].split(" ")[0])
+
+    customer_id = sample_customers[0].customer_id
+    event = {"customer_id": customer_id, "event_type": "Login", "channel": "Web"}
+    hits = EXISTENCE_LOOKUPS._series.get((("result", "hit"), ("table", "customers")), 0)
+    first = await client.post("/events", json=event)
+    second = await client.post("/events", json=event)
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert queries(second) == queries(first) - 1
+    assert EXISTENCE_LOOKUPS._series[(("result", "hit"), ("table", "customers"))] == hits + 1
+
+    # Contracts created through the API are remembered right away
+    contract = await client.post("/contracts", json={
+        "customer_id": customer_id, "type": "Service", "status": "Draft",
+        "effective_date": "2024-01-01T00:00:00", "created_by": "tester", "updated_by": "tester"
+    })
+    assert contract.status_code == 201
+    note = {"contract_id": contract.json()["contract_id"], "body": "first", "created_by": "tester"}
+    assert (await client.post("/notes", json=note)).status_code == 201
+
+    assert (await client.delete(f"/customers/{customer_id}")).status_code == 204
+    assert (await client.post("/events", json=event)).status_code == 404
+    assert (await client.post("/notes", json=note)).status_code == 404
+    assert 'existence_cache_lookups_total{result="hit",table="customers"}' in (await client.get("/metrics")).text
+
+
+@pytest.mark.asyncio
+async def test_existence_cache_expires_ids_deleted_by_other_workers(
+    client, db_session, sample_customers, monkeypatch
+):
+    """Test that without a shared cache, remembered IDs expire so another worker's delete is seen"""
+    monkeypatch.setattr(existence_cache, "ttl", 0.05)
+    customer_id = sample_customers[1].customer_id
+    event = {"customer_id": customer_id, "event_type": "Login", "channel": "Web"}
+    assert (await client.post("/events", json=event)).status_code == 201
+
+    # Deleted without forget(), as another worker's delete looks to this one
+    db_session.query(Event).filter(Event.customer_id == customer_id).delete()
+    db_session.query(Customer).filter(Customer.customer_id == customer_id).delete()
+    db_session.commit()
+    await asyncio.sleep(0.1)
+    assert (await client.post("/events", json=event)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_event_timeline_counts_buckets_from_rollups_kept_by_writes(
+    client, db_session, sample_customers, sample_events
+):
+    """Test that /events/timeline reads rollups that every write path keeps equal to a full recount"""
+    # Events inserted outside the API are picked up by the rebuild
+    assert rebuild_all_event_rollups(db_session.get_bind(), batch_size=1) == 2
+    customer_id = sample_customers[0].customer_id
+    created = await client.post("/events", json={"customer_id": customer_id, "event_type": "Login", "channel": "Web"})
+    batch = await client.post("/events/batch", json=[
+        {"customer_id": customer_id, "event_type": "Logout", "channel": "Mobile"}
+    ] * 2)
+    assert batch.json()["accepted"] == 2
+    assert (await client.delete(f"/events/{created.json()['event_id']}")).status_code == 204
+
+    now = datetime.now()
+    window = {"start_date": (now - timedelta(days=2)).isoformat(), "end_date": (now + timedelta(days=2)).isoformat()}
+    response = await client.get("/events/timeline", params={
+        **window, "customer_id": customer_id, "group_by": "event_type"
+    })
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].split('desc="')[1].startswith("1 queries")
+    assert sorted((row["event_type"], row["count"]) for row in response.json()) == [("Login", 1), ("Logout", 2)]
+
+    hourly = (await client.get("/events/timeline", params={**window, "granularity": "hour"})).json()
+    assert sum(row["count"] for row in hourly) == 4
+    assert all(row["bucket_start"].endswith(":00:00") for row in hourly)
+    rebuild_all_event_rollups(db_session.get_bind())
+    assert (await client.get("/events/timeline", params={**window, "granularity": "hour"})).json() == hourly
+
+    reversed_window = {"start_date": window["end_date"], "end_date": window["start_date"]}
+    assert (await client.get("/events/timeline", params=reversed_window)).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rollup_totals_are_summed_per_process_and_written_per_flush(
+    client, db_session, sample_customers, monkeypatch
+):
+    """Test that single-event ingest leaves the all-customer totals to the flusher, committed increments only"""
+    from sqlalchemy import func, select
+    from models.event_rollup import EventRollupTotal, rollup_totals, rollups_added
+
+    customer_id = sample_customers[0].customer_id
+    monkeypatch.setattr(rollup_totals, "flush_interval", 3600)
+    rollup_totals.start(engine)
+    try:
+        for channel in ("Web", "Web", "API"):
+            await client.post("/events", json={"customer_id": customer_id, "event_type": "Login", "channel": channel})
+        await client.post("/events/batch", json=[{"customer_id": customer_id, "event_type": "Logout", "channel": "Web"}])
+        rollups_added(db_session, [(customer_id, "Login", "Web", datetime.now())])
+        db_session.rollback()
+        assert db_session.scalar(select(func.count()).select_from(EventRollupTotal)) == 0
+    finally:
+        rollup_totals.stop()
+
+    now = datetime.now()
+    window = {"start_date": (now - timedelta(days=2)).isoformat(), "end_date": (now + timedelta(days=2)).isoformat()}
+    totals = (await client.get("/events/timeline", params={**window, "group_by": "channel"})).json()
+    assert sorted((row["channel"], row["count"]) for row in totals) == [("API", 1), ("Web", 3)]
+    rebuild_all_event_rollups(db_session.get_bind())
+    assert (await client.get("/events/timeline", params={**window, "group_by": "channel"})).json() == totals
@@ -0,0 +1,42 @@
+from utils.pagination import (
+    encode_cursor,
+    decode_cursor,
+    keyset_filter,
+    sort_key,
+    keyset_statement,
+    keyset_page,
+    keyset_paginate,
+)
+from utils.export import stream_export, EXPORT_FORMATS
+from utils.cache import response_cache, cached_response, cache_response, cache_body, invalidate_cache
+from utils.metrics import QueryMetricsMiddleware, instrument_engine, render_metrics
+from utils.serialization import FastJSONResponse, dumps, projected_columns, fetch_dicts, keyset_dicts
+from utils.counts import total_count, count_rows, id_span
+
+__all__ = [
+    "encode_cursor",
+    "decode_cursor",
+    "keyset_filter",
+    "sort_key",
+    "keyset_statement",
+    "keyset_page",
+    "keyset_paginate",
+    "stream_export",
+    "EXPORT_FORMATS",
+    "response_cache",
+    "cached_response",
+    "cache_response",
+    "cache_body",
+    "invalidate_cache",
+    "QueryMetricsMiddleware",
+    "instrument_engine",
+    "render_metrics",
+    "FastJSONResponse",
+    "dumps",
+    "projected_columns",
+    "fetch_dicts",
+    "keyset_dicts",
+    "total_count",
+    "count_rows",
+    "id_span",
+]
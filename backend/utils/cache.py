@@ -0,0 +1,230 @@
+"""
+Response cache for read endpoints with write-through invalidation.
+
+Cached entries hold the rendered JSON body, its ETag and any extra headers,
+keyed by namespace + path + query string. Each namespace ("customers",
+"contracts") has a generation number that is part of every key; write
+handlers call invalidate_cache() to bump the generation, so entries from
+before the write are never served again and age out of the cache on their
+own.
+
+Backends:
+- "memory": in-process LRU bounded by CACHE_MAX_ENTRIES with a TTL
+- "shared": Redis at CACHE_URL (requires the redis package), or a local
+  stand-in with the same interface when CACHE_URL is unset
+- "none": caching disabled; ETags are still sent
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import config
+
+
+class LRUResponseCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict, ttl: Optional[int] = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class LocalSharedClient:
+    """Stand-in for the subset of the Redis client used by SharedResponseCache"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            item = self._values.get(name)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._values[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            expires_at = time.monotonic() + ex if ex else None
+            self._values[name] = (value, expires_at)
+
+    def incr(self, name):
+        with self._lock:
+            value = int(self._values.get(name, (0, None))[0]) + 1
+            self._values[name] = (value, None)
+            return value
+
+    def flushdb(self):
+        with self._lock:
+            self._values.clear()
+
+
+class SharedResponseCache:
+    """Cache stored in Redis (or a stand-in), shared by every worker process"""
+
+    def __init__(self, client, ttl: int, prefix: str = "response-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, entry: dict, ttl: Optional[int] = None):
+        self.client.set(self.prefix + key, json.dumps(entry), ex=ttl or self.ttl)
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}generation:{namespace}") or 0)
+
+    def invalidate(self, namespace: str):
+        self.client.incr(f"{self.prefix}generation:{namespace}")
+
+    def clear(self):
+        self.client.flushdb()
+
+
+class NullResponseCache:
+    """Cache that stores nothing"""
+
+    def get(self, key: str) -> Optional[dict]:
+        return None
+
+    def set(self, key: str, entry: dict, ttl: Optional[int] = None):
+        pass
+
+    def generation(self, namespace: str) -> int:
+        return 0
+
+    def invalidate(self, namespace: str):
+        pass
+
+    def clear(self):
+        pass
+
+
+def create_response_cache(backend: str = config.CACHE_BACKEND):
+    """Build the cache backend selected by configuration"""
+    if backend == "none":
+        return NullResponseCache()
+    if backend == "shared":
+        if config.CACHE_URL:
+            import redis  # optional dependency, only needed for a real shared cache
+
+            client = redis.Redis.from_url(config.CACHE_URL)
+        else:
+            client = LocalSharedClient()
+        return SharedResponseCache(client, config.CACHE_TTL)
+    if backend == "memory":
+        return LRUResponseCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+response_cache = create_response_cache()
+
+
+def _cache_key(request: Request, namespace: str) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    generation = response_cache.generation(namespace)
+    return f"{namespace}:{generation}:{request.url.path}?{query}"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _build_response(request: Request, entry: dict) -> Response:
+    headers = {**entry["headers"], "ETag": entry["etag"]}
+    if _etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=entry["body"], media_type="application/json", headers=headers
+    )
+
+
+def cached_response(request: Request, namespace: str) -> Optional[Response]:
+    """Return the cached response for this request, or None on a miss"""
+    # Remember the key so a miss is stored under the generation that was
+    # current before the database was read, not one bumped by a write since
+    key = request.state.cache_key = _cache_key(request, namespace)
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    return _build_response(request, entry)
+
+
+def cache_response(request: Request, namespace: str, payload, headers: dict = None) -> Response:
+    """Render `payload` as JSON, cache it for this request and return it"""
+    # Same encoding as FastAPI's JSONResponse, so cached and uncached bodies match
+    body = json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    )
+    return cache_body(request, namespace, body, headers)
+
+
+def cache_body(request: Request, namespace: str, body, headers: dict = None) -> Response:
+    """Cache an already rendered JSON body (str or bytes) for this request and return it"""
+    if isinstance(body, bytes):
+        body = body.decode()
+    entry = {
+        "body": body,
+        "etag": '"' + hashlib.blake2b(body.encode(), digest_size=16).hexdigest() + '"',
+        "headers": dict(headers or {}),
+    }
+    key = getattr(request.state, "cache_key", None) or _cache_key(request, namespace)
+    response_cache.set(key, entry)
+    return _build_response(request, entry)
+
+
+def invalidate_cache(*namespaces: str):
+    """Drop every cached response in the given namespaces"""
+    for namespace in namespaces:
+        response_cache.invalidate(namespace)
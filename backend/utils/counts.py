@@ -0,0 +1,83 @@
+"""
+Total counts for paginated list endpoints (?include_total=).
+
+A COUNT over the filtered rows costs about as much as reading the page, so
+totals are cached in the response cache per filter combination:
+
+- exact: the key includes the namespace generation, so the first request
+  after a write recounts and every later page reuses the result
+- estimate: answered by a cheap estimator when the filters allow one
+  (a summary counter, or the primary-key span of an unfiltered table);
+  otherwise the last exact count for the filters is reused for
+  COUNT_ESTIMATE_TTL seconds, even across writes
+
+The total is returned in the X-Total-Count header; estimated totals also
+carry X-Total-Count-Estimated.
+"""
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+
+import config
+from utils.cache import response_cache
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+
+# Accepted ?include_total= values
+INCLUDE_TOTAL_PATTERN = "^(exact|estimate)$"
+
+
+def _filters_key(filters: dict) -> str:
+    return "&".join(f"{name}={value}" for name, value in sorted(filters.items()) if value is not None)
+
+
+def count_rows(db, statement) -> int:
+    """COUNT(*) over the rows of a filtered select (ordering and paging are ignored)"""
+    statement = statement.order_by(None).limit(None).offset(None)
+    return db.scalar(select(func.count()).select_from(statement.subquery()))
+
+
+def id_span(db, *id_columns) -> int:
+    """
+    Estimate the rows of one or more tables from their primary-key ranges.
+
+    Two index lookups per table; deleted rows are still counted, so this
+    overestimates tables with many deletes.
+    """
+    total = 0
+    for column in id_columns:
+        low, high = db.execute(select(func.min(column), func.max(column))).one()
+        if high is not None:
+            total += high - low + 1
+    return total
+
+
+def total_count(db, namespace: str, filters: dict, statement, mode: str,
+                estimate: Optional[Callable[[], Optional[int]]] = None) -> dict:
+    """
+    Total rows of a list endpoint for the given filters, as response headers.
+
+    `statement` is the filtered select without cursor or paging; `estimate`
+    returns a cheap estimate for these filters, or None when it has none.
+    """
+    key = _filters_key(filters)
+    if mode == "estimate":
+        total = estimate() if estimate else None
+        if total is None:
+            total = _cached_count(db, f"count-estimate:{namespace}:{key}", statement,
+                                  config.COUNT_ESTIMATE_TTL)
+        return {TOTAL_COUNT_HEADER: str(total), TOTAL_ESTIMATED_HEADER: "true"}
+
+    generation = response_cache.generation(namespace)
+    total = _cached_count(db, f"count:{namespace}:{generation}:{key}", statement)
+    return {TOTAL_COUNT_HEADER: str(total)}
+
+
+def _cached_count(db, cache_key: str, statement, ttl: Optional[int] = None) -> int:
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return entry["count"]
+    total = count_rows(db, statement)
+    response_cache.set(cache_key, {"count": total}, ttl)
+    return total
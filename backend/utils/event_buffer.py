@@ -0,0 +1,142 @@
+"""
+Write-behind buffer for single-event ingest.
+
+With the buffer running, POST /events/ validates an event, puts it on a
+bounded in-memory queue and answers 202 right away. A writer thread takes
+up to `batch_size` queued events, or whatever arrived within
+`flush_interval` seconds of the first one, and writes them in one
+transaction, so many requests share one commit (and one fsync).
+
+When the queue is full, enqueue() refuses the event and the route answers
+429. stop() lets the writer drain the queue before it returns, so events
+accepted before shutdown are written.
+
+A batch that fails with an OperationalError (such as SQLite's "database is
+locked" when several workers write) is retried with a doubling delay. If it
+still fails, or fails otherwise, its events are written one at a time and
+only those that fail on their own are dropped. Acknowledged events can
+therefore be lost on write errors (an event that cannot be written, or a
+database that stays unavailable through the retries), not only when the
+process dies with events still queued: clients that need durability should
+use the synchronous mode or the batch endpoint.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from sqlalchemy.exc import OperationalError
+
+from utils.metrics import EVENT_BUFFER_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    """Bounded queue of event rows flushed in batches by a writer thread"""
+
+    def __init__(self, write: Callable[..., int], max_rows: int, batch_size: int, flush_interval: float,
+                 retries: int = 3, retry_delay: float = 0.1):
+        """`write(db, rows)` inserts and commits a batch of event dicts and returns the rows written"""
+        self.write = write
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._session_factory = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopping.is_set()
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self, session_factory):
+        """Start the writer thread, opening a session from `session_factory` per batch"""
+        self._session_factory = session_factory
+        self._queue = queue.Queue(maxsize=self.max_rows)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="event-buffer-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop accepting events and return once every queued event has been written"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def enqueue(self, row: dict) -> bool:
+        """Queue an event row; False when the queue is full"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            EVENT_BUFFER_ROWS.inc(outcome="rejected")
+            return False
+        return True
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self) -> List[dict]:
+        """Wait for one event, then gather more until the batch is full or flush_interval has passed"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows: List[dict]) -> int:
+        """write() in a new session, retried on OperationalError with a doubling delay"""
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                with self._session_factory() as db:
+                    return self.write(db, rows)
+            except OperationalError as exc:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Retrying %d buffered events in %.2fs: %s", len(rows), delay, exc.orig)
+                time.sleep(delay)
+                delay *= 2
+
+    def _flush(self, batch: List[dict]):
+        try:
+            written = self._write(batch)
+        except Exception:
+            logger.exception("Writing %d buffered events one at a time: the batch could not be written", len(batch))
+            written = self._write_each(batch)
+        EVENT_BUFFER_ROWS.inc(written, outcome="written")
+        if written < len(batch):
+            EVENT_BUFFER_ROWS.inc(len(batch) - written, outcome="dropped")
+
+    def _write_each(self, batch: List[dict]) -> int:
+        """Write events one per transaction, dropping those that fail; returns the number written"""
+        written = 0
+        for position, row in enumerate(batch):
+            try:
+                written += self._write([row])
+            except OperationalError:
+                # The database, not the event, is failing: the rest would wait out the same retries
+                logger.exception("Dropped %d buffered events: the database is unavailable", len(batch) - position)
+                break
+            except Exception:
+                logger.exception("Dropped buffered event %s: it could not be written", row.get("correlation_id"))
+        return written
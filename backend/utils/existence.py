@@ -0,0 +1,147 @@
+"""
+Existence cache for the parent rows checked by write handlers.
+
+Creating a contract, event or note first checks that its customer or
+contract exists. The cache remembers IDs known to exist (found by a lookup
+or just created) in an LRU set per table bounded by EXISTENCE_CACHE_SIZE,
+so repeated writes for the same parent skip the query; a miss falls back
+to an EXISTS query on the primary key.
+
+Deletes call forget(), which bumps the table's "ids:<table>" generation in
+the response cache and so drops the table's remembered IDs; lookups compare
+the generation their entries were filled under. Only the shared backend
+with Redis at CACHE_URL carries that generation to other worker processes.
+With the "memory" and "none" backends, and the shared stand-in, only the
+worker that served the delete forgets, so there remembered IDs also expire
+CACHE_TTL seconds after they were confirmed: a parent deleted through
+another worker is treated as existing for at most that long. The
+generation has its own namespace because the "customers"/"contracts" ones
+are bumped by every create and update, which do not remove rows.
+
+Lookups are counted in existence_cache_lookups_total by table and result.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import exists, select
+
+import config
+from utils.cache import response_cache
+from utils.metrics import EXISTENCE_LOOKUPS
+
+
+class _KnownIds:
+    """IDs of one table known to exist as of one generation, each with its expiry time"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.ids = OrderedDict()
+
+
+class ExistenceCache:
+    """Per-table LRU sets of row IDs known to exist, optionally expiring after `ttl` seconds"""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def generation(self, id_column) -> int:
+        return response_cache.generation(f"ids:{id_column.table.name}")
+
+    def contains(self, id_column, row_id) -> bool:
+        """Whether row_id is remembered as existing (recorded as a hit or a miss)"""
+        table = id_column.table.name
+        generation = self.generation(id_column)
+        with self._lock:
+            known = self._tables.get(table)
+            found = known is not None and known.generation == generation and row_id in known.ids
+            if found and known.ids[row_id] is not None and known.ids[row_id] <= time.monotonic():
+                del known.ids[row_id]
+                found = False
+            if found:
+                known.ids.move_to_end(row_id)
+        EXISTENCE_LOOKUPS.inc(table=table, result="hit" if found else "miss")
+        return found
+
+    def add(self, id_column, row_ids: Iterable, generation: Optional[int] = None):
+        """
+        Remember rows that exist.
+
+        Pass the generation read before the rows were looked up: when a
+        delete has bumped it since, the IDs are not remembered.
+        """
+        if self.max_entries <= 0:
+            return
+        table = id_column.table.name
+        current = self.generation(id_column)
+        if generation is not None and generation != current:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            known = self._tables.get(table)
+            if known is None or known.generation != current:
+                known = self._tables[table] = _KnownIds(current)
+            for row_id in row_ids:
+                known.ids[row_id] = expires
+                known.ids.move_to_end(row_id)
+            while len(known.ids) > self.max_entries:
+                known.ids.popitem(last=False)
+
+    def forget(self, id_column):
+        """Forget every remembered ID of the table, in all workers (call after deleting rows)"""
+        response_cache.invalidate(f"ids:{id_column.table.name}")
+        with self._lock:
+            self._tables.pop(id_column.table.name, None)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+# Only Redis carries forget() to the other workers; elsewhere entries expire
+_shared = config.CACHE_BACKEND == "shared" and bool(config.CACHE_URL)
+existence_cache = ExistenceCache(config.EXISTENCE_CACHE_SIZE, None if _shared else config.CACHE_TTL)
+
+
+def row_exists(db, id_column, row_id) -> bool:
+    """Whether a row with this primary key exists, from the cache or an EXISTS query"""
+    if existence_cache.contains(id_column, row_id):
+        return True
+    generation = existence_cache.generation(id_column)
+    found = db.scalar(select(exists().where(id_column == row_id)))
+    if found:
+        existence_cache.add(id_column, [row_id], generation)
+    return found
+
+
+async def row_exists_async(db, id_column, row_id) -> bool:
+    """row_exists() for an AsyncSession"""
+    if existence_cache.contains(id_column, row_id):
+        return True
+    generation = existence_cache.generation(id_column)
+    found = await db.scalar(select(exists().where(id_column == row_id)))
+    if found:
+        existence_cache.add(id_column, [row_id], generation)
+    return found
+
+
+def existing_ids(db, id_column, row_ids, chunk_size: int = 5000) -> set:
+    """The given IDs that exist: cached ones, plus one IN query per chunk of the rest"""
+    found = set()
+    unknown = []
+    for row_id in set(row_ids):
+        if existence_cache.contains(id_column, row_id):
+            found.add(row_id)
+        else:
+            unknown.append(row_id)
+    generation = existence_cache.generation(id_column)
+    for start in range(0, len(unknown), chunk_size):
+        chunk = unknown[start:start + chunk_size]
+        rows = set(db.scalars(select(id_column).where(id_column.in_(chunk))))
+        existence_cache.add(id_column, rows, generation)
+        found |= rows
+    return found
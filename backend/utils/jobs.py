@@ -0,0 +1,116 @@
+"""
+In-process background job runner.
+
+Jobs are plain (sync) functions returning the number of rows they
+affected. The runner calls each one every `interval` seconds on a worker
+thread, so the event loop keeps serving requests while a job talks to the
+database. Every run is timed and logged, and recorded in the job's status
+(GET /jobs) and in the job_duration_seconds / job_rows_total metrics. A
+failing run is logged and retried at the next interval.
+
+The runner is started and stopped by the application lifespan in main.py.
+Every worker process runs its own jobs, so jobs must be safe to run
+concurrently with themselves.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from utils.metrics import JOB_DURATION, JOB_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A registered job and the outcome of its latest run"""
+
+    def __init__(self, name: str, func: Callable[[], int], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.running = False
+        self.last_started_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_rows: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_seconds": self.last_duration,
+            "last_rows_affected": self.last_rows,
+            "last_error": self.last_error,
+        }
+
+
+class JobRunner:
+    """Runs registered jobs periodically on asyncio tasks"""
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._tasks = []
+
+    def add(self, name: str, func: Callable[[], int], interval: float):
+        """Register `func` to run every `interval` seconds (0 registers it without scheduling it)"""
+        self.jobs[name] = Job(name, func, interval)
+
+    async def run(self, name: str) -> int:
+        """Run a job once now and return the rows it affected"""
+        job = self.jobs[name]
+        job.running = True
+        job.last_started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            rows = await asyncio.to_thread(job.func) or 0
+        except Exception as exc:
+            job.failures += 1
+            job.last_error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            JOB_DURATION.observe(job.last_duration, job=name)
+
+        job.last_rows = rows
+        job.last_error = None
+        JOB_ROWS.inc(rows, job=name)
+        logger.info("Job %s finished in %.3fs: %d rows affected", name, job.last_duration, rows)
+        return rows
+
+    async def _loop(self, job: Job):
+        while True:
+            try:
+                await self.run(job.name)
+            except Exception:
+                logger.exception("Job %s failed", job.name)
+            await asyncio.sleep(job.interval)
+
+    def start(self):
+        """Schedule every job with an interval on the running event loop"""
+        self._tasks = [
+            asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+            for job in self.jobs.values() if job.interval > 0
+        ]
+
+    async def stop(self):
+        """Cancel the scheduled jobs; a run in progress finishes on its thread"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> list:
+        return [job.status() for job in self.jobs.values()]
+
+
+job_runner = JobRunner()
@@ -0,0 +1,30 @@
+"""
+Inter-process file lock.
+
+Serializes one-time work (schema creation at startup) between the worker
+processes of one host. Uses fcntl.flock, so the lock is released when the
+holder exits, even on a crash. Where fcntl is unavailable (Windows) the
+lock is a no-op; run the schema step once before starting the workers
+there (`python serve.py --migrate`).
+"""
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
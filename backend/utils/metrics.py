@@ -0,0 +1,238 @@
+"""
+Per-request database instrumentation and Prometheus metrics.
+
+SQLAlchemy cursor hooks count statements and time spent in the database
+for the request being served (tracked through a context variable, which
+FastAPI copies into the threadpool running sync routes). The middleware
+adds a Server-Timing header to every response and records per-route
+histograms, rendered at /metrics in the Prometheus text format.
+Statements slower than SLOW_QUERY_MS are logged with their query plan.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """Database work done while serving one request"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Stats of the request being served, or None outside a request"""
+    return _request_stats.get()
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds, one series per label set"""
+
+    def __init__(self, name: str, description: str, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                prefix = labels + "," if labels else ""
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label set"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        """Value of the unlabelled series"""
+        return self._series.get((), 0)
+
+    def inc(self, amount: int = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items()) or [((), 0)]
+            for key, value in series:
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Total request latency",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    (0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run time",
+    (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+JOB_ROWS = Counter("job_rows_total", "Rows affected by background jobs")
+EVENT_BUFFER_ROWS = Counter("event_buffer_rows_total", "Buffered events by outcome (written, dropped, rejected)")
+WORKER_STARTUP = Histogram(
+    "worker_startup_seconds", "Worker cold start by phase (import, schema, total)",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EXISTENCE_LOOKUPS = Counter("existence_cache_lookups_total", "Parent-row existence checks by table and result (hit, miss)")
+
+METRICS = [
+    REQUEST_DURATION, REQUEST_DB_TIME, REQUEST_QUERIES, SLOW_QUERIES, JOB_DURATION, JOB_ROWS, EVENT_BUFFER_ROWS,
+    WORKER_STARTUP, EXISTENCE_LOOKUPS,
+]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _explain(conn, statement, parameters) -> str:
+    """Query plan of a slow statement, read on a separate DBAPI cursor"""
+    if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+        return ""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as exc:  # the plan is diagnostic only; never fail the request
+        return f"(plan unavailable: {exc})"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_time += elapsed
+
+    if config.SLOW_QUERY_MS >= 0 and elapsed * 1000 >= config.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        plan = "" if executemany or not config.SLOW_QUERY_EXPLAIN else _explain(conn, statement, parameters)
+        # Bulk inserts can carry tens of thousands of parameter sets
+        shown = f"{len(parameters)} parameter sets" if executemany else repr(parameters)
+        logger.warning(
+            "Slow query (%.1f ms): %s\nParameters: %s%s",
+            elapsed * 1000, statement, shown, f"\nPlan:\n{plan}" if plan else ""
+        )
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so later statements on this pooled connection pair with their own
+    conn = context.connection
+    if conn is not None and context.execution_context is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    """Attach the timing hooks to an engine (safe to call more than once)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware recording per-request DB work, latency and Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_time * 1000:.2f};desc="{stats.query_count} queries", '
+                    f"total;dur={total_ms:.2f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": route.path if route is not None else "unmatched",
+            }
+            REQUEST_DURATION.observe(time.perf_counter() - started, status=str(status_code), **labels)
+            REQUEST_DB_TIME.observe(stats.db_time, **labels)
+            REQUEST_QUERIES.observe(stats.query_count, **labels)
@@ -0,0 +1,137 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Offset pagination makes the database walk and discard every skipped row, so
+deep pages get slower the further you go. Keyset pagination instead filters
+on the sort key of the last row returned, which lets the database seek
+straight to the next page through an index.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import String, and_, or_, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    payload = json.dumps([sort_value, row_id], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by encode_cursor into (sort_value, row_id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(row_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, row_id
+
+
+def decode_sort_value(value, column_type):
+    """Cursor sort value as the Python type of the sort column (ValueError/TypeError when it is not one)"""
+    python_type = column_type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+class SortKey(TypeDecorator):
+    """
+    Type of a keyset sort column and of the cursor values compared with it.
+
+    On SQLite rows are compared on the stored text of the column: DateTime
+    values are kept as text there, and server-default timestamps lack the
+    microseconds that SQLAlchemy adds to bound parameters, so binding a
+    parsed datetime would not match the row the cursor was taken from.
+    Other databases compare natively, with the cursor value decoded into
+    the column's Python type.
+    """
+    impl = String
+    cache_ok = True
+
+    def __init__(self, column_type):
+        super().__init__()
+        self.column_type = column_type
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(self.column_type)
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name == "sqlite":
+            return value
+        return decode_sort_value(value, self.column_type)
+
+
+def sort_key(sort_column):
+    """`sort_column` typed for keyset comparisons and cursor values (see SortKey)"""
+    return type_coerce(sort_column, SortKey(sort_column.type))
+
+
+def keyset_filter(id_column, cursor: str, sort_column=None):
+    """WHERE clause selecting rows after `cursor`, or None for the first page"""
+    if not cursor:
+        return None
+    last_value, last_id = decode_cursor(cursor)
+    if sort_column is None:
+        return id_column > last_id
+    try:
+        decode_sort_value(last_value, sort_column.type)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    key = sort_key(sort_column)
+    return or_(key < last_value, and_(key == last_value, id_column < last_id))
+
+
+def keyset_statement(query, id_column, cursor: str, limit: int, sort_column=None):
+    """
+    Restrict a Query or select() to the page after `cursor`.
+
+    Without a sort column, rows are ordered by `id_column` ascending. With a
+    sort column, rows are ordered by `(sort_column, id_column)` descending,
+    which matches the newest-first ordering of the event, note and action
+    lists. One extra row is fetched to tell whether another page follows.
+    """
+    if sort_column is None:
+        query = query.add_columns(id_column).order_by(id_column.asc())
+    else:
+        query = query.add_columns(sort_key(sort_column).label("keyset_sort_key"))
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    after_cursor = keyset_filter(id_column, cursor, sort_column)
+    if after_cursor is not None:
+        query = query.filter(after_cursor)
+    return query.limit(limit + 1)
+
+
+def keyset_page(rows, id_column, limit: int, sort_column=None):
+    """Split rows fetched by keyset_statement into (items, next_cursor)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = last[1] if sort_column is not None else None
+        next_cursor = encode_cursor(sort_value, getattr(last[0], id_column.key))
+    return [row[0] for row in rows], next_cursor
+
+
+def keyset_paginate(query, id_column, cursor: str, limit: int, sort_column=None):
+    """
+    Return one page of `query` and the cursor for the page after it.
+
+    An empty cursor starts from the first page; the returned cursor is None
+    once the last page has been reached.
+    """
+    rows = keyset_statement(query, id_column, cursor, limit, sort_column).all()
+    return keyset_page(rows, id_column, limit, sort_column)